@@ -0,0 +1,149 @@
+import time
+import threading
+from itertools import islice
+from instrumentation import metrics
+
+# Batch size controller shared by every UNWIND push. It keeps a smoothed per-row commit
+# time and sizes the next batch so a commit takes about TARGET_SECONDS, within
+# [FLOOR, CEILING]. Growth is capped per step so one fast batch cannot jump to the ceiling.
+# Server memory errors halve the size and the failed batch is retried in halves.
+# Every committed batch is also recorded in instrumentation.metrics under the batcher's name.
+# Safe to share between ShardPool worker threads.
+
+INITIAL = 500
+FLOOR = 50
+CEILING = 20_000
+TARGET_SECONDS = 0.5
+GROWTH = 1.5
+SMOOTHING = 0.3
+
+# error codes the server uses when a transaction runs out of heap
+MEMORY_ERROR_CODES = ("MemoryPoolOutOfMemoryError", "TransactionMemoryLimit", "OutOfMemory")
+
+
+def is_memory_error(exc):
+    code = getattr(exc, "code", None) or ""
+    return isinstance(exc, MemoryError) or any(name in code for name in MEMORY_ERROR_CODES)
+
+
+class AdaptiveBatcher:
+    def __init__(self, initial=INITIAL, floor=FLOOR, ceiling=CEILING, target_seconds=TARGET_SECONDS,
+                 growth=GROWTH, name=""):
+        self.floor = floor
+        self.ceiling = ceiling
+        self.target_seconds = target_seconds
+        self.growth = growth
+        self.name = name
+        self.lock = threading.Lock()
+        self._size = min(max(initial, floor), ceiling)
+        self.row_seconds = None
+        self.rows = 0
+        self.batches = 0
+        self.memory_errors = 0
+        self.smallest = self.largest = self._size
+
+    @property
+    def size(self):
+        with self.lock:
+            return self._size
+
+    def _set(self, size):
+        self._size = int(min(max(size, self.floor), self.ceiling))
+        self.smallest = min(self.smallest, self._size)
+        self.largest = max(self.largest, self._size)
+
+    def record(self, rows, seconds):
+        if rows <= 0:
+            return
+        with self.lock:
+            self.rows += rows
+            self.batches += 1
+            sample = max(seconds, 1e-6) / rows
+            if self.row_seconds is None:
+                self.row_seconds = sample
+            else:
+                self.row_seconds += SMOOTHING * (sample - self.row_seconds)
+            wanted = self.target_seconds / self.row_seconds
+            self._set(min(max(wanted, self._size / 2), self._size * self.growth))
+
+    def shrink(self):
+        with self.lock:
+            self.memory_errors += 1
+            self._set(self._size // 2)
+
+    # runs write(batch) and feeds its latency back; a memory error shrinks the controller
+    # and retries the same rows in halves, down to FLOOR
+    def run(self, write, batch, sid=None):
+        started = time.perf_counter()
+        try:
+            result = write(batch)
+        except Exception as exc:
+            if not is_memory_error(exc) or len(batch) <= self.floor:
+                raise
+            self.shrink()
+            print(f"{self.name or 'batch'}: memory error at {len(batch)} rows, retrying in halves")
+            middle = len(batch) // 2
+            self.run(write, batch[:middle], sid)
+            return self.run(write, batch[middle:], sid)
+        elapsed = time.perf_counter() - started
+        self.record(len(batch), elapsed)
+        metrics.batch(self.name or "batch", len(batch), elapsed, result, sid)
+        return result
+
+    # run() for async writes (async_pipeline): write(batch) returns an awaitable
+    async def arun(self, write, batch, sid=None):
+        started = time.perf_counter()
+        try:
+            result = await write(batch)
+        except Exception as exc:
+            if not is_memory_error(exc) or len(batch) <= self.floor:
+                raise
+            self.shrink()
+            print(f"{self.name or 'batch'}: memory error at {len(batch)} rows, retrying in halves")
+            middle = len(batch) // 2
+            await self.arun(write, batch[:middle], sid)
+            return await self.arun(write, batch[middle:], sid)
+        elapsed = time.perf_counter() - started
+        self.record(len(batch), elapsed)
+        metrics.batch(self.name or "batch", len(batch), elapsed, result, sid)
+        return result
+
+    # lists sized by the controller at the time each one is cut
+    def batches_of(self, rows):
+        if isinstance(rows, list):
+            i = 0
+            while i < len(rows):
+                size = self.size
+                yield rows[i:i + size]
+                i += size
+            return
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, self.size))
+            if not batch:
+                return
+            yield batch
+
+    def push(self, write, rows):
+        count = 0
+        for batch in self.batches_of(rows):
+            self.run(write, batch)
+            count += len(batch)
+        return count
+
+    def summary(self):
+        with self.lock:
+            return {
+                "name": self.name,
+                "rows": self.rows,
+                "batches": self.batches,
+                "batch_size": self._size,
+                "smallest": self.smallest,
+                "largest": self.largest,
+                "memory_errors": self.memory_errors,
+            }
+
+    def describe(self):
+        s = self.summary()
+        return (f"{s['name'] or 'batches'}: {s['batches']} batches, size now {s['batch_size']} "
+                f"(range {s['smallest']}-{s['largest']}), {s['memory_errors']} memory errors")
@@ -0,0 +1,217 @@
+import time
+import asyncio
+import concurrent.futures
+from concurrent.futures import ThreadPoolExecutor
+from neo4j import AsyncGraphDatabase
+from instrumentation import metrics
+
+# Overlaps parsing with writing. Each producer (CSV parsing, vid lookups, batch and round
+# planning) runs in its own thread and hands work to bounded per-shard queues that async
+# sessions drain, so a load takes about max(parse, write) instead of parse + write. A full
+# queue blocks its producer: at most QUEUE_DEPTH items per shard and producer are held.
+#
+# Work items, put on a shard with emit(sid, item):
+#   ("batches", tx_fn, batches, args, batcher)  independent batches, written as slots free up
+#   ("round", tx_fn, batches, args, batcher)    a rel_scheduler round: it starts once everything
+#                                               queued before it has committed, and commits
+#                                               before anything queued after it starts
+# tx_fn is a loader's ordinary transaction function (one tx.run(...).consume()); its
+# statement is captured and replayed on the async transaction, so loaders keep one copy.
+
+QUEUE_DEPTH = 16
+
+
+# stands in for a transaction to capture the statement a tx function would run
+class _Statement:
+    def run(self, query, parameters=None, **kwargs):
+        self.query = query
+        self.parameters = dict(parameters or {}, **kwargs)
+        return self
+
+    def consume(self):
+        return None
+
+
+async def _replay(tx, tx_fn, rows, args):
+    statement = _Statement()
+    tx_fn(statement, rows, *args)
+    result = await tx.run(statement.query, statement.parameters)
+    return await result.consume()
+
+
+# the producer side: emit(sid, item) blocks while the shard's queue is full,
+# room(sid) says how many items fit without blocking
+class Emitter:
+    def __init__(self, writer, loop, stream):
+        self.writer = writer
+        self.loop = loop
+        self.stream = stream
+        self.workers = writer.workers
+        self.blocked = 0.0
+
+    def __contains__(self, sid):
+        return sid in self.workers
+
+    def room(self, sid):
+        queue = self.writer.queues.get((sid, self.stream))
+        return self.writer.queue_depth - (queue.qsize() if queue is not None else 0)
+
+    def __call__(self, sid, item):
+        if self.writer.error is not None:
+            raise self.writer.error
+        started = time.perf_counter()
+        future = asyncio.run_coroutine_threadsafe(self.writer._put((sid, self.stream), item), self.loop)
+        try:
+            while True:
+                try:
+                    return future.result(timeout=0.2)
+                except concurrent.futures.TimeoutError:
+                    # a failed write stops the run; do not wait on a queue nobody drains
+                    if self.writer.error is not None:
+                        future.cancel()
+                        raise self.writer.error
+        finally:
+            self.blocked += time.perf_counter() - started
+
+
+class AsyncWriter:
+    def __init__(self, uris, auth, workers_per_shard=4, database="neo4j", queue_depth=QUEUE_DEPTH):
+        self.uris = uris
+        self.auth = auth
+        self.database = database
+        self.queue_depth = queue_depth
+        self.workers = {
+            sid: workers_per_shard[sid] if isinstance(workers_per_shard, dict) else workers_per_shard
+            for sid in uris
+        }
+        self.drivers = {}
+        self.slots = {}
+        self.queues = {}
+        self.dispatchers = []
+        self.error = None
+        self.stats = {sid: {"uri": uri, "rows": 0, "batches": 0, "busy": 0.0} for sid, uri in uris.items()}
+        self.producers = []
+        self.started = time.perf_counter()
+
+    async def __aenter__(self):
+        for sid, uri in self.uris.items():
+            self.drivers[sid] = AsyncGraphDatabase.driver(uri, auth=self.auth,
+                                                          max_connection_pool_size=self.workers[sid])
+            self.slots[sid] = asyncio.Semaphore(self.workers[sid])
+        return self
+
+    async def __aexit__(self, *exc):
+        await asyncio.gather(*(driver.close() for driver in self.drivers.values()))
+
+    def __contains__(self, sid):
+        return sid in self.uris
+
+    async def _put(self, key, item):
+        queue = self.queues.get(key)
+        if queue is None:
+            queue = self.queues[key] = asyncio.Queue(self.queue_depth)
+            self.dispatchers.append(asyncio.create_task(self._dispatch(key[0], queue)))
+        await queue.put(item)
+
+    async def _write(self, sid, tx_fn, rows, args, batcher):
+        async with self.slots[sid]:
+            started = time.perf_counter()
+            async with self.drivers[sid].session(database=self.database) as session:
+                if batcher is None:
+                    await session.execute_write(_replay, tx_fn, rows, args)
+                    metrics.batch(tx_fn.__name__, len(rows), time.perf_counter() - started, sid=sid)
+                else:
+                    await batcher.arun(lambda batch: session.execute_write(_replay, tx_fn, batch, args), rows, sid)
+            stats = self.stats[sid]
+            stats["rows"] += len(rows)
+            stats["batches"] += 1
+            stats["busy"] += time.perf_counter() - started
+
+    @staticmethod
+    async def _settle(pending, limit=0):
+        while len(pending) > limit:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                pending.discard(task)
+                task.result()
+
+    async def _dispatch(self, sid, queue):
+        pending = set()
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                kind, tx_fn, batches, args, batcher = item
+                if kind == "round":
+                    await self._settle(pending)
+                    await asyncio.gather(*(self._write(sid, tx_fn, batch, args, batcher) for batch in batches))
+                    continue
+                for batch in batches:
+                    await self._settle(pending, self.workers[sid] - 1)
+                    pending.add(asyncio.create_task(self._write(sid, tx_fn, batch, args, batcher)))
+            await self._settle(pending)
+        except BaseException as exc:
+            for task in pending:
+                task.cancel()
+            if self.error is None:
+                self.error = exc
+            raise
+
+    # runs every produce(emit) in its own thread until all of them returned and their
+    # queues are written; returns their results in order
+    async def run(self, *producers):
+        loop = asyncio.get_running_loop()
+        self.error = None
+
+        async def feed(stream, produce, threads):
+            emit = Emitter(self, loop, stream)
+            started = time.perf_counter()
+            result = await loop.run_in_executor(threads, produce, emit)
+            self.producers.append((time.perf_counter() - started, emit.blocked))
+            for (sid, key_stream), queue in list(self.queues.items()):
+                # end of stream; a queue whose dispatcher failed is never drained
+                while key_stream == stream and self.error is None:
+                    try:
+                        queue.put_nowait(None)
+                        break
+                    except asyncio.QueueFull:
+                        await asyncio.sleep(0.01)
+            return result
+
+        with ThreadPoolExecutor(max_workers=max(len(producers), 1), thread_name_prefix="producer") as threads:
+            try:
+                results = await asyncio.gather(*(feed(i, produce, threads) for i, produce in enumerate(producers)))
+                await asyncio.gather(*self.dispatchers)
+            except BaseException:
+                if self.error is None:
+                    self.error = RuntimeError("pipeline stopped")
+                for task in self.dispatchers:
+                    task.cancel()
+                await asyncio.gather(*self.dispatchers, return_exceptions=True)
+                raise
+            finally:
+                self.queues.clear()
+                self.dispatchers.clear()
+        return results
+
+    def print_summary(self):
+        wall = time.perf_counter() - self.started
+        print(f"{'sid':>4} {'uri':<28} {'rows':>10} {'batches':>8} {'busy s':>9} {'rows/s':>10}")
+        for sid, stats in sorted(self.stats.items()):
+            rate = stats["rows"] / wall if wall > 0 else 0.0
+            print(f"{sid:>4} {stats['uri']:<28} {stats['rows']:>10} {stats['batches']:>8} "
+                  f"{stats['busy']:>9.1f} {rate:>10.0f}")
+        # a producer that mostly waited was write-bound, one that never waited was parse-bound
+        for seconds, blocked in self.producers:
+            print(f"producer: {seconds:.1f}s, {seconds - blocked:.1f}s reading, {blocked:.1f}s waiting on full queues")
+
+
+# one-shot helper for the loaders: opens the writer, runs the producers, prints the summary
+def run_pipeline(uris, auth, workers_per_shard, *producers, queue_depth=QUEUE_DEPTH):
+    async def main():
+        async with AsyncWriter(uris, auth, workers_per_shard, queue_depth=queue_depth) as writer:
+            results = await writer.run(*producers)
+            writer.print_summary()
+            return results
+    return asyncio.run(main())
@@ -0,0 +1,252 @@
+#5 offline neo4j-admin import files, one set per shard
+import os
+import csv
+import argparse
+from itertools import islice
+import numpy as np
+from generate_maps import NODE_FILES, SOCIAL_NETWORK_DIR
+from partition_maps import RELATIONSHIPS
+from vid_store import open_vid_map, open_sid_map, map_exists, NO_SID
+from ldbc_schema import INT, DATE, DATETIME, columns_for
+from instrumentation import metrics
+
+PARTITIONED_VID_DIR = "partitioned_vids"
+VID_SID_LOG = os.path.join(PARTITIONED_VID_DIR, "vid_sid_log.csv")
+EXPORT_DIR = "bulk_import"
+CHUNK_ROWS = 100_000
+SINGLE = "single"
+
+IMPORT_TYPES = {INT: "long", DATE: "date", DATETIME: "datetime"}
+LABELS = {label.lower(): label for label, _ in NODE_FILES.values()}
+
+
+def find_file(filename):
+    for subfolder in ["static", "dynamic"]:
+        candidate = os.path.join(SOCIAL_NETWORK_DIR, subfolder, filename)
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+def rel_type_for(src, dst, rel_file):
+    stem = rel_file[:-len("_0_0.csv")] if rel_file.endswith("_0_0.csv") else os.path.splitext(rel_file)[0]
+    return stem[len(src) + 1:len(stem) - len(dst) - 1]
+
+
+# typed like the online loaders type them, from ldbc_schema
+def header_for(filename, field):
+    try:
+        kinds = dict(columns_for(filename))
+    except KeyError:
+        kinds = {}
+    kind = IMPORT_TYPES.get(kinds.get(field))
+    return f"{field}:{kind}" if kind else field
+
+
+def iter_chunks(filepath):
+    with open(filepath, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f, delimiter='|')
+        header = next(reader, None)
+        if header is None:
+            return
+        yield header
+        while True:
+            rows = list(islice(reader, CHUNK_ROWS))
+            if not rows:
+                break
+            yield rows
+
+
+# one open csv.writer per shard, created on first use
+class ShardWriters:
+    def __init__(self, out_dir, filename, header):
+        self.out_dir = out_dir
+        self.filename = filename
+        self.header = header
+        self.files = {}
+        self.writers = {}
+        self.counts = {}
+
+    def get(self, shard):
+        if shard not in self.writers:
+            shard_dir = os.path.join(self.out_dir, shard_name(shard))
+            os.makedirs(shard_dir, exist_ok=True)
+            f = open(os.path.join(shard_dir, self.filename), "w", newline='', encoding='utf-8')
+            writer = csv.writer(f)
+            writer.writerow(self.header)
+            self.files[shard] = f
+            self.writers[shard] = writer
+            self.counts[shard] = 0
+        return self.writers[shard]
+
+    def write(self, shard, row):
+        self.get(shard).writerow(row)
+        self.counts[shard] += 1
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+
+def shard_name(shard):
+    return shard if shard == SINGLE else f"shard_{shard}"
+
+
+def shards_for(vids, vid_to_sid):
+    if vid_to_sid is None:
+        return np.zeros(len(vids), dtype=np.int64)
+    return vid_to_sid.lookup(vids)
+
+
+def export_nodes(label, filename, fields, vid_map, vid_to_sid, out_dir, manifest):
+    filepath = find_file(filename)
+    if not filepath:
+        print(f"{filename} not found.")
+        return
+
+    chunks = iter_chunks(filepath)
+    header = next(chunks, None)
+    if header is None:
+        return
+    positions = [header.index(field) for field in fields]
+    out_name = f"{label.lower()}_nodes.csv"
+    writers = ShardWriters(out_dir, out_name, ["vid:ID"] + [header_for(filename, field) for field in fields])
+    unassigned = missing = 0
+
+    for rows in chunks:
+        vids, found = vid_map.lookup([int(row[0]) for row in rows])
+        sids = shards_for(vids, vid_to_sid)
+        missing += int(np.count_nonzero(~found))
+        for row, vid, ok, sid in zip(rows, vids.tolist(), found.tolist(), sids.tolist()):
+            if not ok:
+                continue
+            if sid == NO_SID:
+                unassigned += 1
+                continue
+            shard = SINGLE if vid_to_sid is None else sid
+            writers.write(shard, [vid] + [row[p] for p in positions])
+
+    writers.close()
+    for shard, count in writers.counts.items():
+        manifest.setdefault(shard, {"nodes": [], "relationships": []})["nodes"].append((label, out_name))
+        print(f"{label}: {count} nodes -> {shard_name(shard)}")
+    if missing or unassigned:
+        print(f"{label}: skipped {missing} rows without vid, {unassigned} without sid")
+
+
+def export_relationships(src, dst, rel_type, rel_file, vid_maps, vid_to_sid, out_dir, manifest):
+    filepath = find_file(rel_file)
+    if not filepath:
+        print(f"Skipping missing relationship file: {rel_file}")
+        return
+
+    chunks = iter_chunks(filepath)
+    header = next(chunks, None)
+    if header is None:
+        return
+    prop_names = header[2:]
+    out_name = f"{os.path.splitext(rel_file)[0]}_edges.csv"
+    writers = ShardWriters(out_dir, out_name, [":START_ID", ":END_ID"] + [header_for(rel_file, p) for p in prop_names])
+
+    cross_writer = None
+    if vid_to_sid is not None:
+        cross_dir = os.path.join(out_dir, "cross_shard")
+        os.makedirs(cross_dir, exist_ok=True)
+        cross_file = open(os.path.join(cross_dir, f"{os.path.splitext(rel_file)[0]}_cross.csv"), "w", newline='', encoding='utf-8')
+        cross_writer = csv.writer(cross_file)
+        cross_writer.writerow(["from_vid", "from_sid", "to_vid", "to_sid", "rel_type"] + prop_names)
+
+    missing = cross = 0
+    for rows in chunks:
+        from_vids, from_found = vid_maps[src].lookup([int(row[0]) for row in rows])
+        to_vids, to_found = vid_maps[dst].lookup([int(row[1]) for row in rows])
+        from_sids = shards_for(from_vids, vid_to_sid)
+        to_sids = shards_for(to_vids, vid_to_sid)
+        ok = from_found & to_found & (from_sids != NO_SID) & (to_sids != NO_SID)
+        missing += int(np.count_nonzero(~ok))
+
+        for i in np.flatnonzero(ok).tolist():
+            row = rows[i]
+            a, b = int(from_vids[i]), int(to_vids[i])
+            sa, sb = int(from_sids[i]), int(to_sids[i])
+            if vid_to_sid is None:
+                writers.write(SINGLE, [a, b] + row[2:])
+            elif sa == sb:
+                writers.write(sa, [a, b] + row[2:])
+            else:
+                cross_writer.writerow([a, sa, b, sb, rel_type] + row[2:])
+                cross += 1
+
+    writers.close()
+    if cross_writer is not None:
+        cross_file.close()
+    for shard, count in writers.counts.items():
+        manifest.setdefault(shard, {"nodes": [], "relationships": []})["relationships"].append((rel_type, out_name))
+        print(f"{rel_type}: {count} edges -> {shard_name(shard)}")
+    if cross:
+        print(f"{rel_type}: {cross} cross-shard edges split out")
+    if missing:
+        print(f"{rel_type}: skipped {missing} rows without vid or sid")
+
+
+def write_import_scripts(out_dir, manifest, database="neo4j"):
+    for shard, files in sorted(manifest.items(), key=lambda item: str(item[0])):
+        shard_dir = os.path.join(out_dir, shard_name(shard))
+        lines = [
+            "#!/bin/sh",
+            "# run from this directory against a stopped, empty database",
+            "neo4j-admin database import full \\",
+            "    --id-type=INTEGER --overwrite-destination \\",
+        ]
+        for label, name in files["nodes"]:
+            lines.append(f"    --nodes={label}={name} \\")
+        for rel_type, name in files["relationships"]:
+            lines.append(f"    --relationships={rel_type}={name} \\")
+        lines.append(f"    {database}")
+        path = os.path.join(shard_dir, "import.sh")
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.chmod(path, 0o755)
+        print(f"Wrote {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write neo4j-admin import files keyed by vid.")
+    parser.add_argument("--vid-map-dir", default=PARTITIONED_VID_DIR)
+    parser.add_argument("--sid-log", default=VID_SID_LOG)
+    parser.add_argument("--single", action="store_true", help="one set for a single instance, ignore vid_sid_log")
+    parser.add_argument("--out", default=EXPORT_DIR)
+    args = parser.parse_args()
+
+    vid_maps = {}
+    for label in LABELS.values():
+        path = os.path.join(args.vid_map_dir, f"{label.lower()}_vid_map.csv")
+        if map_exists(path):
+            vid_maps[label] = open_vid_map(path)
+    vid_to_sid = None if args.single else open_sid_map(args.sid_log)
+
+    metrics.start("bulk_export")
+    os.makedirs(args.out, exist_ok=True)
+    manifest = {}
+    for filename, (label, fields) in NODE_FILES.items():
+        if label not in vid_maps:
+            print(f"No vid map for {label}, skipping")
+            continue
+        with metrics.stage("export_nodes", label):
+            export_nodes(label, filename, fields, vid_maps[label], vid_to_sid, args.out, manifest)
+
+    for src, dst, rel_file in RELATIONSHIPS:
+        src_label, dst_label = LABELS.get(src), LABELS.get(dst)
+        if src_label not in vid_maps or dst_label not in vid_maps:
+            print(f"No vid map for {rel_file}, skipping")
+            continue
+        with metrics.stage("export_relationships", rel_file):
+            export_relationships(src_label, dst_label, rel_type_for(src, dst, rel_file), rel_file,
+                                 vid_maps, vid_to_sid, args.out, manifest)
+
+    write_import_scripts(args.out, manifest)
+    metrics.finish()
+
+
+if __name__ == "__main__":
+    main()
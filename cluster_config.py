@@ -0,0 +1,96 @@
+import os
+import json
+
+# Shard layout shared by partition_maps, sid_generator, stream_partitioner and the
+# partitioned loaders. Read from the JSON file named by $LDBC_CLUSTER_CONFIG, else
+# ./cluster.json, else the two local instances below. Shard ids must be 0..n-1 so
+# they line up with METIS partition numbers.
+#
+# {
+#   "auth": ["neo4j", "playground"],
+#   "workers_per_shard": 4,
+#   "shards": [
+#     {"sid": 0, "uri": "neo4j://localhost:9750"},
+#     {"sid": 1, "uri": "neo4j://localhost:9751", "workers": 8}
+#   ]
+# }
+
+CONFIG_ENV = "LDBC_CLUSTER_CONFIG"
+CONFIG_FILE = "cluster.json"
+
+DEFAULT_CONFIG = {
+    "auth": ["neo4j", "playground"],
+    "workers_per_shard": 4,
+    "shards": [
+        {"sid": 0, "uri": "neo4j://localhost:9750"},
+        {"sid": 1, "uri": "neo4j://localhost:9751"},
+    ],
+}
+
+
+class ClusterConfig:
+    def __init__(self, shards, auth, workers_per_shard=4, source=None):
+        self.source = source
+        self.auth = tuple(auth)
+        self.uris = {}
+        self.workers = {}
+        for shard in shards:
+            sid = int(shard["sid"])
+            if sid in self.uris:
+                raise ValueError(f"duplicate sid {sid} in cluster config {source}")
+            self.uris[sid] = shard["uri"]
+            self.workers[sid] = int(shard.get("workers", workers_per_shard))
+        if sorted(self.uris) != list(range(len(self.uris))):
+            raise ValueError(f"shard ids in cluster config {source} must be 0..{len(self.uris) - 1}, "
+                             f"got {sorted(self.uris)}")
+        self.uris = dict(sorted(self.uris.items()))
+
+    @property
+    def num_shards(self):
+        return len(self.uris)
+
+    def to_dict(self):
+        return {
+            "auth": list(self.auth),
+            "shards": [{"sid": sid, "uri": uri, "workers": self.workers[sid]} for sid, uri in self.uris.items()],
+        }
+
+
+def config_path():
+    path = os.environ.get(CONFIG_ENV)
+    if path:
+        return path
+    return CONFIG_FILE if os.path.exists(CONFIG_FILE) else None
+
+
+def load_config(path=None):
+    path = path or config_path()
+    if path is None:
+        data = DEFAULT_CONFIG
+    else:
+        with open(path) as f:
+            data = json.load(f)
+    return ClusterConfig(
+        data["shards"],
+        data.get("auth", DEFAULT_CONFIG["auth"]),
+        data.get("workers_per_shard", DEFAULT_CONFIG["workers_per_shard"]),
+        source=path or "defaults",
+    )
+
+
+def write_config(path, uris, auth=DEFAULT_CONFIG["auth"], workers_per_shard=DEFAULT_CONFIG["workers_per_shard"]):
+    data = {
+        "auth": list(auth),
+        "workers_per_shard": workers_per_shard,
+        "shards": [{"sid": sid, "uri": uri} for sid, uri in sorted(uris.items())],
+    }
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+    return path
+
+
+if __name__ == "__main__":
+    config = load_config()
+    print(f"cluster config from {config.source}: {config.num_shards} shards")
+    for sid, uri in config.uris.items():
+        print(f"{sid:>4} {uri:<32} workers={config.workers[sid]}")
@@ -0,0 +1,138 @@
+import os
+import csv
+import warnings
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:
+    pa = None
+
+# Intermediate tables (vid maps, vid_index_map, vid_sid_log) are written as CSV, as an
+# Arrow IPC file next to it (vid_index_map.csv -> vid_index_map.arrow), or both;
+# $LDBC_ARTIFACTS picks csv (the default), arrow or both. Arrow files are
+# uncompressed and memory-mapped on read, so integer columns come back as read-only numpy
+# views of the page cache: no parsing and no copy. Readers take whichever of the two is
+# newer, so a run in any mode sees the last write. pyarrow is optional; without it only
+# CSV can be written or read.
+
+ARTIFACTS_ENV = "LDBC_ARTIFACTS"
+FORMATS = ("csv", "arrow", "both")
+
+
+def artifact_format():
+    fmt = os.environ.get(ARTIFACTS_ENV, "csv")
+    if fmt not in FORMATS:
+        raise ValueError(f"${ARTIFACTS_ENV} must be one of {', '.join(FORMATS)}, got {fmt!r}")
+    if fmt != "csv" and pa is None:
+        raise RuntimeError(f"${ARTIFACTS_ENV}={fmt} needs pyarrow (pip install pyarrow)")
+    return fmt
+
+
+def writes_csv():
+    return artifact_format() != "arrow"
+
+
+def writes_arrow():
+    return artifact_format() != "csv"
+
+
+def arrow_path(csv_path):
+    root, ext = os.path.splitext(csv_path)
+    return (root if ext == ".csv" else csv_path) + ".arrow"
+
+
+# True when the Arrow file exists and is at least as new as the CSV
+def arrow_is_fresh(csv_path):
+    path = arrow_path(csv_path)
+    if pa is None or not os.path.exists(path):
+        return False
+    return not os.path.exists(csv_path) or os.path.getmtime(path) >= os.path.getmtime(csv_path)
+
+
+def table_exists(csv_path):
+    return os.path.exists(csv_path) or os.path.exists(arrow_path(csv_path))
+
+
+def read_arrow(path):
+    with pa.memory_map(path, "r") as source:
+        return ipc.open_file(source).read_all()
+
+
+# numpy view of an integer column (a copy only if the column has several chunks),
+# a list of str for anything else
+def column_values(table, name):
+    chunked = table.column(name)
+    if not pa.types.is_integer(chunked.type):
+        return chunked.to_pylist()
+    if chunked.num_chunks == 0:
+        return np.empty(0, dtype=chunked.type.to_pandas_dtype())
+    if chunked.num_chunks == 1:
+        return chunked.chunk(0).to_numpy(zero_copy_only=True)
+    return chunked.to_numpy()
+
+
+# write then rename, so readers that still have the old file mapped are unaffected
+def write_arrow(csv_path, columns, append=False):
+    path = arrow_path(csv_path)
+    table = pa.table({
+        name: pa.array(values) if isinstance(values, np.ndarray) else pa.array(values, type=pa.string())
+        for name, values in columns.items()
+    })
+    if append and os.path.exists(path):
+        table = pa.concat_tables([read_arrow(path), table])
+    tmp_path = path + ".tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+    return path
+
+
+def write_csv(csv_path, columns, append=False):
+    header = not (append and os.path.exists(csv_path))
+    with open(csv_path, "a" if append else "w", newline='', encoding='utf-8') as f:
+        if all(isinstance(values, np.ndarray) for values in columns.values()):
+            # integer columns only: numpy formats them without building row tuples, ending
+            # lines in \r\n like csv.writer so the file is byte for byte the same
+            if header:
+                f.write(",".join(columns) + "\r\n")
+            if len(next(iter(columns.values()), ())):
+                np.savetxt(f, np.column_stack(list(columns.values())), fmt="%d", delimiter=",", newline="\r\n")
+            return csv_path
+        writer = csv.writer(f)
+        if header:
+            writer.writerow(list(columns))
+        writer.writerows(zip(*(values.tolist() if isinstance(values, np.ndarray) else values
+                               for values in columns.values())))
+    return csv_path
+
+
+# columns: {name: int numpy array or list of str}, in file order; returns the paths written
+def write_table(csv_path, columns, append=False):
+    paths = []
+    if writes_csv():
+        paths.append(write_csv(csv_path, columns, append))
+    if writes_arrow():
+        paths.append(write_arrow(csv_path, columns, append))
+    return paths
+
+
+# {name: int64 array} for the named integer columns, from the newer of the Arrow file and the CSV
+def read_int_columns(csv_path, names):
+    if arrow_is_fresh(csv_path):
+        table = read_arrow(arrow_path(csv_path))
+        return {name: column_values(table, name) for name in names}
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"{csv_path} not found (nor {arrow_path(csv_path)})")
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        header = next(csv.reader([f.readline()]), [])
+        usecols = [header.index(name) for name in names]
+        with warnings.catch_warnings():
+            # a header-only file (no cross edges for a type, say) is an empty table
+            warnings.simplefilter("ignore", UserWarning)
+            data = np.loadtxt(f, delimiter=",", usecols=usecols, dtype=np.int64, quotechar='"', ndmin=2)
+    if data.size == 0:
+        data = np.empty((0, len(names)), dtype=np.int64)
+    return {name: data[:, i] for i, name in enumerate(names)}
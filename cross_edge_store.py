@@ -0,0 +1,202 @@
+import os
+import re
+import csv
+import sqlite3
+import argparse
+from datetime import date
+import numpy as np
+from ldbc_schema import RELATIONSHIP_SCHEMA, INT, DATE, DATETIME
+from ldbc_reader import PARSERS
+
+# Cross-shard edges of every relationship type in one SQLite file. partioned_relationship_loader
+# adds a row per edge whose endpoints live on different shards. Each row has both vids and
+# sids, the labels and one typed column per LDBC relationship property. (from_vid, rel_type)
+# and (to_vid, rel_type) are indexed, so QueryRouter resolves "which remote vertices does
+# vid X reach" for a whole frontier with a few index lookups. Dates and datetimes are stored
+# as ISO 8601 text, which sorts and compares like the values themselves. A property the
+# schema does not know gets a column the first time it shows up.
+
+STORE_FILE = os.path.join("partitioned_vids", "cross_edges.sqlite")
+TABLE = "cross_edges"
+KEY_COLUMNS = ["rel_type", "from_label", "to_label", "from_vid", "from_sid", "to_vid", "to_sid"]
+# set by the loader on the props it sends to Neo4j; the key columns hold them here
+LOADER_KEYS = {"proxy", "target_vid", "target_sid"}
+LOOKUP_CHUNK = 500  # vids per IN (...) list, well inside SQLite's bound-parameter limit
+BUSY_TIMEOUT = 60.0  # loader threads and processes take turns on the write lock
+
+
+def _schema_kinds():
+    return {name: kind for _, _, _, props in RELATIONSHIP_SCHEMA.values() for name, kind in props}
+
+
+def _schema_properties():
+    return {name: "INTEGER" if kind == INT else "TEXT" for name, kind in _schema_kinds().items()}
+
+
+def _sql_type(value):
+    if isinstance(value, bool) or isinstance(value, int):
+        return "INTEGER"
+    if isinstance(value, float):
+        return "REAL"
+    return "TEXT"
+
+
+def _sql_value(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (str, int, float)) or value is None:
+        return value
+    return str(value)
+
+
+class CrossEdgeStore:
+    def __init__(self, path=STORE_FILE, readonly=False):
+        self.path = path
+        # ISO text back to date/datetime, as ldbc_reader hands them to the loaders
+        self.parsers = {name: PARSERS[kind] for name, kind in _schema_kinds().items() if kind in (DATE, DATETIME)}
+        if readonly:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"cross edge store not found: {path}")
+            self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=BUSY_TIMEOUT)
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self._create()
+        self.columns = [row[1] for row in self.conn.execute(f"PRAGMA table_info({TABLE})")]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def _create(self):
+        props = "".join(f', "{name}" {kind}' for name, kind in _schema_properties().items())
+        with self.conn:
+            self.conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {TABLE} (
+                    rel_type TEXT NOT NULL, from_label TEXT, to_label TEXT,
+                    from_vid INTEGER NOT NULL, from_sid INTEGER NOT NULL,
+                    to_vid INTEGER NOT NULL, to_sid INTEGER NOT NULL{props}
+                )
+            """)
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS {TABLE}_from ON {TABLE} (from_vid, rel_type)")
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS {TABLE}_to ON {TABLE} (to_vid, rel_type)")
+
+    def __len__(self):
+        return self.conn.execute(f"SELECT COUNT(*) FROM {TABLE}").fetchone()[0]
+
+    def counts(self):
+        return dict(self.conn.execute(f"SELECT rel_type, COUNT(*) FROM {TABLE} GROUP BY rel_type ORDER BY rel_type"))
+
+    def _add_columns(self, names, sample):
+        for name in names:
+            if name in self.columns or not re.fullmatch(r"\w+", name):
+                continue
+            self.conn.execute(f'ALTER TABLE {TABLE} ADD COLUMN "{name}" {_sql_type(sample.get(name))}')
+            self.columns.append(name)
+
+    # cross_sid is the loader's {from_sid: [(from_vid, props), ...]}, props carrying target_vid and
+    # target_sid; replace=True first drops the rows this label pair already has for rel_type
+    def add(self, from_label, rel_type, to_label, cross_sid, replace=False):
+        rows = [(from_sid, from_vid, props) for from_sid, batch in cross_sid.items() for from_vid, props in batch]
+        names = sorted({name for _, _, props in rows for name in props} - LOADER_KEYS)
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            if replace:
+                self.conn.execute(f"DELETE FROM {TABLE} WHERE rel_type = ? AND from_label = ? AND to_label = ?",
+                                  (rel_type, from_label, to_label))
+            if not rows:
+                return 0
+            self._add_columns(names, next((props for _, _, props in rows if names), {}))
+            names = [name for name in names if name in self.columns]
+            columns = KEY_COLUMNS + [f'"{name}"' for name in names]
+            self.conn.executemany(
+                f"INSERT INTO {TABLE} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                ((rel_type, from_label, to_label, from_vid, from_sid, props["target_vid"], props["target_sid"],
+                  *(_sql_value(props.get(name)) for name in names))
+                 for from_sid, from_vid, props in rows),
+            )
+        return len(rows)
+
+    # triples: (rel_type, from_label, to_label) to drop, everything when None; a type such as
+    # isLocatedIn spans several label pairs, and the other pairs' rows are kept
+    def clear(self, triples=None):
+        with self.conn:
+            if triples is None:
+                self.conn.execute(f"DELETE FROM {TABLE}")
+            else:
+                self.conn.executemany(
+                    f"DELETE FROM {TABLE} WHERE rel_type = ? AND from_label = ? AND to_label = ?", list(triples))
+
+    def _lookup(self, select, key, vids, rel_type):
+        for start in range(0, len(vids), LOOKUP_CHUNK):
+            part = vids[start:start + LOOKUP_CHUNK]
+            query = f"SELECT {select} FROM {TABLE} WHERE {key} IN ({', '.join('?' * len(part))})"
+            params = list(part)
+            if rel_type is not None:
+                query += " AND rel_type = ?"
+                params.append(rel_type)
+            yield from self.conn.execute(query, params)
+
+    # batched: (from_vids, neighbour_vids) for every cross edge touching vids, the
+    # neighbour being the other end; direction "out" follows edges from vids, "in" into them
+    def neighbors(self, vids, rel_type=None, direction="both"):
+        vids = np.unique(np.asarray(vids, dtype=np.int64)).tolist()
+        pairs = []
+        if direction in ("out", "both"):
+            pairs.extend(self._lookup("from_vid, to_vid", "from_vid", vids, rel_type))
+        if direction in ("in", "both"):
+            pairs.extend(self._lookup("to_vid, from_vid", "to_vid", vids, rel_type))
+        if not pairs:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        pairs = np.array(pairs, dtype=np.int64)
+        return pairs[:, 0], pairs[:, 1]
+
+    def _decode(self, row):
+        edge = dict(zip(self.columns, row))
+        for name, parse in self.parsers.items():
+            if edge.get(name) is not None:
+                edge[name] = parse(edge[name])
+        return edge
+
+    # full rows as dicts, typed properties included, for the edges leaving ("out") or entering ("in") vids
+    def edges(self, vids, rel_type=None, direction="out"):
+        vids = np.unique(np.asarray(vids, dtype=np.int64)).tolist()
+        key = "from_vid" if direction == "out" else "to_vid"
+        select = ", ".join(f'"{name}"' for name in self.columns)
+        return [self._decode(row) for row in self._lookup(select, key, vids, rel_type)]
+
+    # one CSV per relationship type with the typed columns, for tools that want files
+    def export_csv(self, out_dir):
+        os.makedirs(out_dir, exist_ok=True)
+        paths = []
+        select = ", ".join(f'"{name}"' for name in self.columns)
+        for rel_type in self.counts():
+            path = os.path.join(out_dir, f"{rel_type}_cross_instance.csv")
+            with open(path, "w", newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(self.columns)
+                writer.writerows(self.conn.execute(
+                    f"SELECT {select} FROM {TABLE} WHERE rel_type = ? ORDER BY from_vid, to_vid", (rel_type,)))
+            paths.append(path)
+        return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or export the cross-shard edge store.")
+    parser.add_argument("--store", default=STORE_FILE)
+    parser.add_argument("--export", metavar="DIR", help="write one CSV per relationship type to DIR")
+    args = parser.parse_args()
+    with CrossEdgeStore(args.store, readonly=True) as store:
+        for rel_type, count in store.counts().items():
+            print(f"{rel_type:<16} {count:>10}")
+        print(f"{len(store)} cross-shard edges in {args.store}")
+        if args.export:
+            for path in store.export_csv(args.export):
+                print(f"Wrote {path}")
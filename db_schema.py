@@ -0,0 +1,52 @@
+# Schema bootstrap shared by the loaders. Every label gets a uniqueness constraint on vid
+# before anything is pushed; its backing index is what MERGE/MATCH (n:Label {vid: ...})
+# use instead of scanning the label. Fresh loads use CREATE, so they first check the
+# target really is empty.
+
+
+class NotEmptyError(RuntimeError):
+    pass
+
+
+def vid_constraint(label):
+    return (f"CREATE CONSTRAINT {label.lower()}_vid_unique IF NOT EXISTS "
+            f"FOR (n:{label}) REQUIRE n.vid IS UNIQUE")
+
+
+# one schema statement per transaction, usable with execute_write or ShardPool.run_on_all
+def create_vid_constraint(tx, label):
+    tx.run(vid_constraint(label))
+
+
+def ensure_vid_constraints(session, labels):
+    for label in labels:
+        session.execute_write(create_vid_constraint, label)
+
+
+def has_nodes(tx, label=None):
+    pattern = f"(n:{label})" if label else "(n)"
+    return tx.run(f"MATCH {pattern} RETURN 1 LIMIT 1").single() is not None
+
+
+def has_relationships(tx, rel_type):
+    return tx.run(f"MATCH ()-[r:{rel_type}]->() RETURN 1 LIMIT 1").single() is not None
+
+
+def require_empty(session, where, rel_type=None):
+    if rel_type is None:
+        if session.execute_read(has_nodes):
+            raise NotEmptyError(f"{where} already has nodes; a fresh load needs an empty database")
+    elif session.execute_read(has_relationships, rel_type):
+        raise NotEmptyError(f"{where} already has {rel_type} relationships; a fresh load would duplicate them")
+
+
+# ShardPool variant: raises if any shard has data
+def require_empty_shards(pool, uris, rel_type=None):
+    if rel_type is None:
+        found = pool.run_on_all(has_nodes)
+    else:
+        found = pool.run_on_all(has_relationships, rel_type)
+    busy = [uris[sid] for sid, present in found.items() if present]
+    if busy:
+        what = "nodes" if rel_type is None else f"{rel_type} relationships"
+        raise NotEmptyError(f"{', '.join(busy)} already have {what}; a fresh load needs empty shards")
@@ -0,0 +1,243 @@
+import re
+import sys
+import asyncio
+import time
+import types
+import threading
+from collections import Counter
+
+# In-process stand-in for the neo4j driver used by the loaders. It accepts the same
+# driver/session/transaction calls, records every Cypher statement and counts the
+# rows sent in its UNWIND parameter. Optional per-statement and per-row latency
+# makes concurrency effects visible without a server.
+
+
+def _normalize(query):
+    return re.sub(r"\s+", " ", query).strip()
+
+
+def _unwind_rows(params):
+    for value in params.values():
+        if isinstance(value, list):
+            return len(value)
+    return 1
+
+
+class FakeCounters:
+    def __init__(self):
+        self.nodes_created = 0
+        self.relationships_created = 0
+        self.properties_set = 0
+
+
+class FakeSummary:
+    def __init__(self, query):
+        self.query = query
+        self.counters = FakeCounters()
+
+
+class FakeResult:
+    def __init__(self, query, records=None):
+        self.query = query
+        self.records = records or []
+
+    def consume(self):
+        return FakeSummary(self.query)
+
+    def data(self):
+        return [dict(r) for r in self.records]
+
+    def single(self):
+        return self.records[0] if self.records else None
+
+    def __iter__(self):
+        return iter(self.records)
+
+
+class Recorder:
+    def __init__(self, statement_latency=0.0, row_latency=0.0):
+        self.statement_latency = statement_latency
+        self.row_latency = row_latency
+        self.lock = threading.Lock()
+        self.per_uri = {}
+        self.queries = Counter()
+
+    def record(self, uri, query, params):
+        rows = _unwind_rows(params)
+        delay = self.statement_latency + self.row_latency * rows
+        if delay:
+            time.sleep(delay)
+        with self.lock:
+            stats = self.per_uri.setdefault(uri, {"statements": 0, "rows": 0})
+            stats["statements"] += 1
+            stats["rows"] += rows
+            self.queries[_normalize(query)] += 1
+
+    def totals(self):
+        with self.lock:
+            return {
+                "statements": sum(s["statements"] for s in self.per_uri.values()),
+                "rows": sum(s["rows"] for s in self.per_uri.values()),
+                "per_uri": {uri: dict(s) for uri, s in self.per_uri.items()},
+                "distinct_queries": len(self.queries),
+            }
+
+    def reset(self):
+        with self.lock:
+            self.per_uri.clear()
+            self.queries.clear()
+
+
+recorder = Recorder()
+
+
+class FakeTransaction:
+    def __init__(self, uri):
+        self.uri = uri
+
+    def run(self, query, parameters=None, **kwargs):
+        params = dict(parameters or {}, **kwargs)
+        recorder.record(self.uri, query, params)
+        return FakeResult(query)
+
+
+class FakeSession(FakeTransaction):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def execute_write(self, fn, *args, **kwargs):
+        return fn(FakeTransaction(self.uri), *args, **kwargs)
+
+    def execute_read(self, fn, *args, **kwargs):
+        return fn(FakeTransaction(self.uri), *args, **kwargs)
+
+    def close(self):
+        pass
+
+
+class FakeDriver:
+    def __init__(self, uri, **config):
+        self.uri = uri
+        self.config = config
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def session(self, **config):
+        return FakeSession(self.uri)
+
+    def verify_connectivity(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeGraphDatabase:
+    @staticmethod
+    def driver(uri, auth=None, **config):
+        return FakeDriver(uri, **config)
+
+
+class FakeAsyncResult(FakeResult):
+    async def consume(self):
+        return FakeSummary(self.query)
+
+    async def data(self):
+        return [dict(r) for r in self.records]
+
+    async def single(self):
+        return self.records[0] if self.records else None
+
+    def __aiter__(self):
+        return self._aiter()
+
+    async def _aiter(self):
+        for record in self.records:
+            yield record
+
+
+class FakeAsyncTransaction:
+    def __init__(self, uri):
+        self.uri = uri
+
+    async def run(self, query, parameters=None, **kwargs):
+        params = dict(parameters or {}, **kwargs)
+        rows = _unwind_rows(params)
+        delay = recorder.statement_latency + recorder.row_latency * rows
+        if delay:
+            await asyncio.sleep(delay)
+        with recorder.lock:
+            stats = recorder.per_uri.setdefault(self.uri, {"statements": 0, "rows": 0})
+            stats["statements"] += 1
+            stats["rows"] += rows
+            recorder.queries[_normalize(query)] += 1
+        return FakeAsyncResult(query)
+
+
+class FakeAsyncSession(FakeAsyncTransaction):
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def execute_write(self, fn, *args, **kwargs):
+        return await fn(FakeAsyncTransaction(self.uri), *args, **kwargs)
+
+    async def execute_read(self, fn, *args, **kwargs):
+        return await fn(FakeAsyncTransaction(self.uri), *args, **kwargs)
+
+    async def close(self):
+        pass
+
+
+class FakeAsyncDriver:
+    def __init__(self, uri, **config):
+        self.uri = uri
+        self.config = config
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def session(self, **config):
+        return FakeAsyncSession(self.uri)
+
+    async def close(self):
+        pass
+
+
+class FakeAsyncGraphDatabase:
+    @staticmethod
+    def driver(uri, auth=None, **config):
+        return FakeAsyncDriver(uri, **config)
+
+
+# Points GraphDatabase and AsyncGraphDatabase in the given modules at the fakes. If the
+# real driver is not installed, a minimal `neo4j` module is registered so the loaders can still be imported.
+def install(*modules, statement_latency=0.0, row_latency=0.0):
+    recorder.statement_latency = statement_latency
+    recorder.row_latency = row_latency
+    if "neo4j" not in sys.modules:
+        try:
+            import neo4j  # noqa: F401
+        except ImportError:
+            stub = types.ModuleType("neo4j")
+            stub.GraphDatabase = FakeGraphDatabase
+            stub.AsyncGraphDatabase = FakeAsyncGraphDatabase
+            sys.modules["neo4j"] = stub
+    for module in modules:
+        if hasattr(module, "GraphDatabase"):
+            module.GraphDatabase = FakeGraphDatabase
+        if hasattr(module, "AsyncGraphDatabase"):
+            module.AsyncGraphDatabase = FakeAsyncGraphDatabase
+    return recorder
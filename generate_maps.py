@@ -1,11 +1,21 @@
 #1
 import os
-import csv
+import time
+import argparse
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from vid_store import write_vid_map, export_vid_map, open_vid_map, map_exists, write_delta
+from columnar import writes_csv, write_csv
+from ldbc_reader import iter_column_chunks
+from instrumentation import metrics
 
 SOCIAL_NETWORK_DIR = "import/social_network"
 EXPORT_VID_MAP_DIR = "partitioned_vids"
 VID_COUNTER_FILE = "vid_counter.txt"
+DELTA_DIR = os.path.join(EXPORT_VID_MAP_DIR, "deltas")
+# byte-range size for --workers; files smaller than workers * CHUNK_BYTES are still split per worker
+CHUNK_BYTES = 64 * 2**20
 
 # NODE_FILES = {
 #     "organisation_0_0.csv": ("Organisation", ["type", "name", "url"]),
@@ -15,12 +25,12 @@ NODE_FILES = {
     "person_0_0.csv": ("Person", [
         "firstName", "lastName", "gender", "birthday","creationDate", "locationIP", "browserUsed"
     ]),
-    # "post_0_0.csv": ("Post", [
-    #     "imageFile", "creationDate", "locationIP", "browserUsed","language", "content", "length"
-    # ]),
-    # "comment_0_0.csv": ("Comment", [
-    #     "creationDate", "locationIP", "browserUsed","content", "length"
-    # ]),
+    "post_0_0.csv": ("Post", [
+        "imageFile", "creationDate", "locationIP", "browserUsed","language", "content", "length"
+    ]),
+    "comment_0_0.csv": ("Comment", [
+        "creationDate", "locationIP", "browserUsed","content", "length"
+    ]),
     "place_0_0.csv": ("Place", [
         "name", "url", "type"
     ]),
@@ -58,40 +68,209 @@ def assign_vid(label, original_id):
     id_to_vid_map[label][original_id] = vid
     return vid
 
-def export_vid_maps():
+def write_label_map(label, original_ids, vids):
     os.makedirs(EXPORT_VID_MAP_DIR, exist_ok=True)
+    outpath = os.path.join(EXPORT_VID_MAP_DIR, f"{label.lower()}_vid_map.csv")
+    export_vid_map(outpath, original_ids, vids)
+    print(f"Exported VID map for {label} to {outpath}")
+
+def export_vid_maps():
     for label, mapping in id_to_vid_map.items():
-        outpath = os.path.join(EXPORT_VID_MAP_DIR, f"{label.lower()}_vid_map.csv")
-        with open(outpath, "w", newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(["original_id", "vid"])
-            for original_id, vid in mapping.items():
-                writer.writerow([original_id, vid])
-        print(f"Exported VID map for {label} to {outpath}")
+        write_label_map(label, list(mapping.keys()), list(mapping.values()))
 
-def load_nodes_for(label, filename):
-    filepath = None
+def find_node_file(filename):
     for subfolder in ["static", "dynamic"]:
         dir = os.path.join(SOCIAL_NETWORK_DIR, subfolder)
         file_path_candidate = os.path.join(dir, filename)
         if os.path.exists(file_path_candidate):
-            filepath = file_path_candidate
-            break
+            return file_path_candidate
+    return None
 
+def load_nodes_for(label, filename):
+    filepath = find_node_file(filename)
     if not filepath:
         print(f"File {filename} not found.")
         return
 
+    # only the id column is parsed, Post/Comment content is never held
     print(f"Reading IDs for {label} from {filepath}")
-    with open(filepath, newline='', encoding='utf-8') as f:
-        reader = csv.DictReader(f, delimiter='|')
-        for row in reader:
-            original_id = int(row["id"])
+    for chunk in iter_column_chunks(filepath, ["id"]):
+        for original_id in chunk["id"].tolist():
             assign_vid(label, original_id)
 
+# --workers: files are cut into line-aligned byte ranges; workers count the rows of each
+# range, a prefix sum over (file, range) order gives every range its first vid, and workers
+# then parse the ids and assign vids. The maps match a sequential run exactly.
+def byte_ranges(filepath, parts):
+    size = os.path.getsize(filepath)
+    with open(filepath, "rb") as f:
+        header = f.readline().decode("utf-8").rstrip("\r\n").split("|")
+        bounds = [f.tell()]
+        step = max((size - bounds[0]) // max(parts, 1), 1)
+        while bounds[-1] + step < size:
+            f.seek(bounds[-1] + step)
+            f.readline()
+            if f.tell() >= size:
+                break
+            bounds.append(f.tell())
+    bounds.append(size)
+    return header.index("id"), list(zip(bounds[:-1], bounds[1:]))
+
+# non-blank lines of a range, as the sequential reader sees them
+def _range_lines(filepath, start, end):
+    with open(filepath, "rb") as f:
+        f.seek(start)
+        return [line for line in f.read(end - start).split(b"\n") if line.strip()]
+
+def count_range(task):
+    filepath, start, end = task
+    return len(_range_lines(filepath, start, end))
+
+def assign_range(task):
+    filepath, start, end, id_col, first_vid = task
+    fields = [line.split(b"|", id_col + 1)[id_col].strip() for line in _range_lines(filepath, start, end)]
+    ids = np.array(fields).astype(np.int64) if fields else np.empty(0, dtype=np.int64)
+    return ids, np.arange(first_vid, first_vid + len(ids), dtype=np.int64)
+
+# what the id_to_vid_map dict holds after assign_vid: keys in first-seen order, the vid
+# of their last occurrence
+def dict_order(ids, vids):
+    _, first = np.unique(ids, return_index=True)
+    if len(first) == len(ids):
+        return ids, vids
+    _, last_reversed = np.unique(ids[::-1], return_index=True)
+    last = len(ids) - 1 - last_reversed
+    order = np.argsort(first)
+    return ids[first[order]], vids[last[order]]
+
+def assign_vids_parallel(workers, first_vid):
+    tasks = []
+    for filename, (label, _) in NODE_FILES.items():
+        filepath = find_node_file(filename)
+        if not filepath:
+            print(f"File {filename} not found.")
+            continue
+        parts = max(workers, -(-os.path.getsize(filepath) // CHUNK_BYTES))
+        id_col, ranges = byte_ranges(filepath, parts)
+        print(f"Reading IDs for {label} from {filepath} in {len(ranges)} ranges")
+        tasks.extend((label, filepath, start, end, id_col) for start, end in ranges)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        counts = list(pool.map(count_range, [(filepath, start, end) for _, filepath, start, end, _ in tasks]))
+        starts = first_vid + np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int64)
+        results = pool.map(assign_range, [(filepath, start, end, id_col, int(vid))
+                                          for (_, filepath, start, end, id_col), vid in zip(tasks, starts)])
+        per_label = defaultdict(list)
+        for (label, *_), result in zip(tasks, results):
+            per_label[label].append(result)
+
+    for label, parts in per_label.items():
+        ids = np.concatenate([ids for ids, _ in parts])
+        if not len(ids):
+            continue
+        ids, vids = dict_order(ids, np.concatenate([vids for _, vids in parts]))
+        write_label_map(label, ids.tolist(), vids.tolist())
+    return first_vid + int(sum(counts))
+
+def vid_map_path(label):
+    return os.path.join(EXPORT_VID_MAP_DIR, f"{label.lower()}_vid_map.csv")
+
+# ids in filepath that are not in the existing map, in file order, without repeats
+def unseen_ids(filepath, existing):
+    new_ids = []
+    seen = set()
+    for chunk in iter_column_chunks(filepath, ["id"]):
+        ids = chunk["id"]
+        if existing is not None:
+            _, found = existing.lookup(ids)
+            ids = ids[~found]
+        for original_id in ids.tolist():
+            if original_id not in seen:
+                seen.add(original_id)
+                new_ids.append(original_id)
+    return new_ids
+
+# assigns vids only to original ids not already mapped, appends them to the map files
+# and records them in a delta file the loaders can push on their own
+def update_vid_maps_incremental(delta_dir=DELTA_DIR):
+    global vid_counter
+    os.makedirs(EXPORT_VID_MAP_DIR, exist_ok=True)
+    os.makedirs(delta_dir, exist_ok=True)
+
+    existing_maps = {}
+    for filename, (label, _) in NODE_FILES.items():
+        path = vid_map_path(label)
+        if map_exists(path):
+            existing_maps[label] = open_vid_map(path)
+
+    # keep the counter ahead of every vid already handed out
+    max_vid = max((int(m.vids.max()) for m in existing_maps.values() if len(m)), default=0)
+    if vid_counter <= max_vid:
+        print(f"vid counter {vid_counter} is behind existing maps, moving it to {max_vid + 1}")
+        vid_counter = max_vid + 1
+
+    delta_rows = []
+    for filename, (label, _) in NODE_FILES.items():
+        filepath = find_node_file(filename)
+        if not filepath:
+            print(f"File {filename} not found.")
+            continue
+
+        existing = existing_maps.get(label)
+        new_ids = unseen_ids(filepath, existing)
+        if not new_ids:
+            print(f"No new {label} vertices in {filepath}")
+            continue
+
+        new_vids = list(range(vid_counter, vid_counter + len(new_ids)))
+        vid_counter += len(new_ids)
+
+        path = vid_map_path(label)
+        if writes_csv():
+            write_csv(path, {"original_id": np.asarray(new_ids, dtype=np.int64),
+                             "vid": np.asarray(new_vids, dtype=np.int64)}, append=True)
+
+        if existing is not None:
+            write_vid_map(path, np.concatenate([existing.ids, new_ids]), np.concatenate([existing.vids, new_vids]))
+        else:
+            write_vid_map(path, new_ids, new_vids)
+        delta_rows.extend((label, original_id, vid) for original_id, vid in zip(new_ids, new_vids))
+        print(f"Assigned {len(new_ids)} new vids for {label} ({new_vids[0]}..{new_vids[-1]})")
+
+    delta_path = None
+    if delta_rows:
+        delta_path = os.path.join(delta_dir, f"delta_{time.strftime('%Y%m%d_%H%M%S')}.csv")
+        write_delta(delta_path, delta_rows)
+        print(f"Wrote {len(delta_rows)} new vertices to {delta_path}")
+    return delta_path
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--incremental", action="store_true",
+                        help="only assign vids to unseen ids, append to the maps and write a delta file")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes for counting and assigning; the maps are the same as with one")
+    args = parser.parse_args()
+    if args.incremental and args.workers > 1:
+        parser.error("--incremental runs in one process")
+
+    metrics.start("generate_maps")
     vid_counter = load_vid_counter()
-    for filename, (label, _) in NODE_FILES.items():
-        load_nodes_for(label, filename)
-    export_vid_maps()
+    if args.incremental:
+        with metrics.stage("assign_incremental"):
+            update_vid_maps_incremental()
+    elif args.workers > 1:
+        with metrics.stage("assign_parallel") as stage:
+            first = vid_counter
+            vid_counter = assign_vids_parallel(args.workers, vid_counter)
+            stage["rows"] = vid_counter - first
+    else:
+        for filename, (label, _) in NODE_FILES.items():
+            with metrics.stage("read_ids", label) as stage:
+                first = vid_counter
+                load_nodes_for(label, filename)
+                stage["rows"] = vid_counter - first
+        with metrics.stage("export_vid_maps"):
+            export_vid_maps()
     save_vid_counter()
+    metrics.finish()
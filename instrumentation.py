@@ -0,0 +1,230 @@
+import os
+import sys
+import json
+import time
+import resource
+import threading
+from contextlib import contextmanager
+
+# Run metrics shared by every script. Stages (reading a file, pushing a label, a METIS
+# run, ...) are timed with `with metrics.stage(name, item):`; every write batch that goes
+# through AdaptiveBatcher or ShardPool is timed and the server's result summary counters
+# are added up per batcher, so rows sent can be compared with nodes/relationships created
+# (a MERGE that matches creates nothing). Nothing is written until a script calls
+# metrics.start(); then each stage and batch is appended to a JSON-lines log and
+# metrics.finish() writes a Prometheus textfile (node_exporter textfile collector format).
+
+METRICS_DIR = os.path.join("graph_outputs", "metrics")
+PREFIX = "ldbc_loader"
+
+# ResultSummary.counters fields that are summed per batcher
+COUNTERS = (
+    "nodes_created", "nodes_deleted", "relationships_created", "relationships_deleted",
+    "properties_set", "labels_added", "indexes_added", "constraints_added",
+)
+
+# batch latency histogram buckets in seconds, around adaptive_batch.TARGET_SECONDS
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak /= 1024
+    return peak / 1024
+
+
+# accepts a ResultSummary, its counters, or anything else (returns {})
+def counters_of(result):
+    counters = getattr(result, "counters", result)
+    if counters is None or isinstance(counters, (int, float, str, bool)):
+        return {}
+    found = {}
+    for name in COUNTERS:
+        value = getattr(counters, name, 0)
+        if isinstance(value, int) and value:
+            found[name] = value
+    return found
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.script = None
+        self.log = None
+        self.log_path = None
+        self.prom_path = None
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.batches = {}
+
+    def start(self, script, metrics_dir=METRICS_DIR):
+        os.makedirs(metrics_dir, exist_ok=True)
+        with self.lock:
+            if self.log is not None:
+                self.log.close()
+            self.script = script
+            self.log_path = os.path.join(metrics_dir, f"{script}.jsonl")
+            self.prom_path = os.path.join(metrics_dir, f"{script}.prom")
+            self.log = open(self.log_path, "a", buffering=1, encoding="utf-8")
+            self.started = time.perf_counter()
+            self.stages.clear()
+            self.batches.clear()
+        self._write({"event": "start", "argv": sys.argv[1:]})
+
+    def _write(self, record):
+        with self.lock:
+            if self.log is None:
+                return
+            record = dict({"ts": round(time.time(), 3), "script": self.script}, **record)
+            self.log.write(json.dumps(record) + "\n")
+
+    # times the block; the caller may set stage["rows"] to report how much it handled
+    @contextmanager
+    def stage(self, name, item=""):
+        stage = {"rows": 0}
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            yield stage
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            peak = peak_rss_mb()
+            with self.lock:
+                totals = self.stages.setdefault((name, item), {"seconds": 0.0, "rows": 0, "runs": 0})
+                totals["seconds"] += elapsed
+                totals["rows"] += stage["rows"]
+                totals["runs"] += 1
+            self._write({"event": "stage", "stage": name, "item": item, "status": status,
+                         "seconds": round(elapsed, 4), "rows": stage["rows"], "peak_rss_mb": round(peak, 1)})
+
+    # one committed write batch; result is whatever the write returned (a ResultSummary
+    # from .consume() carries the counters)
+    def batch(self, name, rows, seconds, result=None, sid=None):
+        counters = counters_of(result)
+        with self.lock:
+            totals = self.batches.get(name)
+            if totals is None:
+                totals = self.batches[name] = {
+                    "batches": 0, "rows": 0, "seconds": 0.0, "max_seconds": 0.0,
+                    "buckets": [0] * len(BUCKETS), "counters": dict.fromkeys(COUNTERS, 0),
+                }
+            totals["batches"] += 1
+            totals["rows"] += rows
+            totals["seconds"] += seconds
+            totals["max_seconds"] = max(totals["max_seconds"], seconds)
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    totals["buckets"][i] += 1
+            for key, value in counters.items():
+                totals["counters"][key] += value
+            logging = self.log is not None
+        if logging:
+            record = {"event": "batch", "name": name, "rows": rows, "seconds": round(seconds, 4)}
+            if sid is not None:
+                record["sid"] = sid
+            record.update(counters)
+            self._write(record)
+
+    # wraps a write(batch) callable so each call is recorded as a batch
+    def timed(self, name, write, sid=None):
+        def timed_write(batch):
+            started = time.perf_counter()
+            result = write(batch)
+            self.batch(name, len(batch), time.perf_counter() - started, result, sid)
+            return result
+        return timed_write
+
+    def prometheus(self):
+        script = self.script or os.path.splitext(os.path.basename(sys.argv[0]))[0] or "python"
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{PREFIX}_{name}{labels} {value}")
+
+        with self.lock:
+            stages = sorted(self.stages.items())
+            batches = sorted(self.batches.items())
+        stage_labels = [(_labels(script=script, stage=name, item=item), totals) for (name, item), totals in stages]
+        batch_labels = [(name, _labels(script=script, name=name), totals) for name, totals in batches]
+
+        metric("run_seconds", "gauge", "Wall time since the run started.",
+               [(_labels(script=script), round(time.perf_counter() - self.started, 3))])
+        metric("peak_rss_bytes", "gauge", "Resident set size high-water mark of the process.",
+               [(_labels(script=script), int(peak_rss_mb() * 2**20))])
+        metric("stage_seconds_total", "counter", "Wall time spent in each stage.",
+               [(labels, round(t["seconds"], 4)) for labels, t in stage_labels])
+        metric("stage_rows_total", "counter", "Rows handled by each stage.",
+               [(labels, t["rows"]) for labels, t in stage_labels])
+        metric("batches_total", "counter", "Committed write batches.",
+               [(labels, t["batches"]) for _, labels, t in batch_labels])
+        metric("batch_rows_total", "counter", "Rows sent in committed write batches.",
+               [(labels, t["rows"]) for _, labels, t in batch_labels])
+        metric("batch_seconds_max", "gauge", "Slowest commit.",
+               [(labels, round(t["max_seconds"], 4)) for _, labels, t in batch_labels])
+
+        lines.append(f"# HELP {PREFIX}_batch_seconds Commit latency of write batches.")
+        lines.append(f"# TYPE {PREFIX}_batch_seconds histogram")
+        for name, _, t in batch_labels:
+            for bound, count in zip(BUCKETS, t["buckets"]):
+                lines.append(f"{PREFIX}_batch_seconds_bucket{_labels(script=script, name=name, le=bound)} {count}")
+            lines.append(f"{PREFIX}_batch_seconds_bucket{_labels(script=script, name=name, le='+Inf')} {t['batches']}")
+            lines.append(f"{PREFIX}_batch_seconds_sum{_labels(script=script, name=name)} {round(t['seconds'], 4)}")
+            lines.append(f"{PREFIX}_batch_seconds_count{_labels(script=script, name=name)} {t['batches']}")
+
+        for counter in COUNTERS:
+            metric(f"neo4j_{counter}_total", "counter", f"Sum of the {counter} result summary counter.",
+                   [(labels, t["counters"][counter]) for _, labels, t in batch_labels])
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path=None):
+        path = path or self.prom_path
+        if path is None:
+            return None
+        # textfile collectors may read at any time, so replace the file atomically
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+        os.replace(tmp, path)
+        return path
+
+    def print_summary(self):
+        with self.lock:
+            batches = sorted(self.batches.items())
+        if not batches:
+            return
+        print(f"{'writes':<36} {'batches':>8} {'rows':>10} {'seconds':>9} {'created':>10} {'props set':>10}")
+        for name, t in batches:
+            created = t["counters"]["nodes_created"] + t["counters"]["relationships_created"]
+            print(f"{name[:36]:<36} {t['batches']:>8} {t['rows']:>10} {t['seconds']:>9.1f} "
+                  f"{created:>10} {t['counters']['properties_set']:>10}")
+
+    def finish(self):
+        self._write({"event": "finish", "seconds": round(time.perf_counter() - self.started, 3),
+                     "peak_rss_mb": round(peak_rss_mb(), 1)})
+        path = self.write_prometheus()
+        with self.lock:
+            if self.log is not None:
+                self.log.close()
+                self.log = None
+        if path:
+            self.print_summary()
+            print(f"Metrics written to {self.log_path} and {path}")
+
+
+metrics = Metrics()
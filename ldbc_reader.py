@@ -0,0 +1,132 @@
+from datetime import date, datetime, timezone
+from itertools import islice
+import numpy as np
+from ldbc_schema import ID, INT, STR, DATE, DATETIME, EDGE_KEYS, columns_for
+
+# LDBC CsvBasic files are '|' separated with no quoting, so lines are split directly
+# and each projected column is converted in one pass per chunk.
+DELIMITER = "|"
+CHUNK_ROWS = 100_000
+
+
+def parse_datetime(value):
+    if value.isdigit():  # epoch millis in some datagen outputs
+        return datetime.fromtimestamp(int(value) / 1000, tz=timezone.utc)
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%f%z")
+
+
+PARSERS = {
+    ID: int,
+    INT: int,
+    STR: str,
+    DATE: date.fromisoformat,
+    DATETIME: parse_datetime,
+}
+
+
+def _convert(values, kind):
+    if kind == STR:
+        return list(values)
+    parse = PARSERS[kind]
+    return [parse(v) if v else None for v in values]
+
+
+def _convert_array(values, kind):
+    if kind in (ID, INT):
+        try:
+            return np.array(values).astype(np.int64)
+        except ValueError:
+            pass
+    return _convert(values, kind)
+
+
+def schema_columns(path, header):
+    try:
+        columns = columns_for(path)
+    except KeyError:
+        # unknown relationship file: two id columns, string properties
+        columns = EDGE_KEYS + [(name, STR) for name in header[2:]]
+    if len(header) < len(columns):
+        raise ValueError(f"{path}: header has {len(header)} columns, schema expects {len(columns)}")
+    return columns
+
+
+def _iter_raw(path, columns, chunk_rows):
+    with open(path, newline='', encoding='utf-8') as f:
+        header = f.readline().rstrip("\r\n").split(DELIMITER)
+        schema = schema_columns(path, header)
+        names = [name for name, _ in schema]
+        wanted = names if columns is None else list(columns)
+        positions = [names.index(name) for name in wanted]
+        kinds = [schema[p][1] for p in positions]
+
+        # zip(*rows) would cut every column to the shortest row, so a ragged line is an error
+        line_no = 1
+        while True:
+            lines = list(islice(f, chunk_rows))
+            if not lines:
+                break
+            rows = []
+            for line_no, line in enumerate(lines, line_no + 1):
+                if not line.strip():
+                    continue
+                row = line.rstrip("\r\n").split(DELIMITER)
+                if len(row) != len(header):
+                    raise ValueError(f"{path}, line {line_no}: {len(row)} columns, header has {len(header)}")
+                rows.append(row)
+            if not rows:
+                continue
+            raw = list(zip(*rows))
+            yield wanted, kinds, [raw[p] for p in positions]
+
+
+# yields {column: values}; id/int columns come back as int64 arrays
+def iter_column_chunks(path, columns=None, chunk_rows=CHUNK_ROWS):
+    for names, kinds, raw in _iter_raw(path, columns, chunk_rows):
+        yield {name: _convert_array(values, kind) for name, kind, values in zip(names, kinds, raw)}
+
+
+# {field: parser} for the non-string properties of an LDBC file, e.g. to type the
+# fields of a csv.DictReader row the way the relationship reader does
+def field_parsers(path):
+    try:
+        columns = columns_for(path)
+    except KeyError:
+        return {}
+    return {name: PARSERS[kind] for name, kind in columns if kind not in (ID, STR)}
+
+
+# the named fields of one row, typed by parsers; empty typed values become None
+def typed_fields(row, fields, parsers):
+    props = {}
+    for field in fields:
+        val = row.get(field)
+        if field in parsers:
+            val = parsers[field](val) if val else None
+        props[field] = val
+    return props
+
+
+def _as_list(values):
+    return values.tolist() if isinstance(values, np.ndarray) else values
+
+
+def property_names(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        header = f.readline().rstrip("\r\n").split(DELIMITER)
+    return [name for name, _ in schema_columns(path, header)[2:]]
+
+
+# yields (from_ids, to_ids, props) per chunk; props is a list of dicts aligned with the id arrays
+def iter_edge_chunks(path, chunk_rows=CHUNK_ROWS):
+    prop_names = property_names(path)
+    for chunk in iter_column_chunks(path, ["from_id", "to_id"] + prop_names, chunk_rows):
+        prop_columns = [_as_list(chunk[name]) for name in prop_names]
+        if prop_columns:
+            props = [dict(zip(prop_names, values)) for values in zip(*prop_columns)]
+        else:
+            props = [{} for _ in range(len(chunk["from_id"]))]
+        yield chunk["from_id"], chunk["to_id"], props
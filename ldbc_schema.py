@@ -0,0 +1,85 @@
+import os
+import re
+
+# Column types used by ldbc_reader
+ID = "id"
+INT = "int"
+STR = "str"
+DATE = "date"
+DATETIME = "datetime"
+
+# LDBC SNB CsvBasic entity files: stem -> (label, [(column, type), ...]) in file order
+NODE_SCHEMA = {
+    "person": ("Person", [
+        ("id", ID), ("firstName", STR), ("lastName", STR), ("gender", STR), ("birthday", DATE),
+        ("creationDate", DATETIME), ("locationIP", STR), ("browserUsed", STR),
+    ]),
+    "post": ("Post", [
+        ("id", ID), ("imageFile", STR), ("creationDate", DATETIME), ("locationIP", STR),
+        ("browserUsed", STR), ("language", STR), ("content", STR), ("length", INT),
+    ]),
+    "comment": ("Comment", [
+        ("id", ID), ("creationDate", DATETIME), ("locationIP", STR), ("browserUsed", STR),
+        ("content", STR), ("length", INT),
+    ]),
+    "forum": ("Forum", [("id", ID), ("title", STR), ("creationDate", DATETIME)]),
+    "place": ("Place", [("id", ID), ("name", STR), ("url", STR), ("type", STR)]),
+    "organisation": ("Organisation", [("id", ID), ("type", STR), ("name", STR), ("url", STR)]),
+    "tag": ("Tag", [("id", ID), ("name", STR), ("url", STR)]),
+    "tagclass": ("TagClass", [("id", ID), ("name", STR), ("url", STR)]),
+}
+
+# relationship files: stem -> (from_label, rel_type, to_label, [(property, type), ...])
+# the two leading id columns are always from_id and to_id
+RELATIONSHIP_SCHEMA = {
+    "organisation_isLocatedIn_place": ("Organisation", "isLocatedIn", "Place", []),
+    "place_isPartOf_place": ("Place", "isPartOf", "Place", []),
+    "tag_hasType_tagclass": ("Tag", "hasType", "TagClass", []),
+    "tagclass_isSubclassOf_tagclass": ("TagClass", "isSubclassOf", "TagClass", []),
+    "person_knows_person": ("Person", "knows", "Person", [("creationDate", DATETIME)]),
+    "person_isLocatedIn_place": ("Person", "isLocatedIn", "Place", []),
+    "person_hasInterest_tag": ("Person", "hasInterest", "Tag", []),
+    "person_studyAt_organisation": ("Person", "studyAt", "Organisation", [("classYear", INT)]),
+    "person_workAt_organisation": ("Person", "workAt", "Organisation", [("workFrom", INT)]),
+    "person_likes_post": ("Person", "likes", "Post", [("creationDate", DATETIME)]),
+    "person_likes_comment": ("Person", "likes", "Comment", [("creationDate", DATETIME)]),
+    "forum_hasModerator_person": ("Forum", "hasModerator", "Person", []),
+    "forum_hasMember_person": ("Forum", "hasMember", "Person", [("joinDate", DATETIME)]),
+    "forum_hasTag_tag": ("Forum", "hasTag", "Tag", []),
+    "forum_containerOf_post": ("Forum", "containerOf", "Post", []),
+    "post_hasCreator_person": ("Post", "hasCreator", "Person", []),
+    "post_hasTag_tag": ("Post", "hasTag", "Tag", []),
+    "post_isLocatedIn_place": ("Post", "isLocatedIn", "Place", []),
+    "comment_hasCreator_person": ("Comment", "hasCreator", "Person", []),
+    "comment_hasTag_tag": ("Comment", "hasTag", "Tag", []),
+    "comment_isLocatedIn_place": ("Comment", "isLocatedIn", "Place", []),
+    "comment_replyOf_post": ("Comment", "replyOf", "Post", []),
+    "comment_replyOf_comment": ("Comment", "replyOf", "Comment", []),
+}
+
+EDGE_KEYS = [("from_id", ID), ("to_id", ID)]
+
+
+def file_stem(filename):
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return re.sub(r"_\d+_\d+$", "", stem)
+
+
+def is_relationship_file(filename):
+    return file_stem(filename) in RELATIONSHIP_SCHEMA
+
+
+def columns_for(filename):
+    stem = file_stem(filename)
+    if stem in NODE_SCHEMA:
+        return NODE_SCHEMA[stem][1]
+    if stem in RELATIONSHIP_SCHEMA:
+        return EDGE_KEYS + RELATIONSHIP_SCHEMA[stem][3]
+    raise KeyError(f"No LDBC schema for {filename}")
+
+
+def relationship_for(filename):
+    stem = file_stem(filename)
+    if stem not in RELATIONSHIP_SCHEMA:
+        raise KeyError(f"No LDBC relationship schema for {filename}")
+    return RELATIONSHIP_SCHEMA[stem]
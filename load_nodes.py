@@ -1,23 +1,36 @@
 import os
 import csv
+import time
+import argparse
 from collections import defaultdict
 from neo4j import GraphDatabase
+import numpy as np
+from vid_store import export_vid_map, write_vid_map, open_vid_map, map_exists, read_delta
+from columnar import writes_csv, write_csv
+from ldbc_reader import field_parsers, typed_fields
+from adaptive_batch import AdaptiveBatcher
+from db_schema import ensure_vid_constraints, require_empty
+from instrumentation import metrics, peak_rss_mb
+from async_pipeline import run_pipeline
 
 URI = "neo4j://localhost:7687"
 AUTH = ("neo4j", "playground")
 SOCIAL_NETWORK_DIR = "import/social_network" 
+VID_MAP_DIR = "social_network/id_to_vid_maps"
+# concurrent async sessions for the pipelined load
+WORKERS = 4
 
 # "nodes" and their corresponding labels + fields
 NODE_FILES = {
     "person_0_0.csv": ("Person", [
         "firstName", "lastName", "gender", "birthday","creationDate", "locationIP", "browserUsed"
     ]),
-    # "post_0_0.csv": ("Post", [
-    #     "imageFile", "creationDate", "locationIP", "browserUsed","language", "content", "length"
-    # ]),
-    # "comment_0_0.csv": ("Comment", [
-    #     "creationDate", "locationIP", "browserUsed","content", "length"
-    # ]),
+    "post_0_0.csv": ("Post", [
+        "imageFile", "creationDate", "locationIP", "browserUsed","language", "content", "length"
+    ]),
+    "comment_0_0.csv": ("Comment", [
+        "creationDate", "locationIP", "browserUsed","content", "length"
+    ]),
     "place_0_0.csv": ("Place", [
         "name", "url", "type"
     ]),
@@ -38,6 +51,8 @@ NODE_FILES = {
 # Global counter and maps
 vid_counter = 1
 id_to_vid_map = defaultdict(dict) 
+# maps of an earlier full load, used by --delta
+existing_vid_maps = {}
 
 def assign_vid(label, original_id):
     global vid_counter
@@ -47,22 +62,50 @@ def assign_vid(label, original_id):
     return vid
 
 
-def export_vid_maps(output_dir="social_network/id_to_vid_maps"):
+def vid_map_path(label, output_dir=VID_MAP_DIR):
+    return os.path.join(output_dir, f"{label.lower()}_vid_map.csv")
+
+
+def export_vid_maps(output_dir=VID_MAP_DIR):
     os.makedirs(output_dir, exist_ok=True)
     for label, mapping in id_to_vid_map.items():
-        filename = f"{label.lower()}_vid_map.csv"
-        filepath = os.path.join(output_dir, filename)
-        with open(filepath, "w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow(["original_id", "vid"])
-            for original_id, vid in mapping.items():
-                writer.writerow([original_id, vid])
+        filepath = vid_map_path(label, output_dir)
+        export_vid_map(filepath, list(mapping.keys()), list(mapping.values()))
         print(f"Exported {label} vid map to {filepath}")
 
 
-def load_all_nodes():
-    nodes_to_create = []
+# A delta file comes from generate_maps --incremental and carries partitioned_vids
+# numbering, which this instance does not use. Only its original ids are taken: ids
+# already in our maps keep their vid, the others get new ones after our largest.
+def open_existing_vid_maps(output_dir=VID_MAP_DIR):
+    global vid_counter
+    for label, _ in NODE_FILES.values():
+        path = vid_map_path(label, output_dir)
+        if map_exists(path):
+            existing_vid_maps[label] = open_vid_map(path)
+    if not existing_vid_maps:
+        raise FileNotFoundError(f"--delta needs the maps of a full load in {output_dir}")
+    vid_counter = 1 + max((int(m.vids.max()) for m in existing_vid_maps.values() if len(m)), default=0)
+
+
+# appends the vids assigned by a delta load to the maps of the full load
+def append_vid_maps(output_dir=VID_MAP_DIR):
+    os.makedirs(output_dir, exist_ok=True)
+    for label, mapping in id_to_vid_map.items():
+        filepath = vid_map_path(label, output_dir)
+        new_ids = np.fromiter(mapping.keys(), dtype=np.int64, count=len(mapping))
+        new_vids = np.fromiter(mapping.values(), dtype=np.int64, count=len(mapping))
+        if writes_csv():
+            write_csv(filepath, {"original_id": new_ids, "vid": new_vids}, append=True)
+        existing = existing_vid_maps.get(label)
+        if existing is not None:
+            write_vid_map(filepath, np.concatenate([existing.ids, new_ids]), np.concatenate([existing.vids, new_vids]))
+        else:
+            write_vid_map(filepath, new_ids, new_vids)
+        print(f"Appended {len(new_ids)} {label} vids to {filepath}")
 
+
+def find_node_files():
     for subfolder in ["static", "dynamic"]:
         dir = os.path.join(SOCIAL_NETWORK_DIR, subfolder)
         for filename in os.listdir(dir):
@@ -70,24 +113,30 @@ def load_all_nodes():
                 continue
 
             label, fields = NODE_FILES[filename]
-            filepath = os.path.join(dir, filename)
-            print(f"Loadin {label} nodes from {filename}")
+            yield label, fields, os.path.join(dir, filename)
+
 
-            with open(filepath, newline='', encoding='utf-8') as f:
-                reader = csv.DictReader(f, delimiter='|')
-                for row in reader:
-                    original_id = int(row["id"])
-                    vid = assign_vid(label, original_id)
+# with a delta map only the vertices listed in it are yielded, numbered by our own maps
+def iter_nodes(label, fields, filepath, delta_map=None):
+    existing = existing_vid_maps.get(label)
+    parsers = field_parsers(filepath)
+    with open(filepath, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f, delimiter='|')
+        for row in reader:
+            original_id = int(row["id"])
+            if delta_map is None:
+                vid = assign_vid(label, original_id)
+            else:
+                if original_id not in delta_map:
+                    continue
+                vid = existing.get(original_id) if existing is not None else None
+                if vid is None:
+                    vid = id_to_vid_map[label].get(original_id) or assign_vid(label, original_id)
 
-                    node_props = {"vid": vid}
-                    for field in fields:
-                        val = row.get(field)
-                        if val and field in ["length"]:  # convert numeric
-                            val = int(val)
-                        node_props[field] = val
-                    nodes_to_create.append((label, node_props))
+            node_props = {"vid": vid}
+            node_props.update(typed_fields(row, fields, parsers))  # ints and dates per ldbc_schema
+            yield node_props
 
-    return nodes_to_create
 
 # def push_nodes_to_neo4j(data):
 #     with GraphDatabase.driver(URI, auth=AUTH) as driver:
@@ -101,28 +150,112 @@ def load_all_nodes():
 #     print(f"Pushed {len(data)} nodes to Neo4j.")
 
 
-def push_nodes_to_neo4j_batched(data, batch_size=500):
-    grouped = defaultdict(list)
-    for label, props in data:
-        grouped[label].append(props)
+def node_statement(label, fresh=False):
+    if fresh:
+        return f"UNWIND $batch AS row CREATE (n:{label}) SET n = row"
+    return f"UNWIND $batch AS row MERGE (n:{label} {{vid: row.vid}}) SET n += row"
+
+
+def create_nodes(tx, batch, label, fresh=False):
+    return tx.run(node_statement(label, fresh), batch=batch).consume()
+
 
+# (label, fields, filepath, delta_map) for every node file to load
+def nodes_to_load(delta=None):
+    for label, fields, filepath in find_node_files():
+        if delta is None:
+            yield label, fields, filepath, None
+        elif label in delta:
+            yield label, fields, filepath, delta[label]
+
+
+def prepare_database(session, fresh=False):
+    if fresh:
+        require_empty(session, URI)
+    ensure_vid_constraints(session, [label for label, _ in NODE_FILES.values()])
+
+
+# parses, batches and pushes one label at a time so only a single batch is held in memory
+# fresh=True uses CREATE instead of MERGE and refuses to run unless the database is empty
+def push_nodes_to_neo4j_streaming(batch_size=500, delta=None, fresh=False):
+    total = 0
+    started = time.perf_counter()
+
+    with GraphDatabase.driver(URI, auth=AUTH) as driver:
+        with driver.session(database="neo4j") as session:
+            prepare_database(session, fresh)
+            for label, fields, filepath, delta_map in nodes_to_load(delta):
+                print(f"Streaming {label} nodes from {filepath}")
+                label_started = time.perf_counter()
+                batcher = AdaptiveBatcher(batch_size, name=label)
+                query = node_statement(label, fresh)
+                with metrics.stage("push_nodes", label) as stage:
+                    count = batcher.push(lambda batch: session.run(query, {"batch": batch}).consume(),
+                                         iter_nodes(label, fields, filepath, delta_map))
+                    stage["rows"] = count
+
+                elapsed = time.perf_counter() - label_started
+                rate = count / elapsed if elapsed > 0 else 0.0
+                print(f"Finished pushing {count} {label} nodes in {elapsed:.1f}s "
+                      f"({rate:.0f} rows/s, peak RSS {peak_rss_mb():.1f} MB)")
+                print(batcher.describe())
+                total += count
+
+    elapsed = time.perf_counter() - started
+    rate = total / elapsed if elapsed > 0 else 0.0
+    print(f"Pushed {total} nodes to Neo4j in {elapsed:.1f}s "
+          f"({rate:.0f} rows/s, peak RSS {peak_rss_mb():.1f} MB).")
+    return total
+
+
+# same load with parsing in a producer thread and writes on async sessions, so the next
+# batches are parsed while earlier ones commit; the bounded queue caps what is held
+def push_nodes_pipelined(batch_size=500, delta=None, fresh=False, workers=WORKERS):
+    started = time.perf_counter()
     with GraphDatabase.driver(URI, auth=AUTH) as driver:
         with driver.session(database="neo4j") as session:
-            for label, nodes in grouped.items():
-                print(f"Pushing {len(nodes)} {label} nodes in batches")
-                for i in range(0, len(nodes), batch_size):
-                    batch = nodes[i:i+batch_size]
-                    session.run(f"""
-                        UNWIND $batch AS row
-                        MERGE (n:{label} {{vid: row.vid}})
-                        SET n += row
-                    """, {"batch": batch})
-                print(f"Finished pushing {label}.")
-    print(f"Pushed {len(data)} nodes to Neo4j.")
+            prepare_database(session, fresh)
+
+    def produce(emit):
+        total = 0
+        for label, fields, filepath, delta_map in nodes_to_load(delta):
+            print(f"Streaming {label} nodes from {filepath}")
+            batcher = AdaptiveBatcher(batch_size, name=label)
+            with metrics.stage("read_nodes", label) as stage:
+                for batch in batcher.batches_of(iter_nodes(label, fields, filepath, delta_map)):
+                    emit(0, ("batches", create_nodes, [batch], (label, fresh), batcher))
+                    stage["rows"] += len(batch)
+            total += stage["rows"]
+        return total
+
+    total, = run_pipeline({0: URI}, AUTH, workers, produce)
+    elapsed = time.perf_counter() - started
+    rate = total / elapsed if elapsed > 0 else 0.0
+    print(f"Pushed {total} nodes to Neo4j in {elapsed:.1f}s "
+          f"({rate:.0f} rows/s, peak RSS {peak_rss_mb():.1f} MB).")
+    return total
 
 
 
 if __name__ == "__main__":
-    all_nodes = load_all_nodes()
-    export_vid_maps()
-    push_nodes_to_neo4j_batched(all_nodes)
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--delta", help="push only the vertices listed in a generate_maps --incremental delta file")
+    parser.add_argument("--fresh", action="store_true", help="CREATE instead of MERGE; the database must be empty")
+    parser.add_argument("--no-pipeline", action="store_true",
+                        help="parse and push in turn on one session instead of overlapping them")
+    args = parser.parse_args()
+
+    push = push_nodes_to_neo4j_streaming if args.no_pipeline else push_nodes_pipelined
+    metrics.start("load_nodes")
+    if args.delta:
+        if args.fresh:
+            parser.error("--fresh loads into an empty database, a --delta load goes into an existing one")
+        open_existing_vid_maps()
+        push(delta=read_delta(args.delta))
+        with metrics.stage("append_vid_maps"):
+            append_vid_maps()
+    else:
+        push(fresh=args.fresh)
+        with metrics.stage("export_vid_maps"):
+            export_vid_maps()
+    metrics.finish()
@@ -1,79 +1,91 @@
-import csv
+import numpy as np
 from neo4j import GraphDatabase
 import os
+from vid_store import open_vid_map
+from ldbc_reader import iter_edge_chunks
+from adaptive_batch import AdaptiveBatcher
+from db_schema import ensure_vid_constraints, require_empty
+from shard_pool import ShardPool
+from rel_scheduler import run_rounds, emit_rounds, same_shard_endpoints
 
 URI = "neo4j://localhost:7687"
 AUTH = ("neo4j", "playground")
 BATCH_SIZE = 500
+# concurrent writers; batches of one round never share a node, so they do not deadlock
+WORKERS = 4
+VID_MAP_DIR = "social_network/id_to_vid_maps"
+EDGE_CHUNK_ROWS = 200_000
+# smaller chunks for the pipelined push, so writing starts early and tracks the reader
+PIPELINE_CHUNK_ROWS = 100_000
 
 def load_vid_map(path):
-    id_to_vid = {}
-    with open(path, newline='', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            id_to_vid[int(row["original_id"])] = int(row["vid"])
-    return id_to_vid
+    return open_vid_map(path)
 
-def load_relationships(csv_path, from_vid_map, to_vid_map):
-    relationships = []
-    with open(csv_path, newline='', encoding='utf-8') as f:
-        reader = csv.DictReader(f, delimiter='|')
-        for row in reader:
-            try:
-                from_id = int(row[list(row.keys())[0]])
-                to_id = int(row[list(row.keys())[1]])
+# yields (relationships, missing) per chunk of the file
+def iter_relationship_chunks(csv_path, from_vid_map, to_vid_map, chunk_rows=EDGE_CHUNK_ROWS):
+    for from_ids, to_ids, props in iter_edge_chunks(csv_path, chunk_rows):
+        from_vids, from_found = from_vid_map.lookup(from_ids)
+        to_vids, to_found = to_vid_map.lookup(to_ids)
+        keep = np.flatnonzero(from_found & to_found)
+        relationships = list(zip(from_vids[keep].tolist(), to_vids[keep].tolist(),
+                                 [props[i] for i in keep.tolist()]))
+        yield relationships, len(from_ids) - len(keep)
 
-                from_vid = from_vid_map[from_id]
-                to_vid = to_vid_map[to_id]
+def prepare_instance(from_label, to_label, rel_type, fresh=False):
+    with GraphDatabase.driver(URI, auth=AUTH) as driver:
+        with driver.session(database="neo4j") as session:
+            if fresh:
+                require_empty(session, URI, rel_type)
+            ensure_vid_constraints(session, {from_label, to_label})
 
-                # relationship properties
-                props = {}
-                for key in list(row.keys())[2:]:
-                    val = row[key]
-                    if val.isdigit():
-                        val = int(val)
-                    props[key] = val
+# fresh=True uses CREATE for the edges; refused if any rel_type edge already exists.
+# pool: a ShardPool over {0: URI} shared between several files, opened here if None;
+# prepare=False when the caller already ran prepare_instance (rel_manifest does it per run)
+def push_relationships_to_neo4j(relationships, from_label, to_label, rel_type, fresh=False, workers=WORKERS,
+                                pool=None, prepare=True, batcher=None):
+    batcher = batcher or AdaptiveBatcher(BATCH_SIZE, name=rel_type)
+    if prepare:
+        prepare_instance(from_label, to_label, rel_type, fresh)
+    if pool is None:
+        with ShardPool({0: URI}, AUTH, workers) as pool:
+            rounds = run_rounds(pool, {0: relationships}, same_shard_endpoints,
+                                create_batch, from_label, to_label, rel_type, fresh, batcher=batcher)
+    else:
+        rounds = run_rounds(pool, {0: relationships}, same_shard_endpoints,
+                            create_batch, from_label, to_label, rel_type, fresh, batcher=batcher)
+    print(f"Pushed a total of {len(relationships)} {rel_type} relationships "
+          f"in {rounds['rounds']} rounds of up to {rounds['largest_round']} batches.")
+    print(batcher.describe())
+    return batcher
 
-                relationships.append((from_vid, to_vid, props))
-            except KeyError as e:
-                print(f"Missing VID for: {e}")
-                continue
-    return relationships
 
-def push_relationships_to_neo4j(relationships, from_label, to_label, rel_type):
-    with GraphDatabase.driver(URI, auth=AUTH) as driver:
-        with driver.session(database="neo4j") as session:
-            for i in range(0, len(relationships), BATCH_SIZE):
-                batch = relationships[i:i + BATCH_SIZE]
-                session.execute_write(create_batch, batch, from_label, to_label, rel_type)
-                print(f"Pushed batch {i // BATCH_SIZE + 1} / {len(relationships) // BATCH_SIZE + 1}")
-    print(f"Pushed a total of {len(relationships)} {rel_type} relationships.")
 
+# async_pipeline producer for one file: later chunks are parsed and planned into rounds
+# while the rounds already queued commit
+def emit_file(emit, csv_path, from_label, to_label, rel_type, from_vids, to_vids, fresh=False, batcher=None,
+              chunk_rows=PIPELINE_CHUNK_ROWS):
+    batcher = batcher or AdaptiveBatcher(BATCH_SIZE, name=rel_type)
+    count = missing = 0
+    for rels, chunk_missing in iter_relationship_chunks(csv_path, from_vids, to_vids, chunk_rows):
+        emit_rounds(emit, {0: rels}, same_shard_endpoints,
+                    create_batch, from_label, to_label, rel_type, fresh, batcher=batcher)
+        count += len(rels)
+        missing += chunk_missing
+    return count, missing, batcher
 
 
-def create_batch(tx, rels, from_label, to_label, rel_type):
-    tx.run(f"""
+def create_batch(tx, rels, from_label, to_label, rel_type, fresh=False):
+    return tx.run(f"""
         UNWIND $rels AS row
         MATCH (a:{from_label} {{vid: row.from}})
         MATCH (b:{to_label} {{vid: row.to}})
-        MERGE (a)-[r:{rel_type}]->(b)
+        {"CREATE" if fresh else "MERGE"} (a)-[r:{rel_type}]->(b)
         SET r += row.props
     """, rels=[
         {"from": a, "to": b, "props": props} for a, b, props in rels
-    ])
+    ]).consume()
 
 if __name__ == "__main__":
-    #Edit here:
-    CSV_PATH = "import/social_network/static/organisation_isLocatedIn_place_0_0.csv"
-    FROM_LABEL = "Organisation"
-    TO_LABEL = "Place"
-    REL_TYPE = "isLocatedIn"
-    FROM_VID_MAP_PATH = "social_network/id_to_vid_maps/organisation_vid_map.csv"
-    TO_VID_MAP_PATH = "social_network/id_to_vid_maps/place_vid_map.csv"  
-
-    from_vids = load_vid_map(FROM_VID_MAP_PATH)
-    to_vids = load_vid_map(TO_VID_MAP_PATH)
-    rels = load_relationships(CSV_PATH, from_vids, to_vids)
-
-    print(f"Loaded {len(rels)} relationships.")
-    push_relationships_to_neo4j(rels, FROM_LABEL, TO_LABEL, REL_TYPE)
+    # every relationship file found under import/social_network; see rel_manifest.py
+    from rel_manifest import main
+    main(partitioned=False)
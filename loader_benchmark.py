@@ -0,0 +1,343 @@
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import subprocess
+import contextlib
+import multiprocessing
+
+import fake_neo4j
+import synthetic_ldbc
+from cluster_config import CONFIG_ENV, load_config, write_config
+from columnar import ARTIFACTS_ENV, FORMATS
+from instrumentation import peak_rss_mb
+
+# Runs every pipeline stage on synthetic LDBC-shaped data and writes wall time, rows/sec
+# and peak RSS per stage as JSON. Each stage runs in its own spawned process, so peak
+# memory is per stage. With --backend fake nothing talks to a server; fake_neo4j
+# records the Cypher and counts the rows sent instead. --shards 1 2 4 8 repeats the
+# partition and load stages once per shard count to show how throughput scales.
+# load_nodes and load_rels build the single-instance load next to the partitioned one, so
+# query_benchmark.py --workdir finds the VID maps of both.
+# --compare-create reruns both loaders in fresh (CREATE) mode and reports it against MERGE.
+# --artifacts csv arrow runs the whole benchmark once per intermediate table format
+# ($LDBC_ARTIFACTS, see columnar.py), each in its own subdirectory of the workdir.
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+STAGES = [
+    "generate_maps",
+    "partition_maps",
+    "sid_generator",
+    "metis_loader",
+    "partitioned_relationship_load",
+    "load_nodes",
+    "load_rels",
+]
+NUM_PARTS = load_config().num_shards
+SCALING_STAGES = ["sid_generator", "metis_loader", "partitioned_relationship_load"]
+CREATE_STAGES = {"metis_loader": "metis_loader_create",
+                 "partitioned_relationship_load": "partitioned_relationship_load_create"}
+
+
+def stage_generate_maps():
+    import generate_maps
+    generate_maps.vid_counter = 1
+    for filename, (label, _) in generate_maps.NODE_FILES.items():
+        generate_maps.load_nodes_for(label, filename)
+    generate_maps.export_vid_maps()
+    generate_maps.save_vid_counter()
+    return sum(len(m) for m in generate_maps.id_to_vid_map.values())
+
+
+def stage_partition_maps():
+    import partition_maps
+    partition_maps.main()
+    with open(partition_maps.GRAPH_OUTPUT_FILE) as f:
+        return int(f.readline().split()[1])
+
+
+def stage_sid_generator():
+    import sid_generator
+    from vid_store import open_sid_map
+    sid_generator.main()
+    return len(open_sid_map(sid_generator.OUTPUT_LOG))
+
+
+def stage_metis_loader(fresh=False):
+    import metis_loader
+    metis_loader.load_vid_maps()
+    metis_loader.load_vid_sid_log()
+    return metis_loader.push_all_nodes(fresh=fresh)
+
+
+def stage_partitioned_relationship_load(fresh=False):
+    import partition_maps
+    import partioned_relationship_loader as loader
+    from ldbc_schema import relationship_for
+
+    rows = 0
+    for src, dst, rel_file in partition_maps.RELATIONSHIPS:
+        rel_path = partition_maps.find_relationship_file(rel_file)
+        if rel_path is None:
+            continue
+        from_label, rel_type, to_label, _ = relationship_for(rel_file)
+        same, cross = loader.load_and_push(
+            rel_path, from_label, to_label, rel_type,
+            os.path.join(loader.PARTITION_DIR, f"{src}_vid_map.csv"),
+            os.path.join(loader.PARTITION_DIR, f"{dst}_vid_map.csv"),
+            fresh=fresh,
+        )
+        rows += same + cross
+    return rows
+
+
+# single instance: load_nodes numbers the vertices itself and writes social_network/id_to_vid_maps
+def stage_load_nodes():
+    import load_nodes
+    load_nodes.vid_counter = 1
+    load_nodes.id_to_vid_map.clear()
+    total = load_nodes.push_nodes_pipelined()
+    load_nodes.export_vid_maps()
+    return total
+
+
+def stage_load_rels():
+    import rel_manifest
+    report = rel_manifest.ManifestLoader(partitioned=False).run(rel_manifest.build_manifest())
+    return report["relationships"]
+
+
+# the CREATE variants need empty shards; against a real server that means fresh databases
+def stage_metis_loader_create():
+    return stage_metis_loader(fresh=True)
+
+
+def stage_partitioned_relationship_load_create():
+    return stage_partitioned_relationship_load(fresh=True)
+
+
+STAGE_FUNCS = {name: globals()[f"stage_{name}"] for name in STAGES + list(CREATE_STAGES.values())}
+
+
+def run_stage(stage, workdir, backend, statement_latency, row_latency, verbose, cluster_config=None,
+              artifacts=None):
+    os.chdir(workdir)
+    if cluster_config:
+        os.environ[CONFIG_ENV] = cluster_config
+    if artifacts:
+        os.environ[ARTIFACTS_ENV] = artifacts
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+    recorder = None
+    if backend == "fake":
+        recorder = fake_neo4j.install(statement_latency=statement_latency, row_latency=row_latency)
+        import load_nodes, load_rels, metis_loader, partioned_relationship_loader, shard_pool, async_pipeline
+        fake_neo4j.install(load_nodes, load_rels, metis_loader, partioned_relationship_loader, shard_pool,
+                           async_pipeline, statement_latency=statement_latency, row_latency=row_latency)
+
+    out = sys.stdout if verbose else io.StringIO()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(out):
+        rows = STAGE_FUNCS[stage]()
+    wall = time.perf_counter() - started
+
+    result = {
+        "stage": stage,
+        "rows": rows,
+        "wall_seconds": round(wall, 4),
+        "rows_per_sec": round(rows / wall, 1) if wall > 0 else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+    if recorder is not None:
+        totals = recorder.totals()
+        result["statements"] = totals["statements"]
+        result["rows_sent"] = totals["rows"]
+        result["rows_sent_per_uri"] = {uri: s["rows"] for uri, s in totals["per_uri"].items()}
+    return result
+
+
+# gpmetis when it is installed, otherwise a contiguous block split of the METIS index order
+def prepare_partition(workdir, num_parts=NUM_PARTS):
+    graph = os.path.join(workdir, "graph_outputs", "graph.txt")
+    gpmetis = shutil.which("gpmetis")
+    if gpmetis:
+        subprocess.run([gpmetis, graph, str(num_parts)], check=True, stdout=subprocess.DEVNULL)
+        return "gpmetis"
+    with open(graph) as f:
+        n = int(f.readline().split()[0])
+    with open(f"{graph}.part.{num_parts}", "w") as f:
+        for i in range(n):
+            f.write(f"{i * num_parts // max(n, 1)}\n")
+    return "block stand-in"
+
+
+def _print_result(result, prefix=""):
+    print(f"{prefix}{result['stage']:<38} {result['rows']:>10} rows {result['wall_seconds']:>9.3f}s "
+          f"{result['rows_per_sec'] or 0:>12.0f} rows/s {result['peak_rss_mb']:>8.1f} MB")
+
+
+def _prepare_workdir(workdir, scale, seed):
+    os.makedirs(workdir, exist_ok=True)
+    counter_file = os.path.join(workdir, "vid_counter.txt")
+    if os.path.exists(counter_file):
+        os.remove(counter_file)
+
+    started = time.perf_counter()
+    input_rows = synthetic_ldbc.generate(workdir, scale, seed)
+    return input_rows, time.perf_counter() - started
+
+
+def compare_create(pool, report, workdir, backend, statement_latency, row_latency, verbose, artifacts=None):
+    merge_results = {r["stage"]: r for r in report["stages"]}
+    report["merge_vs_create"] = []
+    for stage, create_stage in CREATE_STAGES.items():
+        if stage not in merge_results:
+            continue
+        merge = merge_results[stage]
+        try:
+            create = pool.apply(run_stage, (create_stage, workdir, backend, statement_latency, row_latency, verbose,
+                                            None, artifacts))
+        except Exception as exc:
+            print(f"{create_stage}: skipped ({exc})")
+            report["merge_vs_create"].append({"stage": stage, "error": str(exc)})
+            continue
+        report["stages"].append(create)
+        _print_result(create)
+        report["merge_vs_create"].append({
+            "stage": stage,
+            "merge_seconds": merge["wall_seconds"],
+            "create_seconds": create["wall_seconds"],
+            "speedup": round(merge["wall_seconds"] / create["wall_seconds"], 3) if create["wall_seconds"] else None,
+        })
+
+
+def run_benchmark(workdir, scale, backend="fake", stages=STAGES, statement_latency=0.0,
+                  row_latency=0.0, seed=42, verbose=False, create=False, artifacts=None):
+    input_rows, generate_seconds = _prepare_workdir(workdir, scale, seed)
+
+    report = {
+        "scale": scale,
+        "backend": backend,
+        "artifacts": artifacts or os.environ.get(ARTIFACTS_ENV, "csv"),
+        "seed": seed,
+        "statement_latency": statement_latency,
+        "row_latency": row_latency,
+        "python": platform.python_version(),
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "input_rows": sum(input_rows.values()),
+        "synthetic_data_seconds": round(generate_seconds, 3),
+        "stages": [],
+    }
+
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(1, maxtasksperchild=1) as pool:
+        for stage in stages:
+            if stage == "sid_generator":
+                report["partitioner"] = prepare_partition(workdir)
+            result = pool.apply(run_stage, (stage, workdir, backend, statement_latency, row_latency, verbose,
+                                            None, artifacts))
+            report["stages"].append(result)
+            _print_result(result)
+        if create:
+            compare_create(pool, report, workdir, backend, statement_latency, row_latency, verbose, artifacts)
+    return report
+
+
+# the same run per artifact format, side by side; every format gets its own workdir
+def run_formats(workdir, scale, formats, **kwargs):
+    runs = []
+    for fmt in formats:
+        print(f"artifacts={fmt}")
+        runs.append(run_benchmark(os.path.join(workdir, fmt), scale, artifacts=fmt, **kwargs))
+    print(f"{'stage':<38} " + " ".join(f"{fmt + ' s':>10}" for fmt in formats))
+    for i, result in enumerate(runs[0]["stages"]):
+        print(f"{result['stage']:<38} " + " ".join(f"{run['stages'][i]['wall_seconds']:>10.3f}" for run in runs))
+    return {"artifact_runs": runs}
+
+
+# maps and graph.txt are built once; partitioning and both loaders rerun per shard count
+# against a generated cluster config (fake URIs on consecutive ports)
+def run_scaling(workdir, scale, shard_counts, backend="fake", statement_latency=0.0,
+                row_latency=0.0, seed=42, verbose=False):
+    input_rows, generate_seconds = _prepare_workdir(workdir, scale, seed)
+    base = load_config()
+    report = {
+        "scale": scale,
+        "backend": backend,
+        "seed": seed,
+        "statement_latency": statement_latency,
+        "row_latency": row_latency,
+        "python": platform.python_version(),
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "input_rows": sum(input_rows.values()),
+        "synthetic_data_seconds": round(generate_seconds, 3),
+        "stages": [],
+        "shard_scaling": [],
+    }
+
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(1, maxtasksperchild=1) as pool:
+        for stage in ["generate_maps", "partition_maps"]:
+            result = pool.apply(run_stage, (stage, workdir, backend, statement_latency, row_latency, verbose))
+            report["stages"].append(result)
+            _print_result(result)
+
+        for shards in shard_counts:
+            uris = {sid: f"neo4j://localhost:{9750 + sid}" for sid in range(shards)}
+            config = write_config(os.path.join(workdir, f"cluster_{shards}.json"), uris, base.auth,
+                                  base.workers[0] if base.workers else 4)
+            run = {"shards": shards, "partitioner": prepare_partition(workdir, shards), "stages": []}
+            for stage in SCALING_STAGES:
+                result = pool.apply(run_stage, (stage, workdir, backend, statement_latency, row_latency,
+                                                verbose, config))
+                run["stages"].append(result)
+                _print_result(result, f"{shards:>3} shards  ")
+            report["shard_scaling"].append(run)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the loader pipeline on synthetic LDBC data.")
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", default=os.path.join("bench_results", "workdir"))
+    parser.add_argument("--output", default=os.path.join("bench_results", "loader_benchmark.json"))
+    parser.add_argument("--backend", choices=["fake", "neo4j"], default="fake")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--statement-latency", type=float, default=0.0, help="fake backend: seconds per statement")
+    parser.add_argument("--row-latency", type=float, default=0.0, help="fake backend: seconds per UNWIND row")
+    parser.add_argument("--shards", type=int, nargs="+",
+                        help="rerun partitioning and loading for each shard count, e.g. --shards 1 2 4 8")
+    parser.add_argument("--compare-create", action="store_true",
+                        help="also run the loaders in fresh CREATE mode (needs empty shards on a real server)")
+    parser.add_argument("--artifacts", nargs="+", choices=FORMATS,
+                        help=f"run once per intermediate table format (${ARTIFACTS_ENV}), e.g. --artifacts csv arrow")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    if args.shards and args.artifacts:
+        parser.error("--shards and --artifacts are separate runs")
+    if args.artifacts:
+        report = run_formats(os.path.abspath(args.workdir), args.scale, args.artifacts, backend=args.backend,
+                             stages=args.stages, statement_latency=args.statement_latency,
+                             row_latency=args.row_latency, seed=args.seed, verbose=args.verbose,
+                             create=args.compare_create)
+    elif args.shards:
+        report = run_scaling(os.path.abspath(args.workdir), args.scale, args.shards, args.backend,
+                             args.statement_latency, args.row_latency, args.seed, args.verbose)
+    else:
+        report = run_benchmark(os.path.abspath(args.workdir), args.scale, args.backend, args.stages,
+                               args.statement_latency, args.row_latency, args.seed, args.verbose,
+                               args.compare_create)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
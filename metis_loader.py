@@ -1,18 +1,38 @@
 #4
 import os
 import csv
+import argparse
+import numpy as np
+from itertools import islice
 from collections import defaultdict
 from neo4j import GraphDatabase
+from shard_pool import ShardPool
+from adaptive_batch import AdaptiveBatcher
+from db_schema import ensure_vid_constraints, require_empty
+from vid_store import open_vid_map, open_sid_map, write_sid_map, read_delta, NO_SID
+from cluster_config import load_config
+from spill_queue import SpillQueue
+from instrumentation import metrics
+from async_pipeline import run_pipeline
+from columnar import writes_csv
+from ldbc_reader import field_parsers, typed_fields
 
-AUTH = ("neo4j", "playground")
+CLUSTER = load_config()
+AUTH = CLUSTER.auth
 SOCIAL_NETWORK_DIR = "import/social_network"
 EXPORT_VID_MAP_DIR = "partitioned_vids"
 VID_SID_LOG = os.path.join(EXPORT_VID_MAP_DIR, "vid_sid_log.csv")
 
-DB_URIS = {
-    0: "neo4j://localhost:9750",
-    1: "neo4j://localhost:9751"
-}
+DB_URIS = CLUSTER.uris
+PARALLEL_PUSH = True
+# parse in a producer thread while async sessions write (async_pipeline)
+PIPELINE = True
+WORKERS_PER_SHARD = CLUSTER.workers
+BATCH_SIZE = 500
+# rows parsed at a time, and memory for batches waiting on slow shards; past the
+# budget they spill to temp files, so Post/Comment content never sits in memory whole
+NODE_CHUNK_ROWS = 50_000
+MEMORY_BUDGET_MB = 256
 
 # NODE_FILES = {
 #     "organisation_0_0.csv": ("Organisation", ["type", "name", "url"]),
@@ -22,12 +42,12 @@ NODE_FILES = {
     "person_0_0.csv": ("Person", [
         "firstName", "lastName", "gender", "birthday","creationDate", "locationIP", "browserUsed"
     ]),
-    # "post_0_0.csv": ("Post", [
-    #     "imageFile", "creationDate", "locationIP", "browserUsed","language", "content", "length"
-    # ]),
-    # "comment_0_0.csv": ("Comment", [
-    #     "creationDate", "locationIP", "browserUsed","content", "length"
-    # ]),
+    "post_0_0.csv": ("Post", [
+        "imageFile", "creationDate", "locationIP", "browserUsed","language", "content", "length"
+    ]),
+    "comment_0_0.csv": ("Comment", [
+        "creationDate", "locationIP", "browserUsed","content", "length"
+    ]),
     "place_0_0.csv": ("Place", [
         "name", "url", "type"
     ]),
@@ -45,41 +65,69 @@ NODE_FILES = {
     ]),
 }
 # Maps original_id -> vid, vid -> sid
-vid_maps = defaultdict(dict)
-vid_to_sid = {}
+vid_maps = {}
+vid_to_sid = None
 
 def load_vid_maps():
     for filename, (label, _) in NODE_FILES.items():
         map_path = os.path.join(EXPORT_VID_MAP_DIR, f"{label.lower()}_vid_map.csv")
-        with open(map_path, newline='') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                vid_maps[label][int(row["original_id"])] = int(row["vid"])
+        vid_maps[label] = open_vid_map(map_path)
         print(f"Loaded vid map for {label}")
 
 def load_vid_sid_log():
-    with open(VID_SID_LOG, newline='') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            vid_to_sid[int(row["vid"])] = int(row["sid"])
+    global vid_to_sid
+    vid_to_sid = open_sid_map(VID_SID_LOG)
     print(f"Loaded sid mappings from METIS output")
 
-def load_nodes_for(label, filename, fields):
-    nodes = []
-    filepath = None
+# vertices added by generate_maps --incremental have no sid yet: place each on the
+# currently smallest shard and record it in vid_sid_log so the relationship loaders agree
+def assign_delta_sids(delta):
+    global vid_to_sid
+    assigned = np.asarray(vid_to_sid.sids)
+    counts = {sid: int(np.count_nonzero(assigned == sid)) for sid in DB_URIS}
+
+    new_rows = []
+    for label, delta_map in delta.items():
+        delta_vids = np.asarray(delta_map.vids)
+        for vid in delta_vids[vid_to_sid.lookup(delta_vids) == NO_SID].tolist():
+            sid = min(counts, key=counts.get)
+            counts[sid] += 1
+            new_rows.append((vid, sid))
 
+    if not new_rows:
+        return
+    if writes_csv():
+        with open(VID_SID_LOG, "a", newline='') as f:
+            csv.writer(f).writerows(new_rows)
+    old_vids = np.flatnonzero(assigned != NO_SID)
+    new_vids, new_sids = zip(*new_rows)
+    write_sid_map(VID_SID_LOG, np.concatenate([old_vids, new_vids]),
+                  np.concatenate([assigned[old_vids], new_sids]))
+    vid_to_sid = open_sid_map(VID_SID_LOG)
+    print(f"Assigned sids to {len(new_rows)} new vertices")
+
+def find_node_file(filename):
     for subfolder in ["static", "dynamic"]:
         dir = os.path.join(SOCIAL_NETWORK_DIR, subfolder)
         file_path_candidate = os.path.join(dir, filename)
         if os.path.exists(file_path_candidate):
-            filepath = file_path_candidate
-            break
+            return file_path_candidate
+    return None
+
+def node_props(row, vid, fields, parsers):
+    props = {"vid": vid}
+    props.update(typed_fields(row, fields, parsers))
+    return props
 
+def load_nodes_for(label, filename, fields):
+    nodes = []
+    filepath = find_node_file(filename)
     if not filepath:
         print(f"{filename} not found.")
         return nodes
 
     print(f"Loading {label} nodes from {filepath}")
+    parsers = field_parsers(filepath)
     with open(filepath, newline='', encoding='utf-8') as f:
         reader = csv.DictReader(f, delimiter='|')
         for row in reader:
@@ -87,19 +135,28 @@ def load_nodes_for(label, filename, fields):
             vid = vid_maps[label].get(original_id)
             if vid is None:
                 continue
-
-            node_props = {"vid": vid}
-            for field in fields:
-                val = row.get(field)
-                if val and field == "length":
-                    val = int(val)
-                node_props[field] = val
-            nodes.append((vid, node_props))
+            nodes.append((vid, node_props(row, vid, fields, parsers)))
 
     print(f"Loaded {len(nodes)} nodes for {label}")
     return nodes
 
-def push_partitioned(label, nodes):
+# yields (sids, props) per chunk of rows; rows without a vid or sid are dropped
+def iter_node_chunks(label, filepath, fields, chunk_rows=NODE_CHUNK_ROWS):
+    parsers = field_parsers(filepath)
+    with open(filepath, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f, delimiter='|')
+        while True:
+            rows = list(islice(reader, chunk_rows))
+            if not rows:
+                return
+            ids = np.array([int(row["id"]) for row in rows], dtype=np.int64)
+            vids, found = vid_maps[label].lookup(ids)
+            sids = vid_to_sid.lookup(vids)
+            keep = np.flatnonzero(found & (sids != NO_SID))
+            yield sids[keep].tolist(), [node_props(rows[i], vid, fields, parsers)
+                                        for i, vid in zip(keep.tolist(), vids[keep].tolist())]
+
+def push_partitioned(label, nodes, fresh=False):
     server_batches = defaultdict(list)
     for vid, props in nodes:
         sid = vid_to_sid.get(vid)
@@ -110,21 +167,113 @@ def push_partitioned(label, nodes):
     for sid, batch in server_batches.items():
         uri = DB_URIS.get(sid)
         if uri:
-            push_to_db(uri, label, batch)
+            push_to_db(uri, label, batch, fresh=fresh)
         else:
             print(f"No DB URI configured  {sid}")
 
-def push_to_db(uri, label, nodes, batch_size=500):
+def push_to_db(uri, label, nodes, batch_size=BATCH_SIZE, fresh=False):
+    batcher = AdaptiveBatcher(batch_size, name=f"{label} -> {uri}")
     with GraphDatabase.driver(uri, auth=AUTH) as driver:
         with driver.session(database="neo4j") as session:
-            for i in range(0, len(nodes), batch_size):
-                batch = nodes[i:i + batch_size]
-                session.run(f"""
-                    UNWIND $batch AS row
-                    MERGE (n:{label} {{vid: row.vid}})
-                    SET n += row
-                """, {"batch": batch})
+            batcher.push(lambda batch: session.run(node_statement(label, fresh), {"batch": batch}).consume(), nodes)
             print(f"Pushed {len(nodes)} nodes to {uri} ({label})")
+            print(batcher.describe())
+
+# fresh loads skip the lookup MERGE does: the shard was checked to be empty
+def node_statement(label, fresh=False):
+    if fresh:
+        return f"""
+            UNWIND $batch AS row
+            CREATE (n:{label})
+            SET n = row
+        """
+    return f"""
+        UNWIND $batch AS row
+        MERGE (n:{label} {{vid: row.vid}})
+        SET n += row
+    """
+
+def merge_nodes(tx, batch, label, fresh=False):
+    return tx.run(node_statement(label, fresh), batch=batch).consume()
+
+# Reads the file in chunks and routes each batch to its shard's SpillQueue; the reader never
+# blocks on a slow shard, whose backlog goes to disk once past its share of the budget.
+# try_submit(sid, queue) hands over the queue's next batch if the shard has a free slot and
+# says whether it did; submit(sid, batch) hands one over, waiting for a slot if it must.
+def _stream_label(label, filepath, fields, budget_bytes, shards, try_submit, submit, batcher):
+    shard_budget = budget_bytes // max(len(DB_URIS), 1)
+    queues = {sid: SpillQueue(shard_budget, name=f"{label} sid {sid}") for sid in shards}
+    count = 0
+    unrouted = 0
+
+    def feed():
+        for sid, queue in queues.items():
+            while len(queue) and try_submit(sid, queue):
+                pass
+
+    print(f"Streaming {label} nodes from {filepath}")
+    try:
+        for sids, props in iter_node_chunks(label, filepath, fields):
+            per_shard = defaultdict(list)
+            for sid, row in zip(sids, props):
+                per_shard[sid].append(row)
+            for sid, rows in per_shard.items():
+                if sid not in queues:
+                    unrouted += len(rows)
+                    continue
+                for batch in batcher.batches_of(rows):
+                    queues[sid].put(batch)
+                count += len(rows)
+            feed()
+        while any(len(queue) for queue in queues.values()):
+            feed()
+            # every slot is taken: wait on the shard with the most left
+            sid = max(queues, key=lambda s: len(queues[s]))
+            if len(queues[sid]):
+                submit(sid, queues[sid].get())
+    finally:
+        for queue in queues.values():
+            queue.close()
+    if unrouted:
+        print(f"No DB URI configured for {unrouted} {label} nodes")
+    for queue in queues.values():
+        print(queue.describe())
+    print(f"Queued {count} {label} nodes")
+    return count
+
+# _stream_label into a ShardPool
+def push_label_chunked(pool, label, filepath, fields, budget_bytes, batch_size=BATCH_SIZE, batcher=None,
+                       fresh=False):
+    batcher = batcher or AdaptiveBatcher(batch_size, name=label)
+
+    def try_submit(sid, queue):
+        return pool.try_submit(sid, merge_nodes, queue.get, label, fresh, batcher=batcher) is not None
+
+    def submit(sid, batch):
+        pool.submit(sid, merge_nodes, batch, label, fresh, batcher=batcher)
+
+    count = _stream_label(label, filepath, fields, budget_bytes, [sid for sid in DB_URIS if sid in pool],
+                          try_submit, submit, batcher)
+    return batcher, count
+
+# _stream_label for a producer of run_pipeline: items go to the writer's bounded queues,
+# and only while a shard's queue has room
+def emit_label_chunked(emit, label, filepath, fields, budget_bytes, batch_size=BATCH_SIZE, batcher=None,
+                       fresh=False):
+    batcher = batcher or AdaptiveBatcher(batch_size, name=label)
+
+    def submit(sid, batch):
+        emit(sid, ("batches", merge_nodes, [batch], (label, fresh), batcher))
+
+    def try_submit(sid, queue):
+        if emit.room(sid) <= 0:
+            return False
+        submit(sid, queue.get())
+        return True
+
+    count = _stream_label(label, filepath, fields, budget_bytes, [sid for sid in DB_URIS if sid in emit],
+                          try_submit, submit, batcher)
+    return batcher, count
 
 def insert_proxy_node(uri):
     with GraphDatabase.driver(uri, auth=AUTH) as driver:
@@ -134,14 +283,98 @@ def insert_proxy_node(uri):
             """)
         print(f"Inserted proxy node in {uri}")
 
-if __name__ == "__main__":
-    load_vid_maps()
-    load_vid_sid_log()
+# vid constraints on every shard before the first push; fresh loads also need empty shards
+def prepare_shards(labels, fresh=False):
+    for uri in DB_URIS.values():
+        with GraphDatabase.driver(uri, auth=AUTH) as driver:
+            with driver.session(database="neo4j") as session:
+                if fresh:
+                    require_empty(session, uri)
+                ensure_vid_constraints(session, labels)
+        print(f"vid constraints ready on {uri} for {', '.join(labels)}")
+
+def push_all_nodes(node_files=None, parallel=PARALLEL_PUSH, fresh=False, memory_budget_mb=MEMORY_BUDGET_MB,
+                   pipeline=PIPELINE):
+    node_files = NODE_FILES if node_files is None else node_files
+    prepare_shards([label for label, _ in node_files.values()], fresh)
+    total = 0
+    if parallel and pipeline:
+        def produce(emit):
+            batchers = []
+            count = 0
+            for filename, (label, fields) in node_files.items():
+                filepath = find_node_file(filename)
+                if not filepath:
+                    print(f"{filename} not found.")
+                    continue
+                with metrics.stage("read_nodes", label) as stage:
+                    batcher, stage["rows"] = emit_label_chunked(emit, label, filepath, fields,
+                                                                memory_budget_mb * 2**20, fresh=fresh)
+                batchers.append(batcher)
+                count += stage["rows"]
+            return batchers, count
 
-    for filename, (label, fields) in NODE_FILES.items():
-        nodes = load_nodes_for(label, filename, fields)
-        if nodes:
-            push_partitioned(label, nodes)
+        (batchers, total), = run_pipeline(DB_URIS, AUTH, WORKERS_PER_SHARD, produce)
+        for batcher in batchers:
+            print(batcher.describe())
+    elif parallel:
+        batchers = []
+        with ShardPool(DB_URIS, AUTH, WORKERS_PER_SHARD) as pool:
+            for filename, (label, fields) in node_files.items():
+                filepath = find_node_file(filename)
+                if not filepath:
+                    print(f"{filename} not found.")
+                    continue
+                # writes of a label may still be in flight when its stage ends; "drain" covers the rest
+                with metrics.stage("stream_nodes", label) as stage:
+                    batcher, count = push_label_chunked(pool, label, filepath, fields, memory_budget_mb * 2**20,
+                                                        fresh=fresh)
+                    stage["rows"] = count
+                batchers.append(batcher)
+                total += count
+            with metrics.stage("drain"):
+                pool.wait()
+            for batcher in batchers:
+                print(batcher.describe())
+            pool.print_summary()
+    else:
+        for filename, (label, fields) in node_files.items():
+            with metrics.stage("read_nodes", label) as stage:
+                nodes = load_nodes_for(label, filename, fields)
+                stage["rows"] = len(nodes)
+            if nodes:
+                with metrics.stage("push_nodes", label) as stage:
+                    push_partitioned(label, nodes, fresh)
+                    stage["rows"] = len(nodes)
+                total += len(nodes)
 
     for uri in DB_URIS.values():
         insert_proxy_node(uri)
+    return total
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--delta", help="push only the vertices listed in a generate_maps --incremental delta file")
+    parser.add_argument("--fresh", action="store_true", help="CREATE instead of MERGE; every shard must be empty")
+    parser.add_argument("--memory-budget", type=int, default=MEMORY_BUDGET_MB, metavar="MB",
+                        help="batches held for slow shards before spilling to disk")
+    parser.add_argument("--no-pipeline", action="store_true",
+                        help="push from the reading thread through a ShardPool instead of async sessions")
+    args = parser.parse_args()
+    if args.delta and args.fresh:
+        parser.error("--fresh loads into empty shards, a --delta load goes into existing ones")
+
+    metrics.start("metis_loader")
+    with metrics.stage("load_maps"):
+        load_vid_maps()
+        load_vid_sid_log()
+    node_files = NODE_FILES
+    if args.delta:
+        delta = read_delta(args.delta)
+        vid_maps.update(delta)
+        assign_delta_sids(delta)
+        node_files = {f: (label, fields) for f, (label, fields) in NODE_FILES.items() if label in delta}
+
+    push_all_nodes(node_files, fresh=args.fresh, memory_budget_mb=args.memory_budget,
+                   pipeline=not args.no_pipeline)
+    metrics.finish()
@@ -1,5 +1,6 @@
 import csv
 from collections import defaultdict
+from vid_store import open_vid_map
 
 ORG_MAP = "partitioned_vids/organisation_vid_map.csv"
 PLACE_MAP = "partitioned_vids/place_vid_map.csv"
@@ -7,9 +8,7 @@ PLACE_MAP = "partitioned_vids/place_vid_map.csv"
 REL_FILE = "import/social_network/static/organisation_isLocatedIn_place_0_0.csv"
 
 def load_vid_map(path):
-    with open(path) as f:
-        reader = csv.DictReader(f)
-        return {int(row["original_id"]): int(row["vid"]) for row in reader}
+    return open_vid_map(path)
 
 org_map = load_vid_map(ORG_MAP)
 place_map = load_vid_map(PLACE_MAP)
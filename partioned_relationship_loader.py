@@ -1,160 +1,301 @@
 import os
-import csv
 from collections import defaultdict
+import numpy as np
 from neo4j import GraphDatabase
+from shard_pool import ShardPool
+from adaptive_batch import AdaptiveBatcher
+from db_schema import ensure_vid_constraints, require_empty
+from rel_scheduler import run_rounds, emit_rounds, same_shard_endpoints, ghost_endpoints
+from vid_store import open_vid_map, open_sid_map, NO_SID
+from ldbc_reader import iter_edge_chunks
+from cluster_config import load_config
+from cross_edge_store import CrossEdgeStore
 
 
 PARTITION_DIR = "partitioned_vids"
+CROSS_EDGE_STORE = os.path.join(PARTITION_DIR, "cross_edges.sqlite")
 BATCH_SIZE = 500
+# edges partitioned and pushed at a time; bounds memory on the message-sized files
+EDGE_CHUNK_ROWS = 200_000
+# smaller chunks for the pipelined push, so writing starts early and tracks the reader
+PIPELINE_CHUNK_ROWS = 100_000
 
-DB_URIS = {
-    0: "neo4j://localhost:9750",
-    1: "neo4j://localhost:9751"
-}
-AUTH = ("neo4j", "playground")
+CLUSTER = load_config()
+DB_URIS = CLUSTER.uris
+AUTH = CLUSTER.auth
+WORKERS_PER_SHARD = CLUSTER.workers
+
+# "ghost": one indexed (:Ghost {vid, sid}) stub per remote target, edges point at it
+# "universal": every cross-shard edge points at the single (:ProxyUniversal) node
+CROSS_SHARD_MODE = "ghost"
+# CREATE instead of MERGE for the edges; refused if a shard already has edges of the type
+FRESH_LOAD = False
 
 
 def load_vid_map(path):
-    id_to_vid = {}
-    with open(path, newline='', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            id_to_vid[int(row["original_id"])] = int(row["vid"])
-    return id_to_vid
+    return open_vid_map(path)
 
 def load_vid_sid_map(path=os.path.join(PARTITION_DIR, "vid_sid_log.csv")):
-    vid_to_sid = {}
-    with open(path, newline='', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            vid = int(row["vid"])
-            sid = int(row["sid"])
-            vid_to_sid[vid] = sid
-    return vid_to_sid
-
-def load_relationships_partitioned(csv_path, from_vid_map, to_vid_map, vid_to_sid):
-    same_sid_batches = defaultdict(list)
-    cross_sid  = defaultdict(list)
-
-    with open(csv_path, newline='', encoding='utf-8') as f:
-        reader = csv.DictReader(f, delimiter='|')
-        for row in reader:
-            try:
-                from_id = int(row[list(row.keys())[0]])
-                to_id = int(row[list(row.keys())[1]])
-
-                from_vid = from_vid_map[from_id]
-                to_vid = to_vid_map[to_id]
-
-                from_sid = vid_to_sid[from_vid]
-                to_sid = vid_to_sid[to_vid]
-
-                props = {}
-                for key in list(row.keys())[2:]:
-                    val = row[key]
-                    if val.isdigit():
-                        val = int(val)
-                    props[key] = val
-
-                if from_sid == to_sid:
-                    same_sid_batches[from_sid].append((from_vid, to_vid, props))
-                else:
-                    #cross_sid.append((from_vid, to_vid, props))
-                    props.update({
-                        "proxy": True,
-                        "target_vid": to_vid,
-                        "target_sid": to_sid
-                    })
-                    cross_sid[from_sid].append((from_vid, props))
-
-            except KeyError as e:
-                print(f"Missing VID or SID for: {e}")
-                continue
-
-    return same_sid_batches, cross_sid
-
-# push to uri 
-
-def push_relationships_to_neo4j(uri, relationships, from_label, to_label, rel_type):
-    with GraphDatabase.driver(uri, auth=AUTH) as driver:
-        with driver.session(database="neo4j") as session:
-            for i in range(0, len(relationships), BATCH_SIZE):
-                batch = relationships[i:i + BATCH_SIZE]
-                session.execute_write(create_batch, batch, from_label, to_label, rel_type)
-                print(f"SID batch pushed: {i // BATCH_SIZE + 1}")
+    return open_sid_map(path)
+
+# yields (same_sid_batches, cross_sid, missing) per chunk of the file, so a message-sized
+# relationship file is partitioned and pushed a chunk at a time
+def iter_partitioned_chunks(csv_path, from_vid_map, to_vid_map, vid_to_sid, chunk_rows=EDGE_CHUNK_ROWS):
+    for from_ids, to_ids, props in iter_edge_chunks(csv_path, chunk_rows):
+        same_sid_batches = defaultdict(list)
+        cross_sid = defaultdict(list)
+        from_vids, from_found = from_vid_map.lookup(from_ids)
+        to_vids, to_found = to_vid_map.lookup(to_ids)
+        from_sids = vid_to_sid.lookup(from_vids)
+        to_sids = vid_to_sid.lookup(to_vids)
+        keep = np.flatnonzero(from_found & to_found & (from_sids != NO_SID) & (to_sids != NO_SID))
+
+        for i, from_vid, to_vid, from_sid, to_sid in zip(
+            keep.tolist(), from_vids[keep].tolist(), to_vids[keep].tolist(),
+            from_sids[keep].tolist(), to_sids[keep].tolist()
+        ):
+            row_props = props[i]
+            if from_sid == to_sid:
+                same_sid_batches[from_sid].append((from_vid, to_vid, row_props))
+            else:
+                #cross_sid.append((from_vid, to_vid, props))
+                row_props.update({
+                    "proxy": True,
+                    "target_vid": to_vid,
+                    "target_sid": to_sid
+                })
+                cross_sid[from_sid].append((from_vid, row_props))
+        yield same_sid_batches, cross_sid, len(from_ids) - len(keep)
+
+# same-shard edges of every shard, scheduled in rounds whose batches touch disjoint nodes
+# so all workers of a shard can write at once without deadlocking on shared endpoints
+def push_relationships_to_neo4j(pool, same_sid_batches, from_label, to_label, rel_type, fresh=False, batcher=None):
+    batcher = batcher or AdaptiveBatcher(BATCH_SIZE, name=rel_type)
+    for sid, batch in same_sid_batches.items():
+        if sid not in pool:
+            print(f"no URI for sid={sid}")
+            continue
+        print(f"Pushing {len(batch)} relationships to SID {sid} ({DB_URIS[sid]})")
+    rounds = run_rounds(pool, same_sid_batches, same_shard_endpoints,
+                        create_batch, from_label, to_label, rel_type, fresh, batcher=batcher)
+    print(f"{rounds['batches']} batches in {rounds['rounds']} rounds (up to {rounds['largest_round']} at once)")
+    return batcher
 
 #same as before
-def create_batch(tx, rels, from_label, to_label, rel_type):
-    tx.run(f"""
+def create_batch(tx, rels, from_label, to_label, rel_type, fresh=False):
+    return tx.run(f"""
         UNWIND $rels AS row
         MATCH (a:{from_label} {{vid: row.from}})
         MATCH (b:{to_label} {{vid: row.to}})
-        MERGE (a)-[r:{rel_type}]->(b)
+        {"CREATE" if fresh else "MERGE"} (a)-[r:{rel_type}]->(b)
         SET r += row.props
     """, rels=[
         {"from": a, "to": b, "props": props} for a, b, props in rels
-    ])
+    ]).consume()
 
-def push_proxy_relationships(uri, relationships, from_label, rel_type):
+# used to be a single transaction for every proxy edge of the shard
+def push_proxy_relationships(uri, relationships, from_label, rel_type, fresh=False):
+    batcher = AdaptiveBatcher(BATCH_SIZE, name=f"{rel_type} proxy -> {uri}")
     with GraphDatabase.driver(uri, auth=AUTH) as driver:
         with driver.session(database="neo4j") as session:
-            session.execute_write(create_proxy_batch, relationships, from_label, rel_type)
+            batcher.push(lambda b: session.execute_write(create_proxy_batch, b, from_label, rel_type, fresh),
+                         relationships)
+    print(batcher.describe())
 
-def create_proxy_batch(tx, rels, from_label, rel_type):
-    tx.run(f"""
+def create_proxy_batch(tx, rels, from_label, rel_type, fresh=False):
+    return tx.run(f"""
         UNWIND $rels AS row
         MATCH (a:{from_label} {{vid: row.from}})
         MATCH (b:ProxyUniversal {{label: 'proxy'}})
-        MERGE (a)-[r:{rel_type}]->(b)
+        {"CREATE" if fresh else "MERGE"} (a)-[r:{rel_type}]->(b)
         SET r += row.props
     """, rels=[
         {"from": a, "props": props} for a, props in rels
-    ])
+    ]).consume()
 
-if __name__ == "__main__":
-    # edit this
-    CSV_PATH = "import/social_network/static/organisation_isLocatedIn_place_0_0.csv"
-    FROM_LABEL = "Organisation"
-    TO_LABEL = "Place"
-    REL_TYPE = "isLocatedIn"
+def create_ghost_index(tx):
+    tx.run("CREATE INDEX ghost_vid_sid IF NOT EXISTS FOR (g:Ghost) ON (g.vid, g.sid)")
 
-    FROM_VID_MAP_PATH = os.path.join(PARTITION_DIR, "organisation_vid_map.csv")
-    TO_VID_MAP_PATH = os.path.join(PARTITION_DIR, "place_vid_map.csv")
+def create_ghost_batch(tx, ghosts, to_label):
+    return tx.run("""
+        UNWIND $ghosts AS g
+        MERGE (n:Ghost {vid: g.vid, sid: g.sid})
+        ON CREATE SET n.label = $to_label
+    """, ghosts=ghosts, to_label=to_label).consume()
 
-    # load vid maps and partition map
-    from_vids = load_vid_map(FROM_VID_MAP_PATH)
-    to_vids = load_vid_map(TO_VID_MAP_PATH)
-    vid_to_sid = load_vid_sid_map()
+def create_ghost_edge_batch(tx, rels, from_label, rel_type, fresh=False):
+    return tx.run(f"""
+        UNWIND $rels AS row
+        MATCH (a:{from_label} {{vid: row.from}})
+        MATCH (g:Ghost {{vid: row.to, sid: row.to_sid}})
+        {"CREATE" if fresh else "MERGE"} (a)-[r:{rel_type}]->(g)
+        SET r += row.props
+    """, rels=[
+        {"from": a, "to": props["target_vid"], "to_sid": props["target_sid"], "props": props}
+        for a, props in rels
+    ]).consume()
 
-    # partition relationships
-    print(f"loading and partitioning relationships from {CSV_PATH}")
-    same_sid_batches, cross_sid = load_relationships_partitioned(CSV_PATH, from_vids, to_vids, vid_to_sid)
+# ghosts are created in bulk first, so the edge batches that follow only MATCH them
+# through the index; the edges are then scheduled like same-shard ones, a ghost being a node
+def push_ghost_relationships(pool, cross_sid, from_label, to_label, rel_type, fresh=False, batchers=None):
+    pool.run_on_all(create_ghost_index)
+    ghost_batcher, edge_batcher = batchers or (
+        AdaptiveBatcher(BATCH_SIZE, name=f"{to_label} ghosts"),
+        AdaptiveBatcher(BATCH_SIZE, name=f"{rel_type} ghost edges"),
+    )
 
-    # same-SID relationships
-    for sid, batch in same_sid_batches.items():
-        uri = DB_URIS.get(sid)
-        if not uri:
+    futures = []
+    for sid, batch in cross_sid.items():
+        if sid not in pool:
             print(f"no URI for sid={sid}")
             continue
-        print(f"Pushing {len(batch)} relationships to SID {sid} ({uri})")
-        push_relationships_to_neo4j(uri, batch, FROM_LABEL, TO_LABEL, REL_TYPE)
+        ghosts = sorted({(props["target_vid"], props["target_sid"]) for _, props in batch})
+        ghosts = [{"vid": vid, "sid": target_sid} for vid, target_sid in ghosts]
+        print(f"Creating {len(ghosts)} ghost vertices on SID {sid} ({DB_URIS[sid]})")
+        for batch in ghost_batcher.batches_of(ghosts):
+            futures.append(pool.submit(sid, create_ghost_batch, batch, to_label, batcher=ghost_batcher))
+    pool.wait(futures)
 
-    print(f"finished pushing same-instance relationships.")
-    print(f"skipped {len(cross_sid)} cross-instance relationships.")
     for sid, batch in cross_sid.items():
-        uri = DB_URIS.get(sid)
-        if not uri:
-            print(f"no URI for sid={sid}")
-            continue
-        print(f"Pushing {len(batch)} proxy relationships to SID {sid} ({uri})")
-        push_proxy_relationships(uri, batch, FROM_LABEL, REL_TYPE)
-
-    cross_path = os.path.join(PARTITION_DIR, f"{REL_TYPE}_cross_instance.csv")
-    with open(cross_path, "w", newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(["from_vid", "to_vid", "props"])
-        for sid_batch in cross_sid.values():
-            for a, props in sid_batch:
-                writer.writerow([a, props["target_vid"], str(props)])
-
-    print(f"Cross-instance relationships saved to: {cross_path}")
+        if sid in pool:
+            print(f"Pushing {len(batch)} ghost relationships to SID {sid} ({DB_URIS[sid]})")
+    rounds = run_rounds(pool, cross_sid, ghost_endpoints,
+                        create_ghost_edge_batch, from_label, rel_type, fresh, batcher=edge_batcher)
+    print(f"{rounds['batches']} ghost edge batches in {rounds['rounds']} rounds")
+    return ghost_batcher, edge_batcher
+
+# vid constraints for both endpoint labels on every shard (no-ops once the node load made them);
+# ghosts=True also creates the Ghost index, which emit_file relies on
+def prepare_shards(from_label, to_label, rel_type, fresh=False, ghosts=False):
+    for uri in DB_URIS.values():
+        with GraphDatabase.driver(uri, auth=AUTH) as driver:
+            with driver.session(database="neo4j") as session:
+                if fresh:
+                    require_empty(session, uri, rel_type)
+                ensure_vid_constraints(session, {from_label, to_label})
+                if ghosts:
+                    session.execute_write(create_ghost_index)
+
+# append=False first drops the edges this label pair already has in the store;
+# rel types spread over several LDBC files append after the first chunk
+def write_cross_instance(from_label, rel_type, to_label, cross_sid, append=False):
+    with CrossEdgeStore(CROSS_EDGE_STORE) as store:
+        store.add(from_label, rel_type, to_label, cross_sid, replace=not append)
+    return CROSS_EDGE_STORE
+
+# one relationship file against maps already in memory, a chunk at a time; a shared pool
+# (rel_manifest runs several files at once) is left open, otherwise one is opened here
+def push_file(csv_path, from_label, to_label, rel_type, from_vids, to_vids, vid_to_sid,
+              mode=CROSS_SHARD_MODE, fresh=FRESH_LOAD, pool=None, append_cross=False):
+    print(f"loading and partitioning relationships from {csv_path}")
+    same = cross = missing = 0
+    batcher = ghost_batchers = None
+    own_pool = pool is None
+    if own_pool:
+        pool = ShardPool(DB_URIS, AUTH, WORKERS_PER_SHARD)
+    try:
+        for same_sid_batches, cross_sid, chunk_missing in iter_partitioned_chunks(csv_path, from_vids, to_vids,
+                                                                                 vid_to_sid):
+            # same-SID relationships
+            batcher = push_relationships_to_neo4j(pool, same_sid_batches, from_label, to_label, rel_type,
+                                                  fresh, batcher)
+            if mode == "ghost":
+                ghost_batchers = push_ghost_relationships(pool, cross_sid, from_label, to_label, rel_type,
+                                                          fresh, ghost_batchers)
+            else:
+                # every proxy edge ends at the one ProxyUniversal node, so these stay sequential
+                for sid, batch in cross_sid.items():
+                    uri = DB_URIS.get(sid)
+                    if not uri:
+                        print(f"no URI for sid={sid}")
+                        continue
+                    print(f"Pushing {len(batch)} proxy relationships to SID {sid} ({uri})")
+                    push_proxy_relationships(uri, batch, from_label, rel_type, fresh)
+
+            write_cross_instance(from_label, rel_type, to_label, cross_sid, append_cross)
+            append_cross = True
+            same += sum(len(batch) for batch in same_sid_batches.values())
+            cross += sum(len(batch) for batch in cross_sid.values())
+            missing += chunk_missing
+        if own_pool:
+            pool.print_summary()
+    finally:
+        if own_pool:
+            pool.close()
+
+    if missing:
+        print(f"Missing VID or SID for {missing} rows")
+    for b in [batcher] + list(ghost_batchers or []):
+        if b is not None:
+            print(b.describe())
+    print(f"Cross-instance relationships saved to: {CROSS_EDGE_STORE}")
+    return same, cross, missing
+
+# push_file for an async_pipeline producer. Per shard, a chunk's same-shard rounds, its
+# ghosts (one round) and its ghost edge rounds are queued in that order; the round barriers
+# make the ghosts exist before the edges that MATCH them. Proxy edges all end at the one
+# ProxyUniversal node, so they go one batch per round.
+def emit_file(emit, csv_path, from_label, to_label, rel_type, from_vids, to_vids, vid_to_sid,
+              mode=CROSS_SHARD_MODE, fresh=FRESH_LOAD, append_cross=False, batchers=None,
+              chunk_rows=PIPELINE_CHUNK_ROWS):
+    print(f"loading and partitioning relationships from {csv_path}")
+    batcher, ghost_batcher, cross_batcher = batchers or (
+        AdaptiveBatcher(BATCH_SIZE, name=rel_type),
+        AdaptiveBatcher(BATCH_SIZE, name=f"{to_label} ghosts"),
+        AdaptiveBatcher(BATCH_SIZE, name=f"{rel_type} ghost edges" if mode == "ghost" else f"{rel_type} proxy"),
+    )
+    same = cross = missing = 0
+    for same_sid_batches, cross_sid, chunk_missing in iter_partitioned_chunks(csv_path, from_vids, to_vids,
+                                                                             vid_to_sid, chunk_rows):
+        for sid in set(same_sid_batches) | set(cross_sid):
+            if sid not in emit:
+                print(f"no URI for sid={sid}")
+        emit_rounds(emit, same_sid_batches, same_shard_endpoints,
+                    create_batch, from_label, to_label, rel_type, fresh, batcher=batcher)
+        if mode == "ghost":
+            for sid, batch in cross_sid.items():
+                if sid in emit:
+                    ghosts = sorted({(props["target_vid"], props["target_sid"]) for _, props in batch})
+                    ghosts = [{"vid": vid, "sid": target_sid} for vid, target_sid in ghosts]
+                    emit(sid, ("round", create_ghost_batch, list(ghost_batcher.batches_of(ghosts)),
+                               (to_label,), ghost_batcher))
+            emit_rounds(emit, cross_sid, ghost_endpoints,
+                        create_ghost_edge_batch, from_label, rel_type, fresh, batcher=cross_batcher)
+        else:
+            # one proxy batch at a time per shard, cut like push_proxy_relationships does
+            parts = {sid: cross_batcher.batches_of(batch) for sid, batch in cross_sid.items() if sid in emit}
+            while parts:
+                for sid in list(parts):
+                    part = next(parts[sid], None)
+                    if part is None:
+                        del parts[sid]
+                        continue
+                    emit(sid, ("round", create_proxy_batch, [part], (from_label, rel_type, fresh), cross_batcher))
+
+        write_cross_instance(from_label, rel_type, to_label, cross_sid, append_cross)
+        append_cross = True
+        same += sum(len(batch) for batch in same_sid_batches.values())
+        cross += sum(len(batch) for batch in cross_sid.values())
+        missing += chunk_missing
+
+    if missing:
+        print(f"Missing VID or SID for {missing} rows")
+    return same, cross, missing, (batcher, ghost_batcher, cross_batcher)
+
+def load_and_push(csv_path, from_label, to_label, rel_type, from_vid_map_path, to_vid_map_path,
+                  mode=CROSS_SHARD_MODE, fresh=FRESH_LOAD):
+    prepare_shards(from_label, to_label, rel_type, fresh)
+
+    # load vid maps and partition map
+    from_vids = load_vid_map(from_vid_map_path)
+    to_vids = load_vid_map(to_vid_map_path)
+    vid_to_sid = load_vid_sid_map()
+
+    same, cross, _ = push_file(csv_path, from_label, to_label, rel_type, from_vids, to_vids, vid_to_sid,
+                               mode, fresh)
+    return same, cross
+
+if __name__ == "__main__":
+    # every relationship file found under import/social_network; see rel_manifest.py
+    from rel_manifest import main
+    main(partitioned=True)
@@ -1,13 +1,27 @@
 #2 generate graph.txt
 import os
+import re
 import csv
-from collections import defaultdict
+import json
+import math
+import argparse
+from itertools import islice
+import numpy as np
+from ldbc_schema import file_stem, relationship_for
+from vid_store import open_vid_map
+from columnar import write_table
+from cluster_config import load_config
+from instrumentation import metrics
 
 SOCIAL_NETWORK_DIR = "import/social_network"
 PARTITIONED_VID_DIR = "partitioned_vids"
 GRAPH_OUTPUT_DIR = "graph_outputs"
 GRAPH_OUTPUT_FILE = os.path.join(GRAPH_OUTPUT_DIR, "graph.txt")
 #INDEX_MAP_FILE = os.path.join(GRAPH_OUTPUT_DIR, "vid_index_map.csv")
+VERTEX_WEIGHTS_FILE = os.path.join(GRAPH_OUTPUT_DIR, "vertex_weights.csv")
+CHUNK_ROWS = 200_000
+BYTES_UNIT = 64  # property-bytes weights are counted in 64-byte units to stay inside METIS idx_t
+MAX_EDGE_WEIGHT = 100
 
 # Relationships to include in the graph
 RELATIONSHIPS = [
@@ -17,26 +31,179 @@ RELATIONSHIPS = [
     ("person", "place", "person_isLocatedIn_place_0_0.csv"),
     ("forum", "tag", "forum_hasTag_tag_0_0.csv"),
     ("tag", "tagclass", "tag_hasType_tagclass_0_0.csv"),
+    ("forum", "post", "forum_containerOf_post_0_0.csv"),
+    ("post", "person", "post_hasCreator_person_0_0.csv"),
+    ("comment", "person", "comment_hasCreator_person_0_0.csv"),
+    ("comment", "post", "comment_replyOf_post_0_0.csv"),
+    ("comment", "comment", "comment_replyOf_comment_0_0.csv"),
 ]
 
 def load_vid_map(label):
     path = os.path.join(PARTITIONED_VID_DIR, f"{label}_vid_map.csv")
-    if not os.path.exists(path):
-        raise FileNotFoundError(f"VID map not found: {path}")
-    
-    vid_map = {}
-    with open(path, newline='') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
+    return open_vid_map(path)
+
+def find_relationship_file(rel_file):
+    for subfolder in ["static", "dynamic"]:
+        candidate_path = os.path.join(SOCIAL_NETWORK_DIR, subfolder, rel_file)
+        if os.path.exists(candidate_path):
+            return candidate_path
+    return None
+
+def _parse_pairs(lines):
+    try:
+        return np.loadtxt(lines, delimiter="|", usecols=(0, 1), dtype=np.int64, ndmin=2)
+    except ValueError:
+        # malformed rows are skipped, same as the row-by-row reader did
+        pairs = []
+        for line in lines:
             try:
-                original_id = int(row["original_id"])
-                vid = int(row["vid"])
-                vid_map[original_id] = vid
-            except Exception:
+                fields = line.split("|", 2)
+                pairs.append((int(fields[0]), int(fields[1])))
+            except (ValueError, IndexError):
                 continue
-    return vid_map
+        return np.array(pairs, dtype=np.int64).reshape(-1, 2)
+
+def read_id_pairs(rel_path, chunk_rows=CHUNK_ROWS):
+    with open(rel_path, newline='') as f:
+        if not f.readline():
+            return
+        while True:
+            lines = [line for line in islice(f, chunk_rows) if line.strip()]
+            if not lines:
+                break
+            pairs = _parse_pairs(lines)
+            yield pairs[:, 0], pairs[:, 1]
+
+# yields (src_label, dst_label, rel_file, src_vids, dst_vids) per chunk, rows with unknown ids dropped
+def iter_edge_arrays(vid_maps, relationships=RELATIONSHIPS, chunk_rows=CHUNK_ROWS):
+    for src_label, dst_label, rel_file in relationships:
+        rel_path = find_relationship_file(rel_file)
+        if rel_path is None:
+            print(f"Skipping missing relationship file: {rel_file} (not found in static/ or dynamic/)")
+            continue
+
+        for src_ids, dst_ids in read_id_pairs(rel_path, chunk_rows):
+            src_vids, src_found = vid_maps[src_label].lookup(src_ids)
+            dst_vids, dst_found = vid_maps[dst_label].lookup(dst_ids)
+            keep = src_found & dst_found
+            yield src_label, dst_label, rel_file, src_vids[keep], dst_vids[keep]
+
+# symmetrized, de-duplicated adjacency in CSR form over the sorted vids; with edge weights,
+# parallel edges collapse into one whose weight is the sum (returned aligned with cols)
+def build_csr(src_vids, dst_vids, weights=None):
+    all_vids = np.unique(np.concatenate([src_vids, dst_vids]))
+    n = len(all_vids)
+    src_idx = np.searchsorted(all_vids, src_vids)
+    dst_idx = np.searchsorted(all_vids, dst_vids)
+
+    keys = np.concatenate([src_idx * n + dst_idx, dst_idx * n + src_idx])
+    col_weights = None
+    if weights is None:
+        keys = np.unique(keys)
+    else:
+        keys, inverse = np.unique(keys, return_inverse=True)
+        col_weights = np.bincount(inverse, weights=np.concatenate([weights, weights]), minlength=len(keys))
+        col_weights = np.minimum(np.rint(col_weights), np.iinfo(np.int32).max).astype(np.int64)
+    rows, cols = np.divmod(keys, n) if n else (keys, keys)
+
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=offsets[1:])
+    return all_vids, offsets, cols, col_weights
+
+# vertex_weights is an (n, ncon) int array, edge_weights is aligned with cols;
+# either one switches the header to the weighted METIS format ("n m fmt ncon")
+def write_metis_graph(path, offsets, cols, num_edges, chunk_rows=CHUNK_ROWS,
+                      vertex_weights=None, edge_weights=None):
+    n = len(offsets) - 1
+    header = f"{n} {num_edges}"
+    if vertex_weights is not None or edge_weights is not None:
+        header += f" 0{int(vertex_weights is not None)}{int(edge_weights is not None)}"
+        if vertex_weights is not None:
+            header += f" {vertex_weights.shape[1]}"
+    with open(path, "w") as f:
+        f.write(header + "\n")
+        for start in range(0, n, chunk_rows):
+            end = min(start + chunk_rows, n)
+            lo, hi = offsets[start], offsets[end]
+            values = cols[lo:hi] + 1  # METIS is 1-based
+            step = 1
+            if edge_weights is not None:
+                values = np.stack([values, edge_weights[lo:hi]], axis=1).ravel()
+                step = 2
+            bounds = ((offsets[start:end + 1] - lo) * step).tolist()
+            values = values.tolist()
+            lines = [" ".join(map(str, values[bounds[i]:bounds[i + 1]])) for i in range(end - start)]
+            if vertex_weights is not None:
+                prefixes = [" ".join(map(str, w)) for w in vertex_weights[start:end].tolist()]
+                lines = [f"{p} {line}" if line else p for p, line in zip(prefixes, lines)]
+            f.write("\n".join(lines) + "\n")
+
+# serialized size of each vertex's properties: bytes of its CSV row minus the id column
+def property_bytes(vid_maps, all_vids, chunk_rows=CHUNK_ROWS):
+    sizes = np.zeros(len(all_vids), dtype=np.int64)
+    for label, vid_map in vid_maps.items():
+        path = find_relationship_file(f"{label}_0_0.csv")
+        if path is None:
+            print(f"Skipping property bytes for {label}: node file not found")
+            continue
+        with open(path, "rb") as f:
+            f.readline()
+            while True:
+                lines = [line for line in islice(f, chunk_rows) if line.strip()]
+                if not lines:
+                    break
+                ids, lengths = [], []
+                for line in lines:
+                    original_id, _, rest = line.rstrip(b"\r\n").partition(b"|")
+                    ids.append(int(original_id))
+                    lengths.append(len(rest))
+                vids, found = vid_map.lookup(ids)
+                idx = np.searchsorted(all_vids, vids[found])
+                inside = idx < len(all_vids)
+                idx, lengths = idx[inside], np.asarray(lengths)[found][inside]
+                matched = all_vids[idx] == vids[found][inside]
+                sizes[idx[matched]] += lengths[matched]
+    return sizes
 
-def main():
+def vertex_weight_columns(kinds, vid_maps, all_vids, offsets):
+    columns = {}
+    for kind in kinds:
+        if kind == "degree":
+            columns[kind] = np.diff(offsets)
+        elif kind == "bytes":
+            columns[kind] = np.maximum(-(-property_bytes(vid_maps, all_vids) // BYTES_UNIT), 1)
+        else:
+            raise ValueError(f"unknown vertex weight {kind!r}")
+    return columns
+
+# per relationship file multiplier: explicit JSON ({file stem or rel type: weight}) and/or
+# how often each relationship type is mentioned in a Cypher query log, scaled to 1..MAX_EDGE_WEIGHT
+def relationship_weights(relationships=RELATIONSHIPS, weights_file=None, query_log=None):
+    explicit = {}
+    if weights_file:
+        with open(weights_file) as f:
+            explicit = json.load(f)
+
+    mentions = {}
+    if query_log:
+        with open(query_log, encoding="utf-8", errors="replace") as f:
+            text = f.read()
+        for _, _, rel_file in relationships:
+            rel_type = relationship_for(rel_file)[1]
+            mentions[rel_type] = len(re.findall(rf":\s*`?{re.escape(rel_type)}\b", text))
+    top = max(mentions.values(), default=0)
+
+    weights = {}
+    for _, _, rel_file in relationships:
+        stem = file_stem(rel_file)
+        rel_type = relationship_for(rel_file)[1]
+        weight = explicit.get(stem, explicit.get(rel_type, 1))
+        if top:
+            weight *= 1 + math.ceil((MAX_EDGE_WEIGHT - 1) * mentions[rel_type] / top)
+        weights[rel_file] = max(int(round(weight)), 1)
+    return weights
+
+def main(vertex_weights=(), weights_file=None, query_log=None):
     os.makedirs(GRAPH_OUTPUT_DIR, exist_ok=True)
 
     #  unique labels from relationships
@@ -54,68 +221,66 @@ def main():
             print(f"Error loading VID map for {label}: {e}")
             return
 
-    edges = defaultdict(set)
-    all_vids = set()
-
     # edges
-    for src_label, dst_label, rel_file in RELATIONSHIPS:
-        rel_path = None
-        for subfolder in ["static", "dynamic"]:
-            candidate_path = os.path.join(SOCIAL_NETWORK_DIR, subfolder, rel_file)
-            if os.path.exists(candidate_path):
-                rel_path = candidate_path
-                break
-
-        if rel_path is None:
-            print(f"Skipping missing relationship file: {rel_file} (not found in static/ or dynamic/)")
-            continue
-
-        with open(rel_path, newline='') as f:
-            reader = csv.reader(f, delimiter="|")
-            try:
-                next(reader)
-            except StopIteration:
-                continue
-
-            for row in reader:
-                try:
-                    src_id = int(row[0])
-                    dst_id = int(row[1])
-                    src_vid = vid_maps[src_label][src_id]
-                    dst_vid = vid_maps[dst_label][dst_id]
+    edge_weighted = bool(weights_file or query_log)
+    rel_weights = relationship_weights(RELATIONSHIPS, weights_file, query_log) if edge_weighted else {}
+    src_chunks, dst_chunks = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+    weight_chunks = [np.empty(0, dtype=np.int64)]
+    with metrics.stage("read_edges") as stage:
+        for _, _, rel_file, src_vids, dst_vids in iter_edge_arrays(vid_maps):
+            src_chunks.append(src_vids)
+            dst_chunks.append(dst_vids)
+            if edge_weighted:
+                weight_chunks.append(np.full(len(src_vids), rel_weights[rel_file], dtype=np.int64))
+            stage["rows"] += len(src_vids)
 
-                    edges[src_vid].add(dst_vid)
-                    edges[dst_vid].add(src_vid)
-                    all_vids.update([src_vid, dst_vid])
-                except Exception:
-                    continue
+    with metrics.stage("build_csr"):
+        all_vids, offsets, cols, col_weights = build_csr(
+            np.concatenate(src_chunks), np.concatenate(dst_chunks),
+            np.concatenate(weight_chunks) if edge_weighted else None,
+        )
+    del src_chunks, dst_chunks, weight_chunks
 
-    all_vids = sorted(all_vids)
-    vid_to_index = {vid: i + 1 for i, vid in enumerate(all_vids)}
+    index_map_path = os.path.join(GRAPH_OUTPUT_DIR, "vid_index_map.csv")
+    write_table(index_map_path, {"vid": all_vids, "index": np.arange(1, len(all_vids) + 1, dtype=np.int64)})
 
+    # vertex weights go to METIS and, keyed by vid, to sid_generator for its per-shard report
+    weight_matrix = None
+    if vertex_weights:
+        columns = vertex_weight_columns(vertex_weights, vid_maps, all_vids, offsets)
+        weight_matrix = np.column_stack(list(columns.values()))
+        with open(VERTEX_WEIGHTS_FILE, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["vid"] + list(columns))
+            writer.writerows(np.column_stack([all_vids, weight_matrix]).tolist())
+        print(f"vertex weights ({', '.join(columns)}) written to {VERTEX_WEIGHTS_FILE}")
+    elif os.path.exists(VERTEX_WEIGHTS_FILE):
+        os.remove(VERTEX_WEIGHTS_FILE)
+    if edge_weighted:
+        print("edge weights: " + ", ".join(f"{file_stem(r)}={w}" for r, w in rel_weights.items()))
 
-    index_map_path = os.path.join(GRAPH_OUTPUT_DIR, "vid_index_map.csv")
-    with open(index_map_path, "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(["vid", "index"])
-        for vid, index in vid_to_index.items():
-            writer.writerow([vid, index])
-
-    with open(GRAPH_OUTPUT_FILE, "w") as f:
-        num_nodes = len(all_vids)
-        num_edges = sum(len(nbrs) for nbrs in edges.values()) // 2
-        f.write(f"{num_nodes} {num_edges}\n")
-
-        for vid in all_vids:
-            neighbors = edges.get(vid, set())
-            neighbor_indices = sorted(vid_to_index[nbr] for nbr in neighbors if nbr in vid_to_index)
-            f.write(" ".join(map(str, neighbor_indices)) + "\n")
+    num_nodes = len(all_vids)
+    num_edges = len(cols) // 2
+    with metrics.stage("write_graph") as stage:
+        write_metis_graph(GRAPH_OUTPUT_FILE, offsets, cols, num_edges,
+                          vertex_weights=weight_matrix, edge_weights=col_weights)
+        stage["rows"] = num_nodes
 
     print(f"graph.txt written to {GRAPH_OUTPUT_FILE} with {num_nodes} nodes and {num_edges} edges")
     print(f"vid_index_map.csv written to {index_map_path}")
+    print(f"next: gpmetis {GRAPH_OUTPUT_FILE} {load_config().num_shards}")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Write the METIS graph for the RELATIONSHIPS edge files.")
+    parser.add_argument("--vertex-weights", nargs="+", choices=["degree", "bytes"], default=[],
+                        help="one METIS balance constraint per weight")
+    parser.add_argument("--edge-weights", metavar="JSON",
+                        help="multipliers keyed by relationship file stem or type, e.g. {\"knows\": 4}")
+    parser.add_argument("--query-log", help="Cypher query log; relationship types weighted by how often they appear")
+    args = parser.parse_args()
+    metrics.start("partition_maps")
+    main(args.vertex_weights, args.edge_weights, args.query_log)
+    metrics.finish()
 
 
 #     # Remap vids to metis 
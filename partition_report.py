@@ -0,0 +1,112 @@
+import os
+import json
+import argparse
+import numpy as np
+from partition_maps import RELATIONSHIPS, load_vid_map, iter_edge_arrays
+from vid_store import open_sid_map, NO_SID
+
+# Quality numbers for a vid_sid_log before anything is loaded: vertices and edges per
+# shard, imbalance, edge cut per relationship file and the share of edges that would be
+# written as proxy/ghost edges. Edges are placed on the shard of their source vertex,
+# the same way partioned_relationship_loader pushes them.
+
+VID_SID_LOG = os.path.join("partitioned_vids", "vid_sid_log.csv")
+REPORT_FILE = os.path.join("graph_outputs", "partition_report.json")
+
+
+def _imbalance(counts):
+    mean = counts.mean() if len(counts) else 0
+    return round(float(counts.max() / mean), 4) if mean else None
+
+
+def build_report(sid_log=VID_SID_LOG, relationships=RELATIONSHIPS):
+    vid_to_sid = open_sid_map(sid_log)
+    shards = vid_to_sid.shard_ids()
+    k = max(shards) + 1 if shards else 0
+    assigned = np.asarray(vid_to_sid.sids)
+    vertices = np.bincount(assigned[assigned != NO_SID], minlength=k)
+
+    labels = sorted({label for src, dst, _ in relationships for label in (src, dst)})
+    vid_maps = {label: load_vid_map(label) for label in labels}
+
+    local = np.zeros(k, dtype=np.int64)
+    outgoing = np.zeros(k, dtype=np.int64)
+    ghost_keys = [np.empty(0, dtype=np.int64)]
+    stride = len(assigned)
+    per_rel = {}
+    for src_label, dst_label, rel_file, src_vids, dst_vids in iter_edge_arrays(vid_maps, relationships):
+        stats = per_rel.setdefault(rel_file, {"edges": 0, "cut": 0, "unassigned": 0})
+        src_sids = vid_to_sid.lookup(src_vids)
+        dst_sids = vid_to_sid.lookup(dst_vids)
+        ok = (src_sids != NO_SID) & (dst_sids != NO_SID)
+        cut = ok & (src_sids != dst_sids)
+
+        stats["edges"] += int(ok.sum())
+        stats["cut"] += int(cut.sum())
+        stats["unassigned"] += int((~ok).sum())
+        local += np.bincount(src_sids[ok & ~cut], minlength=k)
+        outgoing += np.bincount(src_sids[cut], minlength=k)
+        ghost_keys.append(np.unique(src_sids[cut] * stride + dst_vids[cut]))
+
+    for stats in per_rel.values():
+        stats["cut_share"] = round(stats["cut"] / stats["edges"], 4) if stats["edges"] else 0.0
+
+    # one ghost vertex per (source shard, remote target) pair
+    ghosts = np.bincount(np.unique(np.concatenate(ghost_keys)) // max(stride, 1), minlength=k)
+    edges = local + outgoing
+    total_edges = int(edges.sum())
+    total_cut = int(outgoing.sum())
+    return {
+        "sid_log": sid_log,
+        "shards": k,
+        "vertices": int(vertices.sum()),
+        "edges": total_edges,
+        "edge_cut": total_cut,
+        # every cut edge is written as one proxy (or ghost) edge on its source shard
+        "proxy_share": round(total_cut / total_edges, 4) if total_edges else 0.0,
+        "vertex_imbalance": _imbalance(vertices),
+        "edge_imbalance": _imbalance(edges),
+        "per_shard": [
+            {
+                "sid": sid,
+                "vertices": int(vertices[sid]),
+                "edges": int(edges[sid]),
+                "local_edges": int(local[sid]),
+                "proxy_edges": int(outgoing[sid]),
+                "ghost_vertices": int(ghosts[sid]),
+            }
+            for sid in range(k)
+        ],
+        "per_relationship": per_rel,
+    }
+
+
+def print_report(report):
+    print(f"{report['vertices']} vertices, {report['edges']} edges on {report['shards']} shards")
+    print(f"edge cut {report['edge_cut']} ({report['proxy_share']:.1%} of edges become proxy edges), "
+          f"vertex imbalance {report['vertex_imbalance']}, edge imbalance {report['edge_imbalance']}")
+    print()
+    print(f"{'sid':>4} {'vertices':>10} {'edges':>10} {'local':>10} {'proxy':>10} {'proxy %':>8} {'ghosts':>8}")
+    for row in report["per_shard"]:
+        share = row["proxy_edges"] / row["edges"] if row["edges"] else 0.0
+        print(f"{row['sid']:>4} {row['vertices']:>10} {row['edges']:>10} {row['local_edges']:>10} "
+              f"{row['proxy_edges']:>10} {share:>8.1%} {row['ghost_vertices']:>8}")
+    print()
+    print(f"{'relationship':<44} {'edges':>10} {'cut':>10} {'cut %':>7} {'missing':>8}")
+    for rel_file, stats in report["per_relationship"].items():
+        print(f"{rel_file:<44} {stats['edges']:>10} {stats['cut']:>10} "
+              f"{stats['cut_share']:>7.1%} {stats['unassigned']:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report edge cut and balance of a vid_sid_log.")
+    parser.add_argument("--sid-log", default=VID_SID_LOG)
+    parser.add_argument("--output", default=REPORT_FILE)
+    args = parser.parse_args()
+
+    report = build_report(args.sid_log)
+    print_report(report)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {args.output}")
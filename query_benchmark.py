@@ -0,0 +1,590 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import numpy as np
+from neo4j import AsyncGraphDatabase
+
+import fake_neo4j
+import load_rels
+import query_router
+from query_router import QueryRouter
+from vid_store import open_vid_map
+from ldbc_reader import parse_datetime
+from instrumentation import metrics
+
+# LDBC SNB Interactive reads, IS1-IS7 and IC2/IC8/IC9/IC13, against the single-instance
+# load (load_nodes/load_rels) and the METIS-partitioned one (metis_loader/
+# partioned_relationship_loader). The single instance gets each read as one Cypher
+# statement. The partitioned cluster runs the same read as a plan of QueryRouter hops and
+# batched property reads, so its latency includes every scatter-gather round and
+# cross-shard edge. Substitution parameters are original LDBC ids drawn from the VID maps
+# of both loads, so both targets answer for the same vertices. Every query runs --runs
+# times with --concurrency in flight. p50/p95/p99 latency and throughput go to a JSON
+# report and are printed side by side. --backend fake answers from fake_neo4j: no rows,
+# optional latency per statement. It exercises the driver and the routing without a server;
+# loader_benchmark.py writes both loads' maps into its workdir for --workdir to point at.
+
+SHORT_READS = ["IS1", "IS2", "IS3", "IS4", "IS5", "IS6", "IS7"]
+COMPLEX_READS = ["IC2", "IC8", "IC9", "IC13"]
+QUERIES = SHORT_READS + COMPLEX_READS
+TARGETS = ["single", "partitioned"]
+MESSAGE_LABELS = ("Post", "Comment")
+MAX_DATE = "2012-06-01T00:00:00.000+0000"
+MAX_PATH_HOPS = 4  # IC13 gives up beyond this, on both targets
+MAX_REPLY_DEPTH = 64
+RESULTS_FILE = os.path.join("bench_results", "query_benchmark.json")
+
+PERSON_FIELDS = ["firstName", "lastName", "birthday", "locationIP", "browserUsed", "gender", "creationDate"]
+
+# {label} is the message label of IS4-IS7, {max_hops} is MAX_PATH_HOPS
+CYPHER = {
+    "IS1": """
+        MATCH (n:Person {{vid: $personVid}})-[:isLocatedIn]->(p:Place)
+        RETURN n.firstName AS firstName, n.lastName AS lastName, n.birthday AS birthday,
+               n.locationIP AS locationIP, n.browserUsed AS browserUsed, n.gender AS gender,
+               n.creationDate AS creationDate, p.vid AS cityVid
+    """,
+    "IS2": """
+        MATCH (:Person {{vid: $personVid}})<-[:hasCreator]-(m)
+        WITH m ORDER BY m.creationDate DESC, m.vid ASC LIMIT 10
+        MATCH (m)-[:replyOf*0..]->(p:Post)-[:hasCreator]->(c:Person)
+        RETURN m.vid AS messageVid, coalesce(m.content, m.imageFile) AS content, m.creationDate AS creationDate,
+               p.vid AS postVid, c.vid AS authorVid, c.firstName AS firstName, c.lastName AS lastName
+        ORDER BY creationDate DESC, messageVid ASC
+    """,
+    "IS3": """
+        MATCH (:Person {{vid: $personVid}})-[r:knows]-(friend:Person)
+        RETURN friend.vid AS personVid, friend.firstName AS firstName, friend.lastName AS lastName,
+               r.creationDate AS friendshipCreationDate
+        ORDER BY friendshipCreationDate DESC, personVid ASC
+    """,
+    "IS4": """
+        MATCH (m:{label} {{vid: $messageVid}})
+        RETURN m.creationDate AS creationDate, coalesce(m.content, m.imageFile) AS content
+    """,
+    "IS5": """
+        MATCH (:{label} {{vid: $messageVid}})-[:hasCreator]->(p:Person)
+        RETURN p.vid AS personVid, p.firstName AS firstName, p.lastName AS lastName
+    """,
+    "IS6": """
+        MATCH (:{label} {{vid: $messageVid}})-[:replyOf*0..]->(:Post)<-[:containerOf]-(f:Forum)
+              -[:hasModerator]->(mod:Person)
+        RETURN f.vid AS forumVid, f.title AS forumTitle, mod.vid AS moderatorVid,
+               mod.firstName AS moderatorFirstName, mod.lastName AS moderatorLastName
+    """,
+    "IS7": """
+        MATCH (m:{label} {{vid: $messageVid}})<-[:replyOf]-(c:Comment)-[:hasCreator]->(p:Person)
+        OPTIONAL MATCH (m)-[:hasCreator]->(a:Person)-[r:knows]-(p)
+        RETURN c.vid AS commentVid, c.content AS content, c.creationDate AS creationDate,
+               p.vid AS authorVid, p.firstName AS firstName, p.lastName AS lastName, r IS NOT NULL AS knows
+        ORDER BY creationDate DESC, authorVid ASC
+    """,
+    "IC2": """
+        MATCH (:Person {{vid: $personVid}})-[:knows]-(friend:Person)<-[:hasCreator]-(m)
+        WHERE m.creationDate <= $maxDate
+        RETURN friend.vid AS personVid, friend.firstName AS firstName, friend.lastName AS lastName,
+               m.vid AS messageVid, coalesce(m.content, m.imageFile) AS content, m.creationDate AS creationDate
+        ORDER BY creationDate DESC, messageVid ASC LIMIT 20
+    """,
+    "IC8": """
+        MATCH (:Person {{vid: $personVid}})<-[:hasCreator]-()<-[:replyOf]-(c:Comment)-[:hasCreator]->(p:Person)
+        RETURN p.vid AS personVid, p.firstName AS firstName, p.lastName AS lastName,
+               c.vid AS commentVid, c.content AS content, c.creationDate AS creationDate
+        ORDER BY creationDate DESC, commentVid ASC LIMIT 20
+    """,
+    "IC9": """
+        MATCH (root:Person {{vid: $personVid}})-[:knows*1..2]-(friend:Person)
+        WHERE friend <> root
+        WITH DISTINCT friend
+        MATCH (friend)<-[:hasCreator]-(m)
+        WHERE m.creationDate < $maxDate
+        RETURN friend.vid AS personVid, friend.firstName AS firstName, friend.lastName AS lastName,
+               m.vid AS messageVid, coalesce(m.content, m.imageFile) AS content, m.creationDate AS creationDate
+        ORDER BY creationDate DESC, messageVid ASC LIMIT 20
+    """,
+    "IC13": """
+        MATCH (a:Person {{vid: $person1Vid}}), (b:Person {{vid: $person2Vid}})
+        OPTIONAL MATCH path = shortestPath((a)-[:knows*..{max_hops}]-(b))
+        RETURN CASE WHEN path IS NULL THEN -1 ELSE length(path) END AS shortestPathLength
+    """,
+}
+
+
+# newest first, ties by vid, like ORDER BY creationDate DESC, vid ASC
+def _latest(props, limit, before=None, inclusive=True):
+    vids = sorted(vid for vid, p in props.items() if p.get("creationDate") is not None and (
+        before is None or (p["creationDate"] <= before if inclusive else p["creationDate"] < before)))
+    vids.sort(key=lambda vid: props[vid]["creationDate"], reverse=True)
+    return vids[:limit]
+
+
+# ORDER BY value DESC: Cypher puts nulls first under DESC
+def _descending(value):
+    return value is None, value
+
+
+def _content(props):
+    return props.get("content") or props.get("imageFile")
+
+
+# the router calls of one partitioned read, with the shard requests they cost
+class RoutedPlan:
+    def __init__(self, router):
+        self.router = router
+        self.requests = 0
+
+    def label(self, vid):
+        return self.router.labels.get(vid)
+
+    async def hop(self, vids, rel_type, direction):
+        if not vids:
+            return {}
+        neighbours, _, requests, _ = await self.router.expand(vids, rel_type, direction)
+        self.requests += requests
+        return neighbours
+
+    # {vid: {neighbour: edge properties}}
+    async def edges(self, vids, rel_type, direction, keys=None):
+        if not vids:
+            return {}
+        edges, _, requests, _ = await self.router.expand_edges(vids, rel_type, direction, keys)
+        self.requests += requests
+        return edges
+
+    async def props(self, vids, keys=None):
+        if not vids:
+            return {}
+        props, _, requests = await self.router.properties(vids, keys)
+        self.requests += requests
+        return props
+
+    # message vid -> the Post at the root of its replyOf chain
+    async def root_posts(self, messages):
+        roots = {}
+        walking = {vid: vid for vid in messages}
+        for _ in range(MAX_REPLY_DEPTH):
+            for message, vid in list(walking.items()):
+                label = self.label(vid)
+                if label != "Comment":
+                    if label == "Post":
+                        roots[message] = vid
+                    del walking[message]
+            if not walking:
+                break
+            parents = await self.hop(set(walking.values()), "replyOf", "out")
+            walking = {message: min(parents[vid]) for message, vid in walking.items() if parents.get(vid)}
+        return roots
+
+    async def creators(self, messages):
+        found = await self.hop(messages, "hasCreator", "out")
+        return {message: min(people) for message, people in found.items() if people}
+
+    async def latest_messages(self, vids, limit, before=None, inclusive=True):
+        return _latest(await self.props(vids, ["creationDate"]), limit, before, inclusive)
+
+    def message_rows(self, messages, creators, props):
+        rows = []
+        for vid in messages:
+            person = props.get(creators.get(vid), {})
+            message = props.get(vid, {})
+            rows.append({"personVid": creators.get(vid), "firstName": person.get("firstName"),
+                         "lastName": person.get("lastName"), "messageVid": vid,
+                         "content": _content(message), "creationDate": message.get("creationDate")})
+        return rows
+
+
+async def is1(plan, params):
+    person = params["personVid"]
+    props, places = await asyncio.gather(plan.props([person]), plan.hop([person], "isLocatedIn", "out"))
+    if person not in props:
+        return []
+    row = {field: props[person].get(field) for field in PERSON_FIELDS}
+    row["cityVid"] = min(places.get(person, ()), default=None)
+    return [row]
+
+
+async def is2(plan, params):
+    person = params["personVid"]
+    messages = (await plan.hop([person], "hasCreator", "in")).get(person, set())
+    latest = await plan.latest_messages(messages, 10)
+    roots = await plan.root_posts(latest)
+    authors = await plan.creators(set(roots.values()))
+    props = await plan.props(set(latest) | set(authors.values()))
+    rows = []
+    for vid in latest:
+        author = authors.get(roots.get(vid))
+        if author is None:
+            continue
+        message, person = props.get(vid, {}), props.get(author, {})
+        rows.append({"messageVid": vid, "content": _content(message), "creationDate": message.get("creationDate"),
+                     "postVid": roots[vid], "authorVid": author,
+                     "firstName": person.get("firstName"), "lastName": person.get("lastName")})
+    return rows
+
+
+async def is3(plan, params):
+    person = params["personVid"]
+    friendships = (await plan.edges([person], "knows", "both", ["creationDate"])).get(person, {})
+    props = await plan.props(friendships)
+    rows = [{"personVid": vid, "firstName": props.get(vid, {}).get("firstName"),
+             "lastName": props.get(vid, {}).get("lastName"), "friendshipCreationDate": edge.get("creationDate")}
+            for vid, edge in sorted(friendships.items())]
+    rows.sort(key=lambda row: _descending(row["friendshipCreationDate"]), reverse=True)
+    return rows
+
+
+async def is4(plan, params):
+    message = params["messageVid"]
+    props = (await plan.props([message])).get(message)
+    return [{"creationDate": props.get("creationDate"), "content": _content(props)}] if props else []
+
+
+async def is5(plan, params):
+    creators = await plan.creators([params["messageVid"]])
+    props = await plan.props(set(creators.values()))
+    return [{"personVid": vid, "firstName": props.get(vid, {}).get("firstName"),
+             "lastName": props.get(vid, {}).get("lastName")} for vid in creators.values()]
+
+
+async def is6(plan, params):
+    roots = await plan.root_posts([params["messageVid"]])
+    forums = await plan.hop(set(roots.values()), "containerOf", "in")
+    forum = min(set().union(*forums.values()), default=None)
+    if forum is None:
+        return []
+    moderators = await plan.hop([forum], "hasModerator", "out")
+    moderator = min(moderators.get(forum, ()), default=None)
+    props = await plan.props({forum, moderator} - {None})
+    mod = props.get(moderator, {})
+    return [{"forumVid": forum, "forumTitle": props.get(forum, {}).get("title"), "moderatorVid": moderator,
+             "moderatorFirstName": mod.get("firstName"), "moderatorLastName": mod.get("lastName")}]
+
+
+async def is7(plan, params):
+    message = params["messageVid"]
+    replies = (await plan.hop([message], "replyOf", "in")).get(message, set())
+    replies = {vid for vid in replies if plan.label(vid) == "Comment"}
+    authors, original = await asyncio.gather(plan.creators(replies), plan.creators([message]))
+    author = original.get(message)
+    friends, props = await asyncio.gather(
+        plan.hop([author] if author is not None else [], "knows", "both"),
+        plan.props(replies | set(authors.values())),
+    )
+    friends = friends.get(author, set())
+    rows = []
+    for vid in replies:
+        reply, person = props.get(vid, {}), props.get(authors.get(vid), {})
+        rows.append({"commentVid": vid, "content": reply.get("content"), "creationDate": reply.get("creationDate"),
+                     "authorVid": authors.get(vid), "firstName": person.get("firstName"),
+                     "lastName": person.get("lastName"), "knows": authors.get(vid) in friends})
+    rows.sort(key=lambda row: (row["authorVid"] is None, row["authorVid"]))
+    rows.sort(key=lambda row: _descending(row["creationDate"]), reverse=True)
+    return rows
+
+
+async def ic2(plan, params):
+    person = params["personVid"]
+    friends = (await plan.hop([person], "knows", "both")).get(person, set())
+    created = await plan.hop(friends, "hasCreator", "in")
+    creators = {message: friend for friend, messages in created.items() for message in messages}
+    latest = await plan.latest_messages(creators, 20, params["maxDate"])
+    props = await plan.props(set(latest) | {creators[vid] for vid in latest})
+    return plan.message_rows(latest, creators, props)
+
+
+async def ic8(plan, params):
+    person = params["personVid"]
+    messages = (await plan.hop([person], "hasCreator", "in")).get(person, set())
+    replies = await plan.hop(messages, "replyOf", "in")
+    comments = {vid for found in replies.values() for vid in found if plan.label(vid) == "Comment"}
+    latest = await plan.latest_messages(comments, 20)
+    creators = await plan.creators(latest)
+    props = await plan.props(set(latest) | set(creators.values()))
+    rows = plan.message_rows(latest, creators, props)
+    for row in rows:
+        row["commentVid"] = row.pop("messageVid")
+    return rows
+
+
+async def ic9(plan, params):
+    person = params["personVid"]
+    friends = (await plan.hop([person], "knows", "both")).get(person, set())
+    second = await plan.hop(friends, "knows", "both")
+    friends = (friends | set().union(*second.values())) - {person}
+    created = await plan.hop(friends, "hasCreator", "in")
+    creators = {message: friend for friend, messages in created.items() for message in messages}
+    latest = await plan.latest_messages(creators, 20, params["maxDate"], inclusive=False)
+    props = await plan.props(set(latest) | {creators[vid] for vid in latest})
+    return plan.message_rows(latest, creators, props)
+
+
+# breadth-first over knows, one scatter-gather round per hop
+async def ic13(plan, params):
+    start, goal = params["person1Vid"], params["person2Vid"]
+    if start == goal:
+        return [{"shortestPathLength": 0}]
+    visited = {start}
+    frontier = {start}
+    for depth in range(1, MAX_PATH_HOPS + 1):
+        neighbours = await plan.hop(frontier, "knows", "both")
+        frontier = set().union(*neighbours.values()) - visited
+        if goal in frontier:
+            return [{"shortestPathLength": depth}]
+        if not frontier:
+            break
+        visited |= frontier
+    return [{"shortestPathLength": -1}]
+
+
+PLANS = {"IS1": is1, "IS2": is2, "IS3": is3, "IS4": is4, "IS5": is5, "IS6": is6, "IS7": is7,
+         "IC2": ic2, "IC8": ic8, "IC9": ic9, "IC13": ic13}
+
+
+class SingleInstance:
+    name = "single"
+
+    def __init__(self, uri=load_rels.URI, auth=load_rels.AUTH, database="neo4j"):
+        self.database = database
+        self.driver = AsyncGraphDatabase.driver(uri, auth=auth)
+
+    # (rows, statements sent)
+    async def execute(self, query, params):
+        cypher = CYPHER[query].format(label=params.get("messageLabel", ""), max_hops=MAX_PATH_HOPS)
+        async with self.driver.session(database=self.database) as session:
+            result = await session.run(cypher, params)
+            return await result.data(), 1
+
+    async def close(self):
+        await self.driver.close()
+
+
+class Partitioned:
+    name = "partitioned"
+
+    def __init__(self, partition_dir=query_router.PARTITION_DIR):
+        self.router = QueryRouter(partition_dir=partition_dir)
+
+    async def execute(self, query, params):
+        plan = RoutedPlan(self.router)
+        rows = await PLANS[query](plan, params)
+        return rows, plan.requests
+
+    async def close(self):
+        await self.router.close()
+
+
+def load_person_and_message_maps(vid_map_dir):
+    maps = {}
+    for label in ("Person",) + MESSAGE_LABELS:
+        maps[label] = open_vid_map(os.path.join(vid_map_dir, f"{label.lower()}_vid_map.csv"))
+    return maps
+
+
+# substitution parameters as original ids, drawn from the ids every target has a vid for
+def pick_parameters(maps_by_target, count, seed, max_date=MAX_DATE):
+    rng = random.Random(seed)
+
+    def common(label):
+        ids = None
+        for maps in maps_by_target.values():
+            ids = np.asarray(maps[label].ids) if ids is None else np.intersect1d(ids, maps[label].ids)
+        return ids.tolist() if ids is not None else []
+
+    persons = common("Person")
+    messages = [(label, original_id) for label in MESSAGE_LABELS for original_id in common(label)]
+    params = {}
+    for query in QUERIES:
+        if query == "IC13":
+            pool = [{"person1Id": a, "person2Id": b} for a, b in
+                    (rng.sample(persons, 2) for _ in range(count))] if len(persons) > 1 else []
+        elif query in ("IS4", "IS5", "IS6", "IS7"):
+            pool = [{"messageLabel": label, "messageId": original_id}
+                    for label, original_id in rng.sample(messages, min(count, len(messages)))]
+        else:
+            pool = [{"personId": original_id} for original_id in rng.sample(persons, min(count, len(persons)))]
+        for entry in pool:
+            entry["maxDate"] = max_date
+        params[query] = pool
+    return params
+
+
+# original ids -> one target's vids, personId -> personVid and so on; maxDate becomes a
+# datetime, the type the loaders give creationDate
+def bind(params, maps):
+    bound = {}
+    for key, value in params.items():
+        if key == "maxDate":
+            bound[key] = parse_datetime(value)
+        elif key == "messageId":
+            bound["messageVid"] = maps[params["messageLabel"]][value]
+        elif key.endswith("Id"):
+            bound[key[:-2] + "Vid"] = maps["Person"][value]
+        else:
+            bound[key] = value
+    return bound
+
+
+def summarize(target, query, latencies, requests, errors, wall, error=None):
+    ms = np.asarray(latencies) * 1000
+    result = {
+        "target": target,
+        "query": query,
+        "runs": len(latencies),
+        "errors": errors,
+        "wall_seconds": round(wall, 4),
+        "throughput_qps": round(len(latencies) / wall, 1) if wall > 0 else None,
+    }
+    for name, q in (("p50_ms", 50), ("p95_ms", 95), ("p99_ms", 99)):
+        result[name] = round(float(np.percentile(ms, q)), 3) if len(ms) else None
+    result["mean_ms"] = round(float(ms.mean()), 3) if len(ms) else None
+    result["shard_requests_mean"] = round(float(np.mean(requests)), 2) if requests else None
+    if error:
+        result["first_error"] = error
+    return result
+
+
+# runs one query `runs` times with `concurrency` in flight, cycling through its parameters
+# warmup failures count as errors too, so one bad query never aborts the run
+async def measure(target, query, bindings, runs, concurrency, warmup=0):
+    latencies, requests = [], []
+    errors = 0
+    first_error = None
+
+    async def attempt(i):
+        nonlocal errors, first_error
+        try:
+            return await target.execute(query, bindings[i % len(bindings)])
+        except Exception as exc:
+            errors += 1
+            first_error = first_error or f"{type(exc).__name__}: {exc}"
+            return None
+
+    for i in range(min(warmup, runs)):
+        await attempt(i)
+
+    work = iter(range(runs))
+
+    async def worker():
+        for i in work:
+            started = time.perf_counter()
+            result = await attempt(i)
+            if result is None:
+                continue
+            latencies.append(time.perf_counter() - started)
+            requests.append(result[1])
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(concurrency, 1))))
+    return summarize(target.name, query, latencies, requests, errors, time.perf_counter() - started, first_error)
+
+
+# drivers are opened inside the event loop that uses them
+async def run_targets(maps_by_target, partition_dir, params, queries, runs, concurrency, warmup):
+    results = []
+    for name in maps_by_target:
+        target = SingleInstance() if name == "single" else Partitioned(partition_dir)
+        try:
+            for query in queries:
+                if not params[query]:
+                    print(f"{target.name} {query}: no substitution parameters")
+                    continue
+                bindings = [bind(p, maps_by_target[target.name]) for p in params[query]]
+                with metrics.stage("query", f"{target.name}/{query}") as stage:
+                    result = await measure(target, query, bindings, runs, concurrency, warmup)
+                    stage["rows"] = result["runs"]
+                results.append(result)
+        finally:
+            await target.close()
+    return results
+
+
+def _cell(result):
+    if result is None or result["p50_ms"] is None:
+        return f"{'-':>8} {'-':>8} {'-':>8} {'-':>8}"
+    return (f"{result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+            f"{result['throughput_qps'] or 0:>8.0f}")
+
+
+def print_report(results, queries):
+    by_key = {(r["target"], r["query"]): r for r in results}
+    header = f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'qps':>8}"
+    print(f"{'':<6} {'single instance':^35} | {'partitioned':^35}")
+    print(f"{'query':<6} {header} | {header} {'requests':>9} {'errors':>7}")
+    for query in queries:
+        single, part = by_key.get(("single", query)), by_key.get(("partitioned", query))
+        requests = f"{part['shard_requests_mean']:>9.1f}" if part and part["shard_requests_mean"] is not None \
+            else f"{'-':>9}"
+        errors = sum(r["errors"] for r in (single, part) if r)
+        print(f"{query:<6} {_cell(single)} | {_cell(part)} {requests} {errors:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run LDBC Interactive reads on the single and partitioned loads.")
+    parser.add_argument("--workdir", default=".", help="directory the loaders ran in")
+    parser.add_argument("--targets", nargs="+", choices=TARGETS, default=TARGETS)
+    parser.add_argument("--queries", nargs="+", choices=QUERIES, default=QUERIES)
+    parser.add_argument("--runs", type=int, default=100, help="executions per query and target")
+    parser.add_argument("--concurrency", type=int, default=8, help="queries in flight")
+    parser.add_argument("--warmup", type=int, default=10, help="untimed executions per query first")
+    parser.add_argument("--params", type=int, default=50, help="distinct substitution parameters per query")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--max-date", default=MAX_DATE, help="maxDate of IC2 and IC9")
+    parser.add_argument("--single-maps", default=load_rels.VID_MAP_DIR, help="VID maps of the single-instance load")
+    parser.add_argument("--partition-dir", default=query_router.PARTITION_DIR,
+                        help="VID maps, vid_sid_log and cross-instance edges of the partitioned load")
+    parser.add_argument("--backend", choices=["neo4j", "fake"], default="neo4j")
+    parser.add_argument("--statement-latency", type=float, default=0.0, help="fake backend: seconds per statement")
+    parser.add_argument("--row-latency", type=float, default=0.0, help="fake backend: seconds per UNWIND row")
+    parser.add_argument("--output", default=RESULTS_FILE)
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    os.chdir(args.workdir)
+    if args.backend == "fake":
+        fake_neo4j.install(query_router, sys.modules[__name__],
+                           statement_latency=args.statement_latency, row_latency=args.row_latency)
+
+    map_dirs = {"single": args.single_maps, "partitioned": args.partition_dir}
+    maps_by_target = {}
+    for name in args.targets:
+        try:
+            maps_by_target[name] = load_person_and_message_maps(map_dirs[name])
+        except FileNotFoundError as exc:
+            print(f"skipping {name}: {exc}")
+    if not maps_by_target:
+        sys.exit("no target has its VID maps")
+    params = pick_parameters(maps_by_target, args.params, args.seed, args.max_date)
+
+    metrics.start("query_benchmark")
+    results = asyncio.run(run_targets(maps_by_target, args.partition_dir, params, args.queries,
+                                      args.runs, args.concurrency, args.warmup))
+    print_report(results, args.queries)
+
+    report = {
+        "backend": args.backend,
+        "statement_latency": args.statement_latency,
+        "row_latency": args.row_latency,
+        "runs": args.runs,
+        "concurrency": args.concurrency,
+        "warmup": args.warmup,
+        "seed": args.seed,
+        "max_date": args.max_date,
+        "python": platform.python_version(),
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "targets": list(maps_by_target),
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}")
+    metrics.finish()
+
+
+if __name__ == "__main__":
+    main()
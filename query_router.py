@@ -0,0 +1,268 @@
+import os
+import time
+import random
+import asyncio
+import argparse
+import numpy as np
+from neo4j import AsyncGraphDatabase
+from generate_maps import NODE_FILES
+from vid_store import open_vid_map, open_sid_map, NO_SID
+from cross_edge_store import CrossEdgeStore, KEY_COLUMNS
+from cluster_config import load_config
+
+# Scatter-gather reads over the METIS shards. vid_sid_log says which shard owns a vertex,
+# so point reads go to exactly one shard; traversals send one query per (shard, label)
+# of the current frontier, run them concurrently and follow cross-shard edges through the
+# indexed cross_edges.sqlite store written by partioned_relationship_loader.
+
+PARTITION_DIR = "partitioned_vids"
+
+CLUSTER = load_config()
+DB_URIS = CLUSTER.uris
+AUTH = CLUSTER.auth
+CROSS_EDGE_FILE = "cross_edges.sqlite"
+
+
+# vid -> label, so traversal queries can MATCH (a:Label {vid: v}) through the vid index
+class LabelMap:
+    def __init__(self, partition_dir=PARTITION_DIR, node_files=NODE_FILES):
+        self.labels = []
+        maps = []
+        for _, (label, _) in node_files.items():
+            path = os.path.join(partition_dir, f"{label.lower()}_vid_map.csv")
+            try:
+                maps.append(open_vid_map(path))
+            except FileNotFoundError:
+                continue
+            self.labels.append(label)
+        size = max((int(m.vids.max()) + 1 for m in maps if len(m)), default=0)
+        self.index = np.full(size, -1, dtype=np.int16)
+        for i, vid_map in enumerate(maps):
+            self.index[np.asarray(vid_map.vids)] = i
+
+    def lookup(self, vids):
+        vids = np.asarray(vids, dtype=np.int64)
+        inside = (vids >= 0) & (vids < len(self.index))
+        out = np.full(vids.shape, -1, dtype=np.int16)
+        out[inside] = self.index[vids[inside]]
+        return out
+
+    def get(self, vid):
+        i = int(self.lookup([vid])[0])
+        return self.labels[i] if i >= 0 else None
+
+
+def _pattern(rel_type, direction, var=""):
+    rel = f"[{var}:{rel_type}]" if rel_type else f"[{var}]"
+    if direction == "out":
+        return f"-{rel}->"
+    if direction == "in":
+        return f"<-{rel}-"
+    return f"-{rel}-"
+
+
+class QueryRouter:
+    def __init__(self, uris=DB_URIS, auth=AUTH, database="neo4j", partition_dir=PARTITION_DIR):
+        self.database = database
+        self.vid_to_sid = open_sid_map(os.path.join(partition_dir, "vid_sid_log.csv"))
+        self.labels = LabelMap(partition_dir)
+        # no store when nothing was loaded across shards yet
+        store_path = os.path.join(partition_dir, CROSS_EDGE_FILE)
+        self.cross = CrossEdgeStore(store_path, readonly=True) if os.path.exists(store_path) else None
+        self.drivers = {sid: AsyncGraphDatabase.driver(uri, auth=auth) for sid, uri in uris.items()}
+        self.stats = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        await asyncio.gather(*(driver.close() for driver in self.drivers.values()))
+        if self.cross is not None:
+            self.cross.close()
+            self.cross = None
+
+    def shard_of(self, vid):
+        return self.vid_to_sid.get(vid)
+
+    async def _run(self, sid, query, **params):
+        async with self.drivers[sid].session(database=self.database) as session:
+            result = await session.run(query, params)
+            return await result.data()
+
+    def _record(self, kind, started, shards, requests, cross_hops):
+        stats = {
+            "query": kind,
+            "fan_out": len(shards),
+            "shard_requests": requests,
+            "cross_shard_hops": cross_hops,
+            "seconds": round(time.perf_counter() - started, 6),
+        }
+        self.stats.append(stats)
+        return stats
+
+    async def get_vertex(self, vid):
+        started = time.perf_counter()
+        sid = self.shard_of(vid)
+        label = self.labels.get(vid)
+        if sid is None or sid not in self.drivers or label is None:
+            self._record("get_vertex", started, set(), 0, 0)
+            return None
+        rows = await self._run(sid, f"MATCH (n:{label} {{vid: $vid}}) RETURN properties(n) AS props", vid=vid)
+        self._record("get_vertex", started, {sid}, 1, 0)
+        return rows[0]["props"] if rows else None
+
+    # local neighbours only: Ghost and ProxyUniversal stubs are replaced by the cross edge index
+    async def _local_neighbors(self, sid, label, vids, rel_type, direction):
+        rows = await self._run(sid, f"""
+            UNWIND $vids AS v
+            MATCH (a:{label} {{vid: v}}){_pattern(rel_type, direction)}(b)
+            WHERE NOT b:Ghost AND NOT b:ProxyUniversal
+            RETURN v AS src, b.vid AS dst
+        """, vids=vids)
+        return [(row["src"], row["dst"]) for row in rows]
+
+    # same hop returning the edges' properties, or only keys of them
+    async def _local_edges(self, sid, label, vids, rel_type, direction, keys):
+        projection = "r {" + ", ".join(f".{key}" for key in keys) + "}" if keys else "properties(r)"
+        rows = await self._run(sid, f"""
+            UNWIND $vids AS v
+            MATCH (a:{label} {{vid: v}}){_pattern(rel_type, direction, "r")}(b)
+            WHERE NOT b:Ghost AND NOT b:ProxyUniversal
+            RETURN v AS src, b.vid AS dst, {projection} AS props
+        """, vids=vids)
+        return [(row["src"], row["dst"], row["props"]) for row in rows]
+
+    # (sid, label, vids) for every shard and label among vids; unassigned or unlabelled vids are left out
+    def _groups(self, vids):
+        sids = self.vid_to_sid.lookup(vids)
+        labels = self.labels.lookup(vids)
+        groups = []
+        for sid in np.unique(sids[sids != NO_SID]).tolist():
+            if sid not in self.drivers:
+                continue
+            for li in np.unique(labels[(sids == sid) & (labels >= 0)]).tolist():
+                groups.append((sid, self.labels.labels[li], vids[(sids == sid) & (labels == li)].tolist()))
+        return groups
+
+    # batched point reads: {vid: properties} plus (shards, requests); keys limits the
+    # properties returned, e.g. ["creationDate"] to order messages without their content
+    async def properties(self, vids, keys=None):
+        vids = np.unique(np.asarray(list(vids), dtype=np.int64))
+        groups = self._groups(vids)
+        projection = "n {" + ", ".join(f".{key}" for key in keys) + "}" if keys else "properties(n)"
+        results = await asyncio.gather(*(
+            self._run(sid, f"UNWIND $vids AS v MATCH (n:{label} {{vid: v}}) RETURN v AS vid, {projection} AS props",
+                      vids=group)
+            for sid, label, group in groups
+        ))
+        props = {row["vid"]: row["props"] for rows in results for row in rows}
+        return props, {sid for sid, _, _ in groups}, len(groups)
+
+    # one hop for a whole frontier: {vid: set(neighbour vids)} plus (shards, requests, cross hops)
+    async def expand(self, vids, rel_type=None, direction="both"):
+        vids = np.unique(np.asarray(list(vids), dtype=np.int64))
+        calls = [(sid, self._local_neighbors(sid, label, group, rel_type, direction))
+                 for sid, label, group in self._groups(vids)]
+
+        results = await asyncio.gather(*(call for _, call in calls))
+        neighbours = {vid: set() for vid in vids.tolist()}
+        for pairs in results:
+            for src, dst in pairs:
+                neighbours[src].add(dst)
+
+        if self.cross is not None:
+            src, dst = self.cross.neighbors(vids, rel_type, direction)
+        else:
+            src = dst = np.empty(0, dtype=np.int64)
+        for a, b in zip(src.tolist(), dst.tolist()):
+            neighbours[a].add(b)
+        return neighbours, {sid for sid, _ in calls}, len(calls), len(src)
+
+    # expand with edge properties: {vid: {neighbour vid: properties}} plus (shards, requests,
+    # cross hops); cross-shard edges take theirs from the cross edge store
+    async def expand_edges(self, vids, rel_type=None, direction="both", keys=None):
+        vids = np.unique(np.asarray(list(vids), dtype=np.int64))
+        calls = [(sid, self._local_edges(sid, label, group, rel_type, direction, keys))
+                 for sid, label, group in self._groups(vids)]
+
+        results = await asyncio.gather(*(call for _, call in calls))
+        edges = {vid: {} for vid in vids.tolist()}
+        for rows in results:
+            for src, dst, props in rows:
+                edges[src][dst] = props
+
+        cross_hops = 0
+        if self.cross is not None:
+            for side, near, far in (("out", "from_vid", "to_vid"), ("in", "to_vid", "from_vid")):
+                if direction not in (side, "both"):
+                    continue
+                for edge in self.cross.edges(vids, rel_type, side):
+                    if keys:
+                        props = {key: edge.get(key) for key in keys}
+                    else:
+                        props = {k: v for k, v in edge.items() if k not in KEY_COLUMNS and v is not None}
+                    edges[edge[near]][edge[far]] = props
+                    cross_hops += 1
+        return edges, {sid for sid, _ in calls}, len(calls), cross_hops
+
+    async def neighbors(self, vid, rel_type=None, direction="both"):
+        started = time.perf_counter()
+        neighbours, shards, requests, cross_hops = await self.expand([vid], rel_type, direction)
+        self._record("neighbors", started, shards, requests, cross_hops)
+        return neighbours[vid]
+
+    # breadth-first k-hop: each hop scatters the frontier to its shards and merges the answers
+    async def k_hop(self, vid, hops=2, rel_type=None, direction="both"):
+        started = time.perf_counter()
+        visited = {vid}
+        frontier = {vid}
+        shards, requests, cross_hops = set(), 0, 0
+        for _ in range(hops):
+            if not frontier:
+                break
+            neighbours, hop_shards, hop_requests, hop_cross = await self.expand(frontier, rel_type, direction)
+            shards |= hop_shards
+            requests += hop_requests
+            cross_hops += hop_cross
+            frontier = set().union(*neighbours.values()) - visited
+            visited |= frontier
+        self._record(f"k_hop({hops})", started, shards, requests, cross_hops)
+        visited.discard(vid)
+        return visited
+
+    def print_stats(self):
+        print(f"{'query':<12} {'fan-out':>8} {'requests':>9} {'cross hops':>11} {'ms':>9}")
+        for stats in self.stats:
+            print(f"{stats['query']:<12} {stats['fan_out']:>8} {stats['shard_requests']:>9} "
+                  f"{stats['cross_shard_hops']:>11} {stats['seconds'] * 1000:>9.2f}")
+
+
+async def run_sample(samples, hops, rel_type, seed):
+    async with QueryRouter() as router:
+        print(f"vid_sid_log covers {len(router.vid_to_sid)} vids, "
+              f"{len(router.cross) if router.cross is not None else 0} cross-shard edges indexed")
+        assigned = np.flatnonzero(np.asarray(router.vid_to_sid.sids) != NO_SID)
+        if len(assigned) == 0:
+            print("no vertices with a shard assignment")
+            return
+        rng = random.Random(seed)
+        for _ in range(samples):
+            vid = int(assigned[rng.randrange(len(assigned))])
+            await router.get_vertex(vid)
+            reached = await router.k_hop(vid, hops, rel_type)
+            print(f"vid {vid} (sid {router.shard_of(vid)}, {router.labels.get(vid)}): "
+                  f"{len(reached)} vertices within {hops} hops")
+        router.print_stats()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run sample routed queries against the shards.")
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--hops", type=int, default=2)
+    parser.add_argument("--rel-type", default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    asyncio.run(run_sample(args.samples, args.hops, args.rel_type, args.seed))
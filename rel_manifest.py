@@ -0,0 +1,289 @@
+import os
+import glob
+import json
+import time
+import asyncio
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from ldbc_schema import RELATIONSHIP_SCHEMA, file_stem
+from vid_store import open_vid_map, open_sid_map
+from shard_pool import ShardPool
+from async_pipeline import AsyncWriter
+from cross_edge_store import CrossEdgeStore
+from db_schema import require_empty_shards
+from instrumentation import metrics
+import load_rels
+import partioned_relationship_loader as partitioned_loader
+
+# Loads every LDBC relationship file in one run. The manifest lists each relationship
+# file stem with its labels, type and the part files found under import/social_network;
+# it can be written out, edited and passed back with --manifest. VID maps and the
+# vid_sid_log are opened once and shared. Files are run in waves: files in one wave
+# share no label and no relationship type, so their edges never lock the same nodes and
+# their cross-instance edges never collide, and they are pushed concurrently through one pool.
+# By default each file of a wave is a producer of one async_pipeline writer, so files are
+# parsed while earlier chunks commit; per-type seconds then cover the parsing and queueing.
+
+SOCIAL_NETWORK_DIR = "import/social_network"
+MANIFEST_FILE = os.path.join("graph_outputs", "relationship_manifest.json")
+REPORT_FILE = os.path.join("graph_outputs", "relationship_load_report.json")
+PARALLEL_TYPES = 2
+
+
+def build_manifest(social_network_dir=SOCIAL_NETWORK_DIR, stems=None):
+    entries = []
+    for stem, (from_label, rel_type, to_label, _) in RELATIONSHIP_SCHEMA.items():
+        if stems and stem not in stems:
+            continue
+        files = sorted(
+            path for path in glob.glob(os.path.join(social_network_dir, "*", f"{stem}_*.csv"))
+            if file_stem(path) == stem
+        )
+        entries.append({
+            "stem": stem,
+            "from_label": from_label,
+            "rel_type": rel_type,
+            "to_label": to_label,
+            "files": files,
+        })
+    return entries
+
+
+def write_manifest(entries, path=MANIFEST_FILE):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(entries, f, indent=2)
+    return path
+
+
+def read_manifest(path=MANIFEST_FILE):
+    with open(path) as f:
+        return json.load(f)
+
+
+# greedy packing, biggest files first so the long ones start early
+def plan_waves(entries, width=PARALLEL_TYPES):
+    def size(entry):
+        return sum(os.path.getsize(path) for path in entry["files"] if os.path.exists(path))
+
+    waves = []
+    for entry in sorted(entries, key=size, reverse=True):
+        keys = {entry["from_label"], entry["to_label"], entry["rel_type"]}
+        for wave in waves:
+            if len(wave[0]) < width and not keys & wave[1]:
+                wave[0].append(entry)
+                wave[1].update(keys)
+                break
+        else:
+            waves.append(([entry], set(keys)))
+    return [entries for entries, _ in waves]
+
+
+# vid maps and vid_sid_log opened on first use and shared by every file of the run
+class MapCache:
+    def __init__(self, vid_map_dir, sid_log=None):
+        self.vid_map_dir = vid_map_dir
+        self.sid_log = sid_log
+        self.lock = threading.Lock()
+        self.maps = {}
+        self._sid_map = None
+
+    def vid_map(self, label):
+        with self.lock:
+            if label not in self.maps:
+                self.maps[label] = open_vid_map(os.path.join(self.vid_map_dir, f"{label.lower()}_vid_map.csv"))
+            return self.maps[label]
+
+    def sid_map(self):
+        with self.lock:
+            if self._sid_map is None:
+                self._sid_map = open_sid_map(self.sid_log)
+            return self._sid_map
+
+
+class ManifestLoader:
+    def __init__(self, partitioned=True, mode=partitioned_loader.CROSS_SHARD_MODE, fresh=False,
+                 width=PARALLEL_TYPES, vid_map_dir=None, pipeline=True):
+        self.partitioned = partitioned
+        self.mode = mode
+        self.fresh = fresh
+        self.width = width
+        self.pipeline = pipeline
+        if partitioned:
+            self.maps = MapCache(vid_map_dir or partitioned_loader.PARTITION_DIR,
+                                 os.path.join(partitioned_loader.PARTITION_DIR, "vid_sid_log.csv"))
+        else:
+            self.maps = MapCache(vid_map_dir or load_rels.VID_MAP_DIR)
+
+    def _uris(self):
+        return partitioned_loader.DB_URIS if self.partitioned else {0: load_rels.URI}
+
+    # (uris, auth, workers per shard)
+    def _target(self):
+        if self.partitioned:
+            return self._uris(), partitioned_loader.AUTH, partitioned_loader.WORKERS_PER_SHARD
+        return self._uris(), load_rels.AUTH, load_rels.WORKERS
+
+    def _open_pool(self):
+        return ShardPool(*self._target())
+
+    # pool for ShardPool pushes, emit for async_pipeline ones
+    def load_entry(self, entry, pool=None, emit=None):
+        result = {
+            "stem": entry["stem"], "rel_type": entry["rel_type"], "files": len(entry["files"]),
+            "relationships": 0, "cross_instance": 0, "missing": 0, "seconds": 0.0, "status": "ok",
+        }
+        if not entry["files"]:
+            result["status"] = "no file"
+            return result
+        try:
+            from_vids = self.maps.vid_map(entry["from_label"])
+            to_vids = self.maps.vid_map(entry["to_label"])
+        except FileNotFoundError as exc:
+            result["status"] = f"no vid map ({os.path.basename(exc.filename or str(exc))})"
+            return result
+
+        with metrics.stage("load_relationships", entry["stem"]) as stage:
+            started = time.perf_counter()
+            from_label, to_label, rel_type = entry["from_label"], entry["to_label"], entry["rel_type"]
+            # emptiness for --fresh was checked once per type in run()
+            if self.partitioned:
+                partitioned_loader.prepare_shards(from_label, to_label, rel_type,
+                                                  ghosts=emit is not None and self.mode == "ghost")
+                batchers = None
+                for path in entry["files"]:
+                    if emit is None:
+                        same, cross, missing = partitioned_loader.push_file(
+                            path, from_label, to_label, rel_type, from_vids, to_vids, self.maps.sid_map(),
+                            self.mode, self.fresh, pool=pool, append_cross=True,
+                        )
+                    else:
+                        same, cross, missing, batchers = partitioned_loader.emit_file(
+                            emit, path, from_label, to_label, rel_type, from_vids, to_vids, self.maps.sid_map(),
+                            self.mode, self.fresh, append_cross=True, batchers=batchers,
+                        )
+                    result["relationships"] += same + cross
+                    result["cross_instance"] += cross
+                    result["missing"] += missing
+            else:
+                load_rels.prepare_instance(from_label, to_label, rel_type)
+                batcher = None
+                for path in entry["files"]:
+                    if emit is not None:
+                        count, missing, batcher = load_rels.emit_file(emit, path, from_label, to_label, rel_type,
+                                                                      from_vids, to_vids, self.fresh, batcher)
+                        result["relationships"] += count
+                        result["missing"] += missing
+                        continue
+                    for rels, missing in load_rels.iter_relationship_chunks(path, from_vids, to_vids):
+                        batcher = load_rels.push_relationships_to_neo4j(rels, from_label, to_label, rel_type, self.fresh,
+                                                                        pool=pool, prepare=False, batcher=batcher)
+                        result["relationships"] += len(rels)
+                        result["missing"] += missing
+            result["seconds"] = round(time.perf_counter() - started, 3)
+            stage["rows"] = result["relationships"]
+        return result
+
+    def run(self, entries):
+        rel_types = sorted({entry["rel_type"] for entry in entries if entry["files"]})
+        if self.partitioned:
+            # cross-instance edges are appended per file, so start every loaded label pair from scratch
+            with CrossEdgeStore(partitioned_loader.CROSS_EDGE_STORE) as store:
+                store.clear({(entry["rel_type"], entry["from_label"], entry["to_label"])
+                             for entry in entries if entry["files"]})
+
+        waves = plan_waves([entry for entry in entries if entry["files"]], self.width)
+        results = [self.load_entry(entry) for entry in entries if not entry["files"]]
+        started = time.perf_counter()
+        with self._open_pool() as pool:
+            # several files can share a type (isLocatedIn, hasTag, ...), so --fresh is
+            # checked for all of them before anything is written
+            if self.fresh:
+                for rel_type in rel_types:
+                    require_empty_shards(pool, self._uris(), rel_type)
+            if self.pipeline:
+                results.extend(asyncio.run(self._run_pipelined(waves)))
+            else:
+                for i, wave in enumerate(waves):
+                    print(f"wave {i + 1}/{len(waves)}: {', '.join(entry['stem'] for entry in wave)}")
+                    with ThreadPoolExecutor(max_workers=len(wave), thread_name_prefix="reltype") as executor:
+                        results.extend(executor.map(lambda entry: self.load_entry(entry, pool), wave))
+                pool.print_summary()
+        order = {entry["stem"]: i for i, entry in enumerate(entries)}
+        results.sort(key=lambda result: order[result["stem"]])
+        return {
+            "partitioned": self.partitioned,
+            "waves": [[entry["stem"] for entry in wave] for wave in waves],
+            "seconds": round(time.perf_counter() - started, 3),
+            "relationships": sum(result["relationships"] for result in results),
+            "missing": sum(result["missing"] for result in results),
+            "per_type": results,
+        }
+
+
+    # one writer for the whole run; every file of a wave is one of its producers
+    async def _run_pipelined(self, waves):
+        results = []
+        async with AsyncWriter(*self._target()) as writer:
+            for i, wave in enumerate(waves):
+                print(f"wave {i + 1}/{len(waves)}: {', '.join(entry['stem'] for entry in wave)}")
+                results.extend(await writer.run(*(
+                    lambda emit, entry=entry: self.load_entry(entry, emit=emit) for entry in wave
+                )))
+            writer.print_summary()
+        return results
+
+
+def print_report(report):
+    print(f"{'relationship file':<34} {'type':<14} {'files':>5} {'loaded':>10} {'cross':>9} "
+          f"{'missing':>8} {'seconds':>8}  status")
+    for row in report["per_type"]:
+        print(f"{row['stem']:<34} {row['rel_type']:<14} {row['files']:>5} {row['relationships']:>10} "
+              f"{row['cross_instance']:>9} {row['missing']:>8} {row['seconds']:>8.1f}  {row['status']}")
+    print(f"{report['relationships']} relationships loaded, {report['missing']} rows with a missing VID, "
+          f"{len(report['waves'])} waves in {report['seconds']:.1f}s")
+
+
+def main(partitioned=None):
+    parser = argparse.ArgumentParser(description="Load every LDBC relationship file listed in the manifest.")
+    if partitioned is None:
+        parser.add_argument("--single", action="store_true",
+                            help="one instance at load_rels.URI instead of the partitioned shards")
+    parser.add_argument("--manifest", help="read this manifest instead of scanning import/social_network")
+    parser.add_argument("--write-manifest", action="store_true", help=f"write the manifest to {MANIFEST_FILE} and stop")
+    parser.add_argument("--only", nargs="+", metavar="STEM", help="relationship file stems to load, e.g. person_knows_person")
+    parser.add_argument("--parallel", type=int, default=PARALLEL_TYPES, help="relationship files pushed at once")
+    parser.add_argument("--mode", choices=["ghost", "universal"], default=partitioned_loader.CROSS_SHARD_MODE)
+    parser.add_argument("--fresh", action="store_true", help="CREATE instead of MERGE; every type must be absent")
+    parser.add_argument("--report", default=REPORT_FILE)
+    parser.add_argument("--no-pipeline", action="store_true",
+                        help="push each chunk through a ShardPool before reading the next")
+    args = parser.parse_args()
+    if partitioned is None:
+        partitioned = not args.single
+
+    if args.manifest:
+        entries = read_manifest(args.manifest)
+        if args.only:
+            entries = [entry for entry in entries if entry["stem"] in args.only]
+    else:
+        entries = build_manifest(stems=args.only)
+    if args.write_manifest:
+        print(f"Wrote {write_manifest(entries)} ({sum(1 for e in entries if e['files'])} of {len(entries)} files found)")
+        return
+
+    metrics.start("partioned_relationship_loader" if partitioned else "load_rels")
+    loader = ManifestLoader(partitioned, args.mode, args.fresh, max(args.parallel, 1),
+                            pipeline=not args.no_pipeline)
+    report = loader.run(entries)
+    print_report(report)
+    os.makedirs(os.path.dirname(os.path.abspath(args.report)), exist_ok=True)
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.report}")
+    metrics.finish()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+from collections import deque
+
+# Lock-aware scheduling for parallel relationship writes. Creating an edge locks both
+# endpoints, so batches that run at the same time must not share a node. Edges are grouped
+# by source vertex into units; each round packs units into at most `workers` batches such
+# that every node belongs to one batch of the round. A hot target (the few Places every
+# Organisation is located in) pins its units to one batch per round, so its edges spread
+# over consecutive rounds instead of deadlocking against each other. Rounds are separated
+# by a barrier.
+
+MAX_DEFERRED_SCAN = 4096  # units skipped in a round before a queue is given up on
+HOT_DEGREE = 200  # a target with at least this many edges is scheduled on its own
+
+
+# units are a source's edges to ordinary targets, and separately its edges to each hot
+# target, so a source linked to several hot targets does not pin them into one batch.
+# Returns one queue per hot target and None for the ordinary units.
+def _queues(edges, endpoints, hot_degree):
+    degree = {}
+    for edge in edges:
+        dst = endpoints(edge)[1]
+        degree[dst] = degree.get(dst, 0) + 1
+    units = {}
+    for edge in edges:
+        src, dst = endpoints(edge)
+        hot = dst if degree[dst] >= hot_degree else None
+        unit = units.get((hot, src))
+        if unit is None:
+            unit = units[(hot, src)] = ([], {src})
+        unit[0].append(edge)
+        unit[1].add(dst)
+    queues = {}
+    for (hot, _), unit in units.items():
+        queues.setdefault(hot, deque()).append(unit)
+    hot_keys = sorted((k for k in queues if k is not None), key=lambda n: (-degree[n], str(n)))
+    return queues, hot_keys
+
+
+def _free_batch(batches, rows, size):
+    best = None
+    for i, batch in enumerate(batches):
+        if len(batch) + rows <= size and (best is None or len(batch) < len(batches[best])):
+            best = i
+    return best
+
+
+# moves units from the queue into the round while they fit without sharing a node with
+# another batch; at most max_batches batches exist afterwards. Skipped units keep their order.
+def _fill(queue, batches, owner, size, max_batches):
+    deferred = deque()
+    misses = 0
+    while queue and misses < MAX_DEFERRED_SCAN:
+        rows, nodes = queue.popleft()
+        if len(rows) > size:
+            # a source with more edges than a batch: its pieces share the source node,
+            # so they land in the same batch or in later rounds
+            queue.appendleft((rows[size:], nodes))
+            rows = rows[:size]
+
+        owners = {owner[n] for n in nodes if n in owner}
+        target = None
+        if len(owners) == 1:
+            b = owners.pop()
+            if len(batches[b]) + len(rows) <= size:
+                target = b
+        elif not owners:
+            target = _free_batch(batches, len(rows), size)
+            if target is None and len(batches) < max_batches:
+                batches.append([])
+                target = len(batches) - 1
+
+        if target is None:
+            deferred.append((rows, nodes))
+            misses += 1
+            continue
+        batches[target].extend(rows)
+        for n in nodes:
+            owner[n] = target
+        misses = 0
+        if len(batches) == max_batches and all(len(b) >= size for b in batches):
+            break
+    deferred.extend(queue)
+    return deferred
+
+
+# yields rounds; a round is a list of batches (lists of edges) with pairwise disjoint node sets.
+# Each hot target's edges get one batch per round (rotating when there are more hot targets
+# than workers) and ordinary units fill the remaining workers.
+# batch_size may be a callable so an adaptive batcher is consulted once per round.
+def plan_rounds(edges, endpoints, workers, batch_size, hot_degree=HOT_DEGREE):
+    queues, hot_keys = _queues(edges, endpoints, hot_degree)
+    remaining = len(edges)
+    start = 0
+    while any(queues.values()):
+        size = batch_size() if callable(batch_size) else batch_size
+        # a round never holds more than an even share of what is left, so no worker idles
+        size = min(size, -(-remaining // workers))
+        batches = []
+        owner = {}
+        hot_slots = workers - 1 if queues.get(None) else workers
+        for i in range(len(hot_keys)):
+            if len(batches) >= max(hot_slots, 1):
+                break
+            key = hot_keys[(start + i) % len(hot_keys)]
+            if queues[key]:
+                queues[key] = _fill(queues[key], batches, owner, size, len(batches) + 1)
+        if hot_keys:
+            start = (start + max(hot_slots, 1)) % len(hot_keys)
+        if queues.get(None):
+            queues[None] = _fill(queues[None], batches, owner, size, workers)
+        remaining -= sum(len(batch) for batch in batches)
+        yield [batch for batch in batches if batch]
+
+
+# runs every shard's rounds through the pool; round r of all shards goes out together and
+# round r + 1 starts only once all of them have committed
+def run_rounds(pool, edges_by_sid, endpoints, tx_fn, *args, batcher=None, batch_size=500):
+    size = (lambda: batcher.size) if batcher is not None else batch_size
+    planners = {
+        sid: plan_rounds(edges, endpoints, pool.workers[sid], size)
+        for sid, edges in edges_by_sid.items() if edges and sid in pool
+    }
+    stats = {"rounds": 0, "batches": 0, "largest_round": 0}
+    while planners:
+        futures = []
+        for sid in list(planners):
+            batches = next(planners[sid], None)
+            if batches is None:
+                del planners[sid]
+                continue
+            for batch in batches:
+                futures.append(pool.submit(sid, tx_fn, batch, *args, batcher=batcher))
+        pool.wait(futures)
+        submitted = len(futures)
+        if submitted:
+            stats["rounds"] += 1
+            stats["batches"] += submitted
+            stats["largest_round"] = max(stats["largest_round"], submitted)
+    return stats
+
+
+# async_pipeline counterpart of run_rounds: each round goes on its shard's queue as a
+# ("round", ...) item, whose barrier keeps rounds apart; shards are fed in turn
+def emit_rounds(emit, edges_by_sid, endpoints, tx_fn, *args, batcher=None, batch_size=500):
+    size = (lambda: batcher.size) if batcher is not None else batch_size
+    planners = {
+        sid: plan_rounds(edges, endpoints, emit.workers[sid], size)
+        for sid, edges in edges_by_sid.items() if edges and sid in emit
+    }
+    stats = {"rounds": 0, "batches": 0, "largest_round": 0}
+    while planners:
+        for sid in list(planners):
+            batches = next(planners[sid], None)
+            if batches is None:
+                del planners[sid]
+                continue
+            if not batches:
+                continue
+            emit(sid, ("round", tx_fn, batches, args, batcher))
+            stats["rounds"] += 1
+            stats["batches"] += len(batches)
+            stats["largest_round"] = max(stats["largest_round"], len(batches))
+    return stats
+
+
+def same_shard_endpoints(edge):
+    return edge[0], edge[1]
+
+
+# ghost edges are (from_vid, props); the ghost has the remote vertex's vid, which no local node uses
+def ghost_endpoints(edge):
+    return edge[0], edge[1]["target_vid"]
+
+
+# every proxy edge ends at the one ProxyUniversal node
+def proxy_endpoints(edge):
+    return edge[0], "proxy"
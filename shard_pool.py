@@ -0,0 +1,152 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from neo4j import GraphDatabase
+from instrumentation import metrics
+
+
+# One long-lived pooled driver and a fixed set of writer threads per shard.
+# Work is submitted as (sid, tx function, rows) and runs concurrently on every shard.
+# workers_per_shard is either one count for all shards or a {sid: count} dict.
+# With a batcher (adaptive_batch.AdaptiveBatcher) each commit's latency is fed back to it
+# and memory errors are retried in smaller pieces on the worker. Batches sent without a
+# batcher are recorded in instrumentation.metrics under the tx function's name.
+class ShardPool:
+    def __init__(self, uris, auth, workers_per_shard=4, database="neo4j", max_in_flight=None):
+        self.database = database
+        self.drivers = {}
+        self.executors = {}
+        self.slots = {}
+        self.stats = {}
+        self.workers = {}
+        self.lock = threading.Lock()
+        self.futures = []
+        self.started = time.perf_counter()
+
+        for sid, uri in uris.items():
+            workers = workers_per_shard[sid] if isinstance(workers_per_shard, dict) else workers_per_shard
+            in_flight = max_in_flight or workers * 2
+            self.workers[sid] = workers
+            self.drivers[sid] = GraphDatabase.driver(
+                uri, auth=auth, max_connection_pool_size=workers
+            )
+            self.executors[sid] = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix=f"shard{sid}"
+            )
+            # bounds queued batches so submitting never holds a whole label in memory
+            self.slots[sid] = threading.BoundedSemaphore(in_flight)
+            self.stats[sid] = {"uri": uri, "rows": 0, "batches": 0, "busy": 0.0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __contains__(self, sid):
+        return sid in self.drivers
+
+    def submit(self, sid, tx_fn, rows, *args, batcher=None):
+        self.slots[sid].acquire()
+        try:
+            future = self.executors[sid].submit(self._run, sid, tx_fn, rows, args, batcher)
+        except Exception:
+            self.slots[sid].release()
+            raise
+        return self._track(future)
+
+    # non-blocking submit: returns None when the shard has no free slot. take_rows is only
+    # called once a slot is held, so nothing is taken off a queue that cannot be sent yet.
+    def try_submit(self, sid, tx_fn, take_rows, *args, batcher=None):
+        if not self.slots[sid].acquire(blocking=False):
+            return None
+        try:
+            rows = take_rows()
+            future = self.executors[sid].submit(self._run, sid, tx_fn, rows, args, batcher)
+        except Exception:
+            self.slots[sid].release()
+            raise
+        return self._track(future)
+
+    def _track(self, future):
+        with self.lock:
+            self.futures.append(future)
+            reap = len(self.futures) > 1024
+        if reap:
+            self._reap()
+        return future
+
+    def _reap(self):
+        done, pending = [], []
+        with self.lock:
+            for future in self.futures:
+                (done if future.done() else pending).append(future)
+            self.futures = pending
+        for future in done:
+            future.result()
+
+    def _run(self, sid, tx_fn, rows, args, batcher):
+        try:
+            started = time.perf_counter()
+            with self.drivers[sid].session(database=self.database) as session:
+                if batcher is None:
+                    result = session.execute_write(tx_fn, rows, *args)
+                    metrics.batch(tx_fn.__name__, len(rows), time.perf_counter() - started, result, sid)
+                else:
+                    result = batcher.run(lambda batch: session.execute_write(tx_fn, batch, *args), rows, sid)
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                stats = self.stats[sid]
+                stats["rows"] += len(rows)
+                stats["batches"] += 1
+                stats["busy"] += elapsed
+            return result
+        finally:
+            self.slots[sid].release()
+
+    # runs tx_fn once on every shard and waits, e.g. for schema statements
+    def run_on_all(self, tx_fn, *args):
+        results = {}
+        for sid, driver in self.drivers.items():
+            with driver.session(database=self.database) as session:
+                results[sid] = session.execute_write(tx_fn, *args)
+        return results
+
+    # waits for everything submitted so far, or only for the given futures when several
+    # callers share the pool and each needs its own barrier
+    def wait(self, futures=None):
+        if futures is None:
+            with self.lock:
+                futures, self.futures = self.futures, []
+        for future in futures:
+            future.result()
+
+    def close(self):
+        try:
+            self.wait()
+        finally:
+            for executor in self.executors.values():
+                executor.shutdown(wait=True)
+            for driver in self.drivers.values():
+                driver.close()
+
+    def summary(self):
+        wall = time.perf_counter() - self.started
+        rows = []
+        for sid, stats in sorted(self.stats.items()):
+            rows.append({
+                "sid": sid,
+                "uri": stats["uri"],
+                "rows": stats["rows"],
+                "batches": stats["batches"],
+                "busy_seconds": round(stats["busy"], 3),
+                "wall_seconds": round(wall, 3),
+                "rows_per_sec": round(stats["rows"] / wall, 1) if wall > 0 else 0.0,
+            })
+        return rows
+
+    def print_summary(self):
+        print(f"{'sid':>4} {'uri':<28} {'rows':>10} {'batches':>8} {'busy s':>9} {'rows/s':>10}")
+        for row in self.summary():
+            print(f"{row['sid']:>4} {row['uri']:<28} {row['rows']:>10} {row['batches']:>8} "
+                  f"{row['busy_seconds']:>9.1f} {row['rows_per_sec']:>10.0f}")
@@ -1,56 +1,96 @@
 #3
-import csv
 import os
 import sys
+import numpy as np
+from vid_store import export_sid_log
+from columnar import read_int_columns
+from cluster_config import load_config
+from instrumentation import metrics
 
 INDEX_MAP = "graph_outputs/vid_index_map.csv"
-METIS_PARTITION = "graph_outputs/graph.txt.part.2"
+NUM_SHARDS = load_config().num_shards
+METIS_PARTITION = f"graph_outputs/graph.txt.part.{NUM_SHARDS}"
 OUTPUT_LOG = "partitioned_vids/vid_sid_log.csv"
+VERTEX_WEIGHTS = "graph_outputs/vertex_weights.csv"  # written by partition_maps --vertex-weights
 
-index_to_vid = {}
-
-# Load index → vid mapping
-try:
-    with open(INDEX_MAP, newline='') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            try:
-                index = int(row["index"])
-                vid = int(row["vid"])
-                index_to_vid[index] = vid
-            except (KeyError, ValueError):
-                print(f"Skipping malformed row in {INDEX_MAP}: {row}", file=sys.stderr)
-except FileNotFoundError:
-    print(f"Error: {INDEX_MAP} not found.", file=sys.stderr)
-    sys.exit(1)
-
-# Read METIS partition assignments
-try:
-    with open(METIS_PARTITION) as f:
-        sids = [int(line.strip()) for line in f if line.strip()]
-except FileNotFoundError:
-    print(f"Error: {METIS_PARTITION} not found.", file=sys.stderr)
-    sys.exit(1)
-
-# Check for index mismatch
-if len(sids) != len(index_to_vid):
-    print(f"Warning: Number of lines in METIS output ({len(sids)}) does not match index map ({len(index_to_vid)})", file=sys.stderr)
-
-# Write vid → sid mapping
-os.makedirs(os.path.dirname(OUTPUT_LOG), exist_ok=True)
-with open(OUTPUT_LOG, "w", newline="") as f:
-    writer = csv.writer(f)
-    writer.writerow(["vid", "sid"])
-
-    missing = 0
-    for i, sid in enumerate(sids):
-        vid = index_to_vid.get(i + 1)  # METIS is 1-based
-        if vid is not None:
-            writer.writerow([vid, sid])
-        else:
-            print(f"Missing vid for index {i+1}", file=sys.stderr)
-            missing += 1
-
-print(f"Wrote {OUTPUT_LOG}")
-if missing:
-    print(f"Skipped {missing} entries due to missing vids.")
+# per-shard totals of each vertex weight column, i.e. what METIS was asked to balance
+def report_weights(vids, sids, path=VERTEX_WEIGHTS):
+    if not os.path.exists(path):
+        return None
+    with open(path, newline='') as f:
+        names = f.readline().strip().split(",")[1:]
+        data = np.loadtxt(f, delimiter=",", dtype=np.int64, ndmin=2)
+    if not names or data.size == 0:
+        return None
+
+    vids = np.asarray(vids, dtype=np.int64)
+    sids = np.asarray(sids, dtype=np.int64)
+    order = np.argsort(data[:, 0])
+    weight_vids, weights = data[order, 0], data[order, 1:]
+    pos = np.minimum(np.searchsorted(weight_vids, vids), len(weight_vids) - 1)
+    found = weight_vids[pos] == vids
+    k = int(sids.max()) + 1 if len(sids) else 0
+
+    totals = {}
+    print(f"{'sid':>4} " + " ".join(f"{name:>14}" for name in names))
+    for j, name in enumerate(names):
+        totals[name] = np.bincount(sids[found], weights=weights[pos[found], j], minlength=k).astype(np.int64)
+    for sid in range(k):
+        print(f"{sid:>4} " + " ".join(f"{int(totals[name][sid]):>14}" for name in names))
+    for name in names:
+        mean = totals[name].mean() if k else 0
+        if mean:
+            print(f"{name} imbalance (max/mean): {totals[name].max() / mean:.3f}")
+    return totals
+
+def main():
+    # Load index → vid mapping
+    try:
+        columns = read_int_columns(INDEX_MAP, ["index", "vid"])
+    except FileNotFoundError:
+        print(f"Error: {INDEX_MAP} not found.", file=sys.stderr)
+        sys.exit(1)
+    indexes = columns["index"]
+    index_to_vid = np.full(int(indexes.max()) + 1 if len(indexes) else 0, -1, dtype=np.int64)
+    index_to_vid[indexes] = columns["vid"]
+
+    # Read METIS partition assignments
+    try:
+        with open(METIS_PARTITION) as f:
+            sids = np.loadtxt(f, dtype=np.int64, ndmin=1)
+    except FileNotFoundError:
+        print(f"Error: {METIS_PARTITION} not found.", file=sys.stderr)
+        sys.exit(1)
+
+    # sids past the configured shard count would have no URI to load into
+    if len(sids) and sids.max() >= NUM_SHARDS:
+        print(f"Warning: {METIS_PARTITION} uses sid {sids.max()} but the cluster config has {NUM_SHARDS} shards", file=sys.stderr)
+
+    # Check for index mismatch
+    if len(sids) != len(indexes):
+        print(f"Warning: Number of lines in METIS output ({len(sids)}) does not match index map ({len(indexes)})", file=sys.stderr)
+
+    # Write vid → sid mapping
+    positions = np.arange(1, len(sids) + 1)  # METIS is 1-based
+    vids = np.full(len(sids), -1, dtype=np.int64)
+    inside = positions < len(index_to_vid)
+    vids[inside] = index_to_vid[positions[inside]]
+    found = vids >= 0
+    for index in positions[~found].tolist():
+        print(f"Missing vid for index {index}", file=sys.stderr)
+    missing = int(np.count_nonzero(~found))
+    assigned_vids, assigned_sids = vids[found], sids[found]
+
+    os.makedirs(os.path.dirname(OUTPUT_LOG), exist_ok=True)
+    export_sid_log(OUTPUT_LOG, assigned_vids, assigned_sids)
+    print(f"Wrote {OUTPUT_LOG}")
+    report_weights(assigned_vids, assigned_sids)
+    if missing:
+        print(f"Skipped {missing} entries due to missing vids.")
+    return missing
+
+if __name__ == "__main__":
+    metrics.start("sid_generator")
+    with metrics.stage("assign_sids"):
+        main()
+    metrics.finish()
@@ -0,0 +1,83 @@
+import pickle
+import tempfile
+
+# Per-shard holding area between a file reader and ShardPool. Batches stay in memory up
+# to budget_bytes; past that they are pickled to an anonymous temp file and read back
+# once the shard catches up, so a slow shard never stalls the reader or grows its memory.
+# Used from the reading thread only. Batches come back in no particular order, which is
+# fine for node batches: each one is independent.
+
+# rough per-row cost of a props dict on top of its string contents
+ROW_OVERHEAD = 240
+VALUE_OVERHEAD = 56
+
+
+def batch_bytes(batch):
+    total = ROW_OVERHEAD * len(batch)
+    for row in batch:
+        for value in row.values():
+            total += VALUE_OVERHEAD + (len(value) if isinstance(value, str) else 8)
+    return total
+
+
+class SpillQueue:
+    def __init__(self, budget_bytes, name="", spill_dir=None):
+        self.budget_bytes = budget_bytes
+        self.name = name
+        self.spill_dir = spill_dir
+        self.memory = []
+        self.held_bytes = 0
+        self.peak_bytes = 0
+        self.file = None
+        self.read_pos = 0
+        self.write_pos = 0
+        self.on_disk = 0
+        self.spilled_batches = 0
+        self.spilled_bytes = 0
+
+    def __len__(self):
+        return len(self.memory) + self.on_disk
+
+    def put(self, batch):
+        size = batch_bytes(batch)
+        # an empty queue always takes one batch in memory, however large
+        if self.held_bytes + size <= self.budget_bytes or not self.memory:
+            self.memory.append((batch, size))
+            self.held_bytes += size
+            self.peak_bytes = max(self.peak_bytes, self.held_bytes)
+            return
+        if self.file is None:
+            self.file = tempfile.TemporaryFile(prefix=f"spill_{self.name}_", dir=self.spill_dir)
+        self.file.seek(self.write_pos)
+        pickle.dump(batch, self.file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.write_pos = self.file.tell()
+        self.on_disk += 1
+        self.spilled_batches += 1
+        self.spilled_bytes += size
+
+    def get(self):
+        if self.memory:
+            batch, size = self.memory.pop()
+            self.held_bytes -= size
+            return batch
+        if not self.on_disk:
+            return None
+        self.file.seek(self.read_pos)
+        batch = pickle.load(self.file)
+        self.read_pos = self.file.tell()
+        self.on_disk -= 1
+        if not self.on_disk:
+            # drained: reuse the file from the start
+            self.file.seek(0)
+            self.file.truncate()
+            self.read_pos = self.write_pos = 0
+        return batch
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def describe(self):
+        return (f"{self.name}: peak {self.peak_bytes / 2**20:.1f} MB in memory, "
+                f"{self.spilled_batches} batches ({self.spilled_bytes / 2**20:.1f} MB) spilled to disk")
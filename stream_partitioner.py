@@ -0,0 +1,187 @@
+#3 (alternative to gpmetis + sid_generator)
+import os
+import math
+import time
+import argparse
+import numpy as np
+from partition_maps import RELATIONSHIPS, load_vid_map, find_relationship_file, iter_edge_arrays
+from vid_store import export_sid_log, NO_SID
+from cluster_config import load_config
+from instrumentation import metrics
+
+# Streaming LDG / Fennel partitioner over the same edge stream partition_maps.py reads.
+# Each pass places every vertex the first time it shows up in the stream, scored by the
+# shards of its neighbours: placed ones from this pass, the rest from the previous pass
+# (restreaming). State is an (n, k) int32 neighbour count array, no adjacency is kept.
+# Vertices without edges are spread over the emptiest shards.
+
+OUTPUT_LOG = os.path.join("partitioned_vids", "vid_sid_log.csv")
+NUM_SHARDS = load_config().num_shards
+PASSES = 3
+SLACK = 0.05  # shard capacity is (1 + SLACK) * n / k
+GAMMA = 1.5
+BLOCK = 256
+
+
+def count_edges(relationships=RELATIONSHIPS):
+    total = 0
+    for _, _, rel_file in relationships:
+        path = find_relationship_file(rel_file)
+        if path is None:
+            continue
+        with open(path, "rb") as f:
+            total += sum(block.count(b"\n") for block in iter(lambda: f.read(1 << 20), b"")) - 1
+    return max(total, 1)
+
+
+class StreamPartitioner:
+    def __init__(self, vids, k=NUM_SHARDS, method="fennel", slack=SLACK, gamma=GAMMA, num_edges=1):
+        self.vids = np.asarray(vids, dtype=np.int64)
+        self.k = k
+        self.method = method
+        self.gamma = gamma
+        n = max(len(self.vids), 1)
+        size = int(self.vids.max()) + 1 if len(self.vids) else 0
+        self.part = np.full(size, NO_SID, dtype=np.int16)
+        self.counts = np.zeros((size, k), dtype=np.int32)
+        self.sizes = np.zeros(k, dtype=np.int64)
+        self.capacity = math.ceil((1 + slack) * len(self.vids) / k)
+        self.alpha = math.sqrt(k) * num_edges / n ** gamma
+        self.prev = self.part.copy()
+
+    # one directed edge u -> v: u now has a neighbour on part[v] instead of prev[v]
+    def _move(self, u, v):
+        np.add.at(self.counts, (u, self.part[v]), 1)
+        moved = self.prev[v] != NO_SID
+        np.add.at(self.counts, (u[moved], self.prev[v[moved]]), -1)
+
+    def _scores(self, neighbours):
+        if self.method == "ldg":
+            return neighbours * (1 - self.sizes / self.capacity)
+        return neighbours - self.alpha * self.gamma * self.sizes ** (self.gamma - 1)
+
+    # moves the overflow of full shards onto shards that still have room
+    def _enforce_capacity(self, choice):
+        room = np.maximum(self.capacity - self.sizes, 0)
+        overflow = []
+        for p in range(self.k):
+            idx = np.flatnonzero(choice == p)
+            if len(idx) > room[p]:
+                overflow.append(idx[room[p]:])
+            room[p] -= min(len(idx), room[p])
+        if overflow:
+            idx = np.concatenate(overflow)
+            choice[idx] = np.repeat(np.arange(self.k), room)[:len(idx)]
+        return choice
+
+    def _place(self, block):
+        neighbours = self.counts[block].astype(np.float64)
+        scores = self._scores(neighbours)
+        scores[:, self.sizes >= self.capacity] = -np.inf
+        choice = np.argmax(scores, axis=1)
+
+        # no placed neighbours means no signal: deal them out over the emptiest shards
+        cold = np.flatnonzero(neighbours.max(axis=1) <= 0)
+        if len(cold):
+            open_shards = np.flatnonzero(self.sizes < self.capacity)
+            emptiest = open_shards[np.argsort(self.sizes[open_shards], kind="stable")]
+            choice[cold] = emptiest[np.arange(len(cold)) % len(emptiest)]
+
+        choice = self._enforce_capacity(choice)
+        self.part[block] = choice
+        self.sizes += np.bincount(choice, minlength=self.k)
+
+    def _stream_chunk(self, src, dst):
+        u = np.concatenate([src, dst])
+        v = np.concatenate([dst, src])
+        placed = self.part[v] != NO_SID
+        self._move(u[placed], v[placed])
+        u, v = u[~placed], v[~placed]
+        if not len(v):
+            return
+
+        # vertices new to this pass, in order of first appearance, placed BLOCK at a time;
+        # the chunk's edges into each block are applied right after it, before the next block
+        new, first = np.unique(v, return_index=True)
+        stream_order = np.argsort(first, kind="stable")
+        rank = np.empty(len(new), dtype=np.int64)
+        rank[stream_order] = np.arange(len(new))
+        blocks = rank[np.searchsorted(new, v)] // BLOCK
+        edge_order = np.argsort(blocks, kind="stable")
+        u, v, blocks = u[edge_order], v[edge_order], blocks[edge_order]
+
+        arrivals = new[stream_order]
+        num_blocks = (len(arrivals) + BLOCK - 1) // BLOCK
+        bounds = np.searchsorted(blocks, np.arange(num_blocks + 1))
+        for j in range(num_blocks):
+            self._place(arrivals[j * BLOCK:(j + 1) * BLOCK])
+            self._move(u[bounds[j]:bounds[j + 1]], v[bounds[j]:bounds[j + 1]])
+
+    # pass 1 starts from nothing; later passes start from the previous assignment and its
+    # neighbour histogram, which is corrected edge by edge as vertices are re-placed
+    def run_pass(self, edge_chunks):
+        self.prev = self.part.copy()
+        self.part[:] = NO_SID
+        self.sizes[:] = 0
+        for src, dst in edge_chunks:
+            self._stream_chunk(src, dst)
+        isolated = self.vids[self.part[self.vids] == NO_SID]
+        for start in range(0, len(isolated), BLOCK):
+            self._place(isolated[start:start + BLOCK])
+
+    def edge_cut(self):
+        total = int(self.counts.sum()) // 2
+        internal = int(self.counts[self.vids, self.part[self.vids]].sum()) // 2
+        return total - internal, total
+
+    def assignment(self):
+        return self.vids, self.part[self.vids]
+
+
+def load_vid_maps(relationships=RELATIONSHIPS):
+    labels = sorted({label for src, dst, _ in relationships for label in (src, dst)})
+    return {label: load_vid_map(label) for label in labels}
+
+
+def edge_stream(vid_maps, relationships=RELATIONSHIPS):
+    for _, _, _, src_vids, dst_vids in iter_edge_arrays(vid_maps, relationships):
+        yield src_vids, dst_vids
+
+
+def write_log(path, vids, sids):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    export_sid_log(path, vids, sids)
+
+
+def partition(k=NUM_SHARDS, passes=PASSES, method="fennel", slack=SLACK, output=OUTPUT_LOG):
+    vid_maps = load_vid_maps()
+    vids = np.unique(np.concatenate([np.asarray(m.vids) for m in vid_maps.values()] + [np.empty(0, np.int64)]))
+    partitioner = StreamPartitioner(vids, k, method, slack, num_edges=count_edges())
+    print(f"Partitioning {len(vids)} vertices into {k} shards ({method}, capacity {partitioner.capacity})")
+
+    for i in range(passes):
+        started = time.perf_counter()
+        with metrics.stage("pass", str(i + 1)) as stage:
+            partitioner.run_pass(edge_stream(vid_maps))
+            stage["rows"] = len(vids)
+        cut, total = partitioner.edge_cut()
+        share = cut / total if total else 0.0
+        print(f"pass {i + 1}: sizes {partitioner.sizes.tolist()}, edge cut {cut}/{total} "
+              f"({share:.1%}), {time.perf_counter() - started:.2f}s")
+
+    write_log(output, *partitioner.assignment())
+    print(f"Wrote {output}")
+    return partitioner
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write vid_sid_log.csv with a streaming partitioner.")
+    parser.add_argument("--shards", type=int, default=NUM_SHARDS)
+    parser.add_argument("--passes", type=int, default=PASSES)
+    parser.add_argument("--method", choices=["fennel", "ldg"], default="fennel")
+    parser.add_argument("--slack", type=float, default=SLACK)
+    parser.add_argument("--output", default=OUTPUT_LOG)
+    args = parser.parse_args()
+    metrics.start("stream_partitioner")
+    partition(args.shards, args.passes, args.method, args.slack, args.output)
+    metrics.finish()
@@ -0,0 +1,169 @@
+import os
+import random
+import argparse
+from datetime import datetime, timedelta, timezone
+from ldbc_schema import NODE_SCHEMA, RELATIONSHIP_SCHEMA
+
+# Synthetic CsvBasic-shaped social network for benchmarks: same file names, headers and
+# value formats as LDBC datagen output, with skewed degrees. scale=1 is ~1000 persons.
+
+STATIC = {"place", "organisation", "tag", "tagclass"}
+EPOCH = datetime(2010, 1, 1, tzinfo=timezone.utc)
+
+
+def _datetime(rng):
+    value = EPOCH + timedelta(seconds=rng.randrange(3 * 365 * 24 * 3600), milliseconds=rng.randrange(1000))
+    return value.strftime("%Y-%m-%dT%H:%M:%S.") + f"{value.microsecond // 1000:03d}+0000"
+
+
+def _date(rng):
+    return (datetime(1980, 1, 1) + timedelta(days=rng.randrange(20 * 365))).strftime("%Y-%m-%d")
+
+
+def _skewed(rng, population, alpha=1.3):
+    # Zipf-like pick: a few popular targets receive most of the edges
+    return population[min(int(rng.paretovariate(alpha)) - 1, len(population) - 1)]
+
+
+class Writer:
+    def __init__(self, root):
+        self.root = root
+        self.counts = {}
+
+    def path(self, stem):
+        subfolder = "static" if stem.split("_")[0] in STATIC else "dynamic"
+        directory = os.path.join(self.root, "import", "social_network", subfolder)
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f"{stem}_0_0.csv")
+
+    def nodes(self, stem, rows):
+        header = [name for name, _ in NODE_SCHEMA[stem][1]]
+        self._write(stem, "|".join(header), rows)
+
+    def edges(self, stem, rows):
+        from_label, _, to_label, props = RELATIONSHIP_SCHEMA[stem]
+        header = [f"{from_label}.id", f"{to_label}.id"] + [name for name, _ in props]
+        self._write(stem, "|".join(header), rows)
+
+    def _write(self, stem, header, rows):
+        count = 0
+        with open(self.path(stem), "w", encoding="utf-8") as f:
+            f.write(header + "\n")
+            for row in rows:
+                f.write("|".join(map(str, row)) + "\n")
+                count += 1
+        self.counts[stem] = count
+
+
+def generate(root, scale=1.0, seed=42, messages=True):
+    rng = random.Random(seed)
+    out = Writer(root)
+
+    n_person = max(int(1000 * scale), 10)
+    n_forum = n_person * 3
+    n_post = n_person * 20 if messages else 0
+    n_comment = n_person * 40 if messages else 0
+
+    continents = list(range(0, 6))
+    countries = list(range(6, 6 + 111))
+    cities = list(range(117, 117 + 1343))
+    tagclasses = list(range(71))
+    tags = list(range(max(int(1600 * min(scale, 10)), 100)))
+    universities = list(range(0, 6000))
+    companies = list(range(6000, 7955))
+    persons = [933 + 1099511627776 * (i // 1000) + i * 7 for i in range(n_person)]
+    forums = [i * 2 for i in range(n_forum)]
+    posts = [1099511627776 * 2 + i * 2 for i in range(n_post)]
+    comments = [1099511627776 * 3 + i * 2 for i in range(n_comment)]
+
+    out.nodes("place", (
+        [(p, f"Continent_{p}", f"http://dbpedia.org/resource/Continent_{p}", "continent") for p in continents]
+        + [(p, f"Country_{p}", f"http://dbpedia.org/resource/Country_{p}", "country") for p in countries]
+        + [(p, f"City_{p}", f"http://dbpedia.org/resource/City_{p}", "city") for p in cities]
+    ))
+    out.edges("place_isPartOf_place", (
+        [(c, rng.choice(continents)) for c in countries] + [(c, rng.choice(countries)) for c in cities]
+    ))
+    out.nodes("organisation", (
+        [(o, "university", f"University_{o}", f"http://dbpedia.org/resource/University_{o}") for o in universities]
+        + [(o, "company", f"Company_{o}", f"http://dbpedia.org/resource/Company_{o}") for o in companies]
+    ))
+    # most organisations sit in a handful of places, like the real data
+    out.edges("organisation_isLocatedIn_place", (
+        [(o, _skewed(rng, cities)) for o in universities] + [(o, _skewed(rng, countries)) for o in companies]
+    ))
+    out.nodes("tagclass", ((t, f"TagClass_{t}", f"http://dbpedia.org/ontology/TagClass_{t}") for t in tagclasses))
+    out.edges("tagclass_isSubclassOf_tagclass", ((t, rng.choice(tagclasses[:t])) for t in tagclasses[1:]))
+    out.nodes("tag", ((t, f"Tag_{t}", f"http://dbpedia.org/resource/Tag_{t}") for t in tags))
+    out.edges("tag_hasType_tagclass", ((t, rng.choice(tagclasses)) for t in tags))
+
+    out.nodes("person", (
+        (p, f"First{i % 500}", f"Last{i % 1000}", rng.choice(["male", "female"]), _date(rng),
+         _datetime(rng), f"{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}",
+         rng.choice(["Firefox", "Chrome", "Internet Explorer", "Safari"]))
+        for i, p in enumerate(persons)
+    ))
+    out.edges("person_isLocatedIn_place", ((p, _skewed(rng, cities)) for p in persons))
+    out.edges("person_hasInterest_tag", ((p, _skewed(rng, tags)) for p in persons for _ in range(rng.randrange(1, 6))))
+    out.edges("person_studyAt_organisation", (
+        (p, rng.choice(universities), rng.randrange(1995, 2012)) for p in persons if rng.random() < 0.8
+    ))
+    out.edges("person_workAt_organisation", (
+        (p, _skewed(rng, companies), rng.randrange(1998, 2013)) for p in persons if rng.random() < 0.9
+    ))
+
+    knows = set()
+    for i, p in enumerate(persons):
+        for _ in range(min(int(rng.paretovariate(1.5)) * 3, n_person // 2)):
+            j = rng.randrange(n_person)
+            if j != i:
+                a, b = (p, persons[j]) if p < persons[j] else (persons[j], p)
+                knows.add((a, b))
+    out.edges("person_knows_person", ((a, b, _datetime(rng)) for a, b in sorted(knows)))
+
+    out.nodes("forum", ((f, f"Wall of person {i}", _datetime(rng)) for i, f in enumerate(forums)))
+    out.edges("forum_hasModerator_person", ((f, _skewed(rng, persons)) for f in forums))
+    out.edges("forum_hasTag_tag", ((f, _skewed(rng, tags)) for f in forums for _ in range(rng.randrange(1, 4))))
+    out.edges("forum_hasMember_person", (
+        (f, rng.choice(persons), _datetime(rng)) for f in forums for _ in range(rng.randrange(1, 10))
+    ))
+
+    if messages:
+        out.nodes("post", (
+            (m, "", _datetime(rng), "1.2.3.4", "Firefox", rng.choice(["en", "de", "zh"]),
+             f"About tag {i % 97}, " + "lorem ipsum " * rng.randrange(1, 20), rng.randrange(10, 250))
+            for i, m in enumerate(posts)
+        ))
+        out.edges("forum_containerOf_post", ((rng.choice(forums), m) for m in posts))
+        out.edges("post_hasCreator_person", ((m, _skewed(rng, persons)) for m in posts))
+        out.edges("post_hasTag_tag", ((m, _skewed(rng, tags)) for m in posts))
+        out.edges("post_isLocatedIn_place", ((m, rng.choice(countries)) for m in posts))
+        out.nodes("comment", (
+            (m, _datetime(rng), "1.2.3.4", "Chrome", "thanks! " * rng.randrange(1, 10), rng.randrange(5, 80))
+            for m in comments
+        ))
+        out.edges("comment_hasCreator_person", ((m, _skewed(rng, persons)) for m in comments))
+        out.edges("comment_isLocatedIn_place", ((m, rng.choice(countries)) for m in comments))
+        out.edges("comment_hasTag_tag", ((m, _skewed(rng, tags)) for m in comments))
+        replies = [(m, rng.choice(posts)) for m in comments[: n_comment // 2]]
+        out.edges("comment_replyOf_post", replies)
+        out.edges("comment_replyOf_comment", (
+            (m, comments[rng.randrange(i)]) for i, m in enumerate(comments) if i >= n_comment // 2
+        ))
+        out.edges("person_likes_post", ((p, _skewed(rng, posts), _datetime(rng)) for p in persons for _ in range(5)))
+        out.edges("person_likes_comment", ((p, rng.choice(comments), _datetime(rng)) for p in persons for _ in range(5)))
+
+    return out.counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic LDBC-shaped social network.")
+    parser.add_argument("root", help="directory that will contain import/social_network/")
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-messages", action="store_true")
+    args = parser.parse_args()
+
+    counts = generate(args.root, args.scale, args.seed, not args.no_messages)
+    for stem, count in counts.items():
+        print(f"{stem}: {count} rows")
@@ -0,0 +1,233 @@
+import os
+import csv
+import numpy as np
+from columnar import writes_csv, writes_arrow, write_csv, write_arrow, arrow_path, arrow_is_fresh, \
+    read_arrow, column_values, table_exists
+
+# Binary VID maps live next to their CSV:
+#   person_vid_map.csv -> person_vid_map.ids.npy (sorted original ids, int64)
+#                         person_vid_map.vids.npy (vid for each id, int64)
+#   vid_sid_log.csv    -> vid_sid_log.npy (sid indexed by vid, int16, -1 = unassigned)
+# .npy files are opened with mmap, so loading a map costs no parsing and ~16 bytes per vertex.
+# With $LDBC_ARTIFACTS=arrow or both (see columnar.py) the binary copy is an Arrow file
+# instead, person_vid_map.arrow (original_id, vid sorted by original_id) and
+# vid_sid_log.arrow (vid, sid); vid maps are then used straight from the mapped file.
+
+NO_SID = -1
+
+
+def _base(csv_path):
+    root, ext = os.path.splitext(csv_path)
+    return root if ext == ".csv" else csv_path
+
+
+def vid_map_paths(csv_path):
+    base = _base(csv_path)
+    return base + ".ids.npy", base + ".vids.npy"
+
+
+def sid_map_path(csv_path):
+    return _base(csv_path) + ".npy"
+
+
+def _is_fresh(binary_paths, csv_path):
+    if not all(os.path.exists(p) for p in binary_paths):
+        return False
+    if not os.path.exists(csv_path):
+        return True
+    csv_mtime = os.path.getmtime(csv_path)
+    return all(os.path.getmtime(p) >= csv_mtime for p in binary_paths)
+
+
+def _read_int_csv(path, ncols=2):
+    with open(path, newline='') as f:
+        f.readline()
+        data = np.loadtxt(f, delimiter=",", dtype=np.int64, ndmin=2)
+    if data.size == 0:
+        data = np.empty((0, ncols), dtype=np.int64)
+    return data[:, 0], data[:, 1]
+
+
+class VidMap:
+    def __init__(self, ids, vids):
+        self.ids = ids
+        self.vids = vids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _positions(self, original_ids):
+        original_ids = np.asarray(original_ids, dtype=np.int64)
+        if len(self.ids) == 0:
+            return np.zeros(original_ids.shape, dtype=np.intp), np.zeros(original_ids.shape, dtype=bool)
+        pos = np.minimum(np.searchsorted(self.ids, original_ids), len(self.ids) - 1)
+        return pos, self.ids[pos] == original_ids
+
+    # vectorized: returns (vids, found); vids is -1 where the id is unknown
+    def lookup(self, original_ids):
+        pos, found = self._positions(original_ids)
+        if len(self.ids) == 0:
+            return np.full(pos.shape, -1, dtype=np.int64), found
+        return np.where(found, self.vids[pos], -1), found
+
+    def get(self, original_id, default=None):
+        pos, found = self._positions(original_id)
+        if not found:
+            return default
+        return int(self.vids[pos])
+
+    def __getitem__(self, original_id):
+        vid = self.get(original_id)
+        if vid is None:
+            raise KeyError(original_id)
+        return vid
+
+    def __contains__(self, original_id):
+        return self.get(original_id) is not None
+
+    def items(self):
+        for original_id, vid in zip(self.ids.tolist(), self.vids.tolist()):
+            yield original_id, vid
+
+
+class SidMap:
+    def __init__(self, sids):
+        self.sids = sids
+
+    def __len__(self):
+        return int(np.count_nonzero(self.sids != NO_SID))
+
+    # vectorized: returns sids, NO_SID where the vid is unassigned
+    def lookup(self, vids):
+        vids = np.asarray(vids, dtype=np.int64)
+        inside = (vids >= 0) & (vids < len(self.sids))
+        out = np.full(vids.shape, NO_SID, dtype=np.int64)
+        out[inside] = self.sids[vids[inside]]
+        return out
+
+    def get(self, vid, default=None):
+        if 0 <= vid < len(self.sids):
+            sid = int(self.sids[vid])
+            if sid != NO_SID:
+                return sid
+        return default
+
+    def __getitem__(self, vid):
+        sid = self.get(vid)
+        if sid is None:
+            raise KeyError(vid)
+        return sid
+
+    def __contains__(self, vid):
+        return self.get(vid) is not None
+
+    def shard_ids(self):
+        return sorted(int(s) for s in np.unique(self.sids) if s != NO_SID)
+
+
+def _sorted_unique(original_ids, vids):
+    ids = np.asarray(original_ids, dtype=np.int64)
+    vids = np.asarray(vids, dtype=np.int64)
+    # duplicates keep the last assignment, like a dict would
+    order = np.argsort(ids, kind="stable")
+    ids, vids = ids[order], vids[order]
+    if len(ids):
+        last = np.append(ids[1:] != ids[:-1], True)
+        ids, vids = ids[last], vids[last]
+    return ids, vids
+
+
+def _dense_sids(vids, sids):
+    vids = np.asarray(vids, dtype=np.int64)
+    size = int(vids.max()) + 1 if len(vids) else 0
+    dense = np.full(size, NO_SID, dtype=np.int16)
+    dense[vids] = np.asarray(sids, dtype=np.int16)
+    return dense
+
+
+# write then rename, so readers that still have the old file mmapped are unaffected
+def _save(path, array):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def write_vid_map(csv_path, original_ids, vids):
+    ids, vids = _sorted_unique(original_ids, vids)
+    if writes_arrow():
+        return (write_arrow(csv_path, {"original_id": ids, "vid": vids}),)
+    ids_path, vids_path = vid_map_paths(csv_path)
+    _save(ids_path, ids)
+    _save(vids_path, vids)
+    return ids_path, vids_path
+
+
+def write_sid_map(csv_path, vids, sids):
+    if writes_arrow():
+        return write_arrow(csv_path, {"vid": np.asarray(vids, dtype=np.int64),
+                                      "sid": np.asarray(sids, dtype=np.int16)})
+    path = sid_map_path(csv_path)
+    _save(path, _dense_sids(vids, sids))
+    return path
+
+
+# the map's CSV (when enabled) in the caller's order, then its binary copy
+def export_vid_map(csv_path, original_ids, vids):
+    if writes_csv():
+        write_csv(csv_path, {"original_id": np.asarray(original_ids, dtype=np.int64),
+                             "vid": np.asarray(vids, dtype=np.int64)})
+    return write_vid_map(csv_path, original_ids, vids)
+
+
+def export_sid_log(csv_path, vids, sids):
+    if writes_csv():
+        write_csv(csv_path, {"vid": np.asarray(vids, dtype=np.int64), "sid": np.asarray(sids, dtype=np.int64)})
+    return write_sid_map(csv_path, vids, sids)
+
+
+def map_exists(csv_path):
+    return table_exists(csv_path) or all(os.path.exists(p) for p in vid_map_paths(csv_path))
+
+
+def open_vid_map(csv_path):
+    if arrow_is_fresh(csv_path):
+        table = read_arrow(arrow_path(csv_path))
+        return VidMap(column_values(table, "original_id"), column_values(table, "vid"))
+    ids_path, vids_path = vid_map_paths(csv_path)
+    if _is_fresh((ids_path, vids_path), csv_path):
+        return VidMap(np.load(ids_path, mmap_mode="r"), np.load(vids_path, mmap_mode="r"))
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"VID map not found: {csv_path}")
+    return VidMap(*_sorted_unique(*_read_int_csv(csv_path)))
+
+
+def open_sid_map(csv_path):
+    if arrow_is_fresh(csv_path):
+        table = read_arrow(arrow_path(csv_path))
+        return SidMap(_dense_sids(column_values(table, "vid"), column_values(table, "sid")))
+    path = sid_map_path(csv_path)
+    if _is_fresh((path,), csv_path):
+        return SidMap(np.load(path, mmap_mode="r"))
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"SID map not found: {csv_path}")
+    return SidMap(_dense_sids(*_read_int_csv(csv_path)))
+
+
+# Delta files list the vertices added by one incremental generate_maps run:
+#   label,original_id,vid
+def write_delta(path, rows):
+    with open(path, "w", newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["label", "original_id", "vid"])
+        writer.writerows(rows)
+
+
+def read_delta(path):
+    per_label = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            ids, vids = per_label.setdefault(row["label"], ([], []))
+            ids.append(int(row["original_id"]))
+            vids.append(int(row["vid"]))
+    return {label: VidMap(*_sorted_unique(ids, vids)) for label, (ids, vids) in per_label.items()}